@@ -0,0 +1,565 @@
+import asyncio
+import gzip
+import hashlib
+import inspect
+import logging
+import math
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from functools import partial, wraps
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    cast,
+)
+
+import orjson
+from cachetools import TTLCache
+from fastapi.routing import APIRoute, serialize_response
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.coder import Coder
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.compression import GZIP_MAGIC, accepts, compress, weak_etag
+from app.config import settings
+from app.database import PRIMARY_COOKIE
+
+logger = logging.getLogger(__name__)
+
+# Cached GET responses are keyed by path, query string and the current
+# version of every tag the response depends on. A write gives the tags it
+# touches a new version, so entries cached before it are never read again
+# and just expire. Tags:
+#   menus                          the menu list
+#   menu:{id}, submenu:{id}, dish:{id}
+#                                  a resource and everything nested in it
+#   menu:{id}:deleted, ...         changes only when the resource is deleted;
+#                                  entries below it depend on this one so
+#                                  they don't outlive it
+#   catalogue                      every entry; for bulk writes such as
+#                                  imports that touch too much to list
+# A missing version (never set, expired or evicted) is replaced with a new
+# one before it is used, so losing a version key can only cause misses.
+
+CACHE_EXPIRE = 6 * 60 * 60
+
+CATALOGUE_TAG = 'catalogue'
+
+
+class TieredBackend(RedisBackend):
+    # A process-local LRU/TTL cache (L1) in front of Redis (L2). Entry keys
+    # embed tag versions, so an entry never changes once written; only
+    # versions go stale. Workers announce changed versions on a pub/sub
+    # channel and every worker drops them from its L1. If the subscription
+    # drops, L1 is cleared on reconnect; messages lost in between can leave
+    # a version stale for at most `ttl` seconds.
+    redis: Redis
+
+    def __init__(
+        self, redis: Redis, maxsize: int = 1024, ttl: int = 60, channel: str = 'fastapi-cache:invalidate'
+    ) -> None:
+        super().__init__(redis)
+        self.local: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.channel = channel
+        self.hits: Counter = Counter()
+
+    def _get_local(self, key: str) -> Optional[Tuple[float, float, Any]]:
+        # (evict at, expires in Redis at, value)
+        item = self.local.get(key)
+        if item is not None and item[0] <= time.monotonic():
+            self.local.pop(key, None)
+            return None
+        return item
+
+    def _set_local(self, key: str, value: Any, expire: Optional[int] = None) -> None:
+        now = time.monotonic()
+        if expire and expire > 0:
+            self.local[key] = (now + min(expire, self.ttl), now + expire, value)
+        else:
+            self.local[key] = (now + self.ttl, now + self.ttl, value)
+
+    async def get_with_ttl(self, key: str) -> Tuple[int, Any]:
+        item = self._get_local(key)
+        if item is not None:
+            self.hits['l1'] += 1
+            _, expires_at, value = item
+            return int(expires_at - time.monotonic()), value
+        ttl, value = await super().get_with_ttl(key)
+        if value is None:
+            self.hits['miss'] += 1
+        else:
+            self.hits['l2'] += 1
+            self._set_local(key, value, ttl)
+        return ttl, value
+
+    async def get(self, key: str) -> Any:
+        return (await self.get_many([key]))[0]
+
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        values = {}
+        for key in keys:
+            item = self._get_local(key)
+            if item is not None:
+                values[key] = item[2]
+        missing = [key for key in keys if key not in values]
+        if missing:
+            for key, value in zip(missing, await self.redis.mget(missing)):
+                if value is not None:
+                    values[key] = value
+                    self._set_local(key, value)
+        return [values.get(key) for key in keys]
+
+    async def set(self, key: str, value: Any, expire: Optional[int] = None) -> None:
+        await super().set(key, value, expire)
+        self._set_local(key, value, expire)
+
+    async def set_many(
+        self, values: Dict[str, Any], expire: Optional[int] = None, only_missing: bool = False
+    ) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                pipe.set(key, value, ex=expire, nx=only_missing)
+            await pipe.execute()
+        if only_missing:
+            # Some of these may lose to values set meanwhile; callers read
+            # back whatever is stored.
+            return
+        for key, value in values.items():
+            self._set_local(key, value, expire)
+        await self.redis.publish(self.channel, ' '.join(values))
+
+    async def listen(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    self.local.clear()
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            for key in message['data'].decode().split():
+                                self.local.pop(key, None)
+            except (RedisConnectionError, OSError):
+                logger.warning('Cache invalidation channel lost, reconnecting', exc_info=True)
+                await asyncio.sleep(1)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = sum(self.hits.values())
+        return {
+            'l1_hits': self.hits['l1'],
+            'l2_hits': self.hits['l2'],
+            'misses': self.hits['miss'],
+            'l1_hit_rate': self.hits['l1'] / lookups if lookups else 0.0,
+            'l2_hit_rate': self.hits['l2'] / lookups if lookups else 0.0,
+            'l1_size': len(self.local),
+        }
+
+
+def _redis(backend: RedisBackend) -> Redis:
+    # RedisBackend types its client as AbstractRedis, which declares no commands.
+    return cast(Redis, backend.redis)
+
+
+def cache_enabled() -> bool:
+    return os.environ.get('MENU_ENV') == 'app'
+
+
+def _version_key(tag: str) -> str:
+    return f'{FastAPICache.get_prefix()}:version:{tag}'
+
+
+async def _set_versions(versions: Dict[str, str], only_missing: bool = False) -> None:
+    backend = FastAPICache.get_backend()
+    if isinstance(backend, TieredBackend):
+        await backend.set_many(versions, CACHE_EXPIRE, only_missing=only_missing)
+        return
+    if isinstance(backend, RedisBackend):
+        async with _redis(backend).pipeline(transaction=False) as pipe:
+            for key, version in versions.items():
+                pipe.set(key, version, ex=CACHE_EXPIRE, nx=only_missing)
+            await pipe.execute()
+        return
+    for key, version in versions.items():
+        if only_missing and await backend.get(key) is not None:
+            continue
+        await backend.set(key, version, CACHE_EXPIRE)
+
+
+async def _get_versions(keys: List[str]) -> List[Any]:
+    backend = FastAPICache.get_backend()
+    if isinstance(backend, TieredBackend):
+        return await backend.get_many(keys)
+    if isinstance(backend, RedisBackend):
+        return await _redis(backend).mget(keys)
+    return [await backend.get(key) for key in keys]
+
+
+async def get_versions(tags: Sequence[str]) -> List[str]:
+    keys = [_version_key(tag) for tag in tags]
+    versions = await _get_versions(keys)
+    missing = [key for key, version in zip(keys, versions) if version is None]
+    if missing:
+        # Another worker may be setting the same versions; keep whichever
+        # was set first.
+        await _set_versions({key: uuid.uuid4().hex for key in missing}, only_missing=True)
+        versions = await _get_versions(keys)
+    return [version.decode() if isinstance(version, bytes) else version for version in versions]
+
+
+# Invalidations waiting to be repeated (see invalidate).
+_repeats: Set[asyncio.Task] = set()
+
+
+async def _invalidate_later(tags: Sequence[str], delay: float) -> None:
+    await asyncio.sleep(delay)
+    try:
+        await _set_versions({_version_key(tag): uuid.uuid4().hex for tag in tags})
+    except Exception:
+        logger.warning(f'Error invalidating {tags} again:', exc_info=True)
+
+
+async def invalidate(*tags: str) -> None:
+    if not cache_enabled() or not tags:
+        return
+    await _set_versions({_version_key(tag): uuid.uuid4().hex for tag in tags})
+    if settings.DATABASE_REPLICA_URLS:
+        # A miss served by a replica that has not replayed the write yet
+        # caches the old data under the new versions; replace them once
+        # more after the replicas had time to catch up.
+        task = asyncio.create_task(_invalidate_later(tags, settings.DATABASE_REPLICA_LAG))
+        _repeats.add(task)
+        task.add_done_callback(_repeats.discard)
+
+
+def write_tags(
+    menu_id: int,
+    submenu_id: Optional[int] = None,
+    dish_id: Optional[int] = None,
+    deleted: bool = False,
+) -> List[str]:
+    # A write changes the menu list and every resource on its path.
+    tags = ['menus', f'menu:{menu_id}']
+    if submenu_id is not None:
+        tags.append(f'submenu:{submenu_id}')
+    if dish_id is not None:
+        tags.append(f'dish:{dish_id}')
+    if deleted:
+        tags.append(f'{tags[-1]}:deleted')
+    return tags
+
+
+def batch_write_tags(
+    menu_id: int,
+    submenu_id: Optional[int] = None,
+    item_ids: Iterable[int] = (),
+    deleted: bool = False,
+) -> List[str]:
+    # write_tags for a batch of submenus of menu_id, or of dishes of
+    # submenu_id when it is given.
+    tags = dict.fromkeys(write_tags(menu_id, submenu_id))
+    for item_id in item_ids:
+        if submenu_id is None:
+            tags.update(dict.fromkeys(write_tags(menu_id, item_id, deleted=deleted)))
+        else:
+            tags.update(dict.fromkeys(write_tags(menu_id, submenu_id, item_id, deleted)))
+    return list(tags)
+
+
+async def tag_key_builder(
+    tags: Sequence[str],
+    func: Callable,
+    namespace: Optional[str] = '',
+    request: Optional[Request] = None,
+    response: Optional[Response] = None,
+    args: Optional[tuple] = None,
+    kwargs: Optional[dict] = None,
+) -> str:
+    # Unlike the default key builder this leaves the endpoint arguments out
+    # of the key, as they include the db session and would make every key
+    # unique. Tags are formatted with the parsed arguments, not the raw path,
+    # so /menus/05 carries the tag menu:5 that writes invalidate.
+    assert request is not None
+    names = [CATALOGUE_TAG, *(tag.format(**(kwargs or {})) for tag in tags)]
+    versions = await get_versions(names)
+    query = sorted(request.query_params.multi_items())
+    key = f'{func.__module__}:{func.__name__}:{request.url.path}:{query}:{versions}'
+    digest = hashlib.md5(key.encode()).hexdigest()  # nosec:B303
+    return f'{FastAPICache.get_prefix()}:{namespace}:{digest}'
+
+
+# Stampede protection. A cold key is computed once: concurrent requests in
+# the same process await the one in flight, and across workers the first
+# to take a short Redis lock computes while the others poll for its result.
+# Entries carry their expiry and how long they took to compute, so a hit
+# may refresh early (XFetch) with a probability that grows as expiry nears;
+# the rest keep getting the cached value, so expiry doesn't cause a burst
+# of queries either.
+#
+# Entries hold the ETag and the serialized response body, gzipped from
+# COMPRESSION_MIN_SIZE on, so a hit is sent as is without decoding and
+# re-encoding, and without compressing again for clients that accept gzip
+# (app.compression passes it through); the coder configured on
+# FastAPICache must produce JSON.
+#
+# Routes given a `versions` lookup answer If-None-Match with 304. The ETag
+# hashes the versions of the rows in the response, so it is checked
+# against the cached entry or, on a miss, against one version query,
+# before any body is built. The lookup takes the endpoint's arguments and
+# returns None when the resource doesn't exist.
+
+LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.05
+EARLY_REFRESH_BETA = 1.0
+
+Entry = Tuple[Optional[str], bytes]
+
+_in_flight: Dict[str, asyncio.Future] = {}
+
+
+class OrjsonCoder(Coder):
+    @classmethod
+    def encode(cls, value: Any) -> str:
+        return orjson.dumps(value).decode()
+
+    @classmethod
+    def decode(cls, value: str) -> Any:
+        return orjson.loads(value)
+
+
+def _compress(body: bytes) -> bytes:
+    if len(body) >= settings.COMPRESSION_MIN_SIZE:
+        return compress(body)
+    return body
+
+
+def _pack(entry: Entry, expire: int, delta: float) -> bytes:
+    etag, body = entry
+    header = b'%.3f %.4f %s ' % (time.time() + expire, delta, (etag or '-').encode())
+    return header + body
+
+
+def _unpack(value: bytes) -> Tuple[float, float, Entry]:
+    expires_at, delta, etag, body = value.split(b' ', 3)
+    return float(expires_at), float(delta), (None if etag == b'-' else etag.decode(), body)
+
+
+def refresh_early(expires_at: float, delta: float, beta: float = EARLY_REFRESH_BETA) -> bool:
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def make_etag(request: Request, versions: Any) -> str:
+    query = sorted(request.query_params.multi_items())
+    digest = hashlib.md5(repr((request.url.path, query, versions)).encode()).hexdigest()  # nosec:B303
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if not etag or not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in tags or f'W/{etag}' in tags
+
+
+async def _get(key: str) -> Optional[bytes]:
+    try:
+        _, value = await FastAPICache.get_backend().get_with_ttl(key)
+        return value.encode() if isinstance(value, str) else value
+    except Exception:
+        logger.warning(f"Error retrieving cache key '{key}' from backend:", exc_info=True)
+        return None
+
+
+async def _set(key: str, value: bytes, expire: int) -> None:
+    try:
+        await FastAPICache.get_backend().set(key, value, expire)  # type: ignore[arg-type]
+    except Exception:
+        logger.warning(f"Error setting cache key '{key}' in backend:", exc_info=True)
+
+
+async def _render(route: APIRoute, coder: Type[Coder], call: Callable[[], Awaitable[Any]]) -> bytes:
+    # Serializes the result the way FastAPI would have: a response the
+    # endpoint rendered itself is used as is.
+    result = await call()
+    if isinstance(result, Response):
+        return result.body
+    content = await serialize_response(
+        field=route.response_field,
+        response_content=result,
+        include=route.response_model_include,
+        exclude=route.response_model_exclude,
+        by_alias=route.response_model_by_alias,
+        exclude_unset=route.response_model_exclude_unset,
+        exclude_defaults=route.response_model_exclude_defaults,
+        exclude_none=route.response_model_exclude_none,
+    )
+    body = coder.encode(content)
+    return body.encode() if isinstance(body, str) else body
+
+
+async def _compute(
+    key: str, etag: Optional[str], render: Callable[[], Awaitable[bytes]], expire: int,
+    stale: Optional[Entry],
+) -> Entry:
+    backend = FastAPICache.get_backend()
+    lock_key = f'{key}:lock'
+    redis: Optional[Redis] = None
+    locked: Optional[bool] = None
+    if isinstance(backend, RedisBackend):
+        redis = _redis(backend)
+        try:
+            locked = bool(await redis.set(lock_key, '1', nx=True, ex=LOCK_TIMEOUT))
+        except Exception:
+            logger.warning(f"Error locking cache key '{key}':", exc_info=True)
+        if locked is False:
+            if stale is not None:
+                return stale
+            deadline = time.monotonic() + LOCK_TIMEOUT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+                async with redis.pipeline(transaction=False) as pipe:
+                    value, holding = await pipe.get(key).exists(lock_key).execute()
+                if value is not None:
+                    return _unpack(value)[2]
+                if not holding:
+                    # The holder gave up without a value (its render
+                    # failed): compute here rather than wait out the lock.
+                    break
+    try:
+        start = time.perf_counter()
+        entry = (etag, _compress(await render()))
+        await _set(key, _pack(entry, expire, time.perf_counter() - start), expire)
+        return entry
+    finally:
+        if redis is not None and locked:
+            try:
+                await redis.delete(lock_key)
+            except Exception:
+                logger.warning(f"Error unlocking cache key '{key}':", exc_info=True)
+
+
+async def _single_flight(
+    key: str, etag: Optional[str], render: Callable[[], Awaitable[bytes]], expire: int,
+    stale: Optional[Entry] = None,
+) -> Entry:
+    future = _in_flight.get(key)
+    if future is not None:
+        if stale is not None:
+            return stale
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[key] = future
+    try:
+        entry = await _compute(key, etag, render, expire, stale)
+    except BaseException as exc:
+        future.set_exception(exc)
+        future.exception()  # waiters get it; don't warn when there are none
+        raise
+    else:
+        future.set_result(entry)
+        return entry
+    finally:
+        del _in_flight[key]
+
+
+def _response(request: Request, entry: Entry, max_age: Optional[int] = None) -> Response:
+    etag, body = entry
+    headers = {}
+    if etag:
+        # Let clients keep the body but revalidate it on every use.
+        headers['ETag'] = etag
+        headers['Cache-Control'] = 'no-cache'
+    elif max_age is not None:
+        headers['Cache-Control'] = f'max-age={max_age}'
+    if etag_matches(request, etag):
+        if etag and f'W/{etag}' in request.headers['if-none-match']:
+            headers['ETag'] = weak_etag(etag)
+        return Response(status_code=304, headers=headers)
+    if body[:2] == GZIP_MAGIC:  # JSON never starts with these bytes
+        if accepts(request.headers.get('accept-encoding'), 'gzip'):
+            headers['Content-Encoding'] = 'gzip'
+            if etag:
+                headers['ETag'] = weak_etag(etag)
+        else:
+            body = gzip.decompress(body)
+    return Response(content=body, media_type='application/json', headers=headers)
+
+
+def get_cache(
+    expire: int = CACHE_EXPIRE,
+    tags: Sequence[str] = (),
+    versions: Optional[Callable[..., Awaitable[Any]]] = None,
+):
+    # tags are formatted with the endpoint arguments, e.g. 'menu:{menu_id}'.
+    enabled = cache_enabled()
+    if not enabled and versions is None:
+        def no_cache_decorator(func):
+            return func
+        return no_cache_decorator
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        async def wrapper(*args, request: Request, **kwargs):
+            async def lookup_etag() -> Optional[str]:
+                if versions is None:
+                    return None
+                found = await versions(*args, **kwargs)
+                return None if found is None else make_etag(request, found)
+
+            coder = FastAPICache.get_coder() if enabled else OrjsonCoder
+            render = partial(_render, request.scope['route'], coder, partial(func, *args, **kwargs))
+
+            # A client that wrote recently must read its writes, and the
+            # shared entries may have been filled from a lagging replica.
+            bypass = request.headers.get('Cache-Control') in ('no-store', 'no-cache')
+            if not enabled or bypass or PRIMARY_COOKIE in request.cookies:
+                etag = await lookup_etag()
+                if etag_matches(request, etag):
+                    return _response(request, (etag, b''))
+                return _response(request, (etag, await render()))
+
+            key = await tag_key_builder(tags, func, request=request, kwargs=kwargs)
+            stale = None
+            value = await _get(key)
+            if value is not None:
+                expires_at, delta, entry = _unpack(value)
+                if etag_matches(request, entry[0]) or not refresh_early(expires_at, delta):
+                    return _response(request, entry, max(int(expires_at - time.time()), 0))
+                stale = entry
+
+            etag = await lookup_etag()
+            if etag_matches(request, etag):
+                return _response(request, (etag, b''))
+            entry = await _single_flight(key, etag, render, expire, stale)
+            return _response(request, entry, expire)
+
+        wrapper.__signature__ = signature.replace(  # type: ignore
+            parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter('request', inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+            ]
+        )
+        return wrapper
+
+    return decorator
@@ -0,0 +1,139 @@
+import gzip
+import zlib
+from typing import Any, Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # optional; without it responses are only gzipped
+    brotli = None
+
+# Response compression. JSON, NDJSON and text responses of at least
+# COMPRESSION_MIN_SIZE bytes are compressed for clients that accept it:
+# brotli (COMPRESSION_BROTLI_QUALITY) when the package is installed, else
+# gzip (COMPRESSION_LEVEL). Responses that already carry a Content-Encoding
+# pass through, which is how cached entries, stored gzipped (see
+# app.cache), reach gzip clients without being compressed again. Streamed
+# responses are compressed and flushed chunk by chunk. An ETag on a
+# compressed response is made weak, since the bytes sent differ from the
+# identity body it also names.
+
+GZIP_MAGIC = b'\x1f\x8b'
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def accepts(accept_encoding: Optional[str], coding: str) -> bool:
+    qualities: Dict[str, float] = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    return qualities.get(coding, qualities.get('*', 0.0)) > 0
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    if brotli is not None and accepts(accept_encoding, 'br'):
+        return 'br'
+    if accepts(accept_encoding, 'gzip'):
+        return 'gzip'
+    return None
+
+
+def weak_etag(etag: str) -> str:
+    return etag if etag.startswith('W/') else f'W/{etag}'
+
+
+def compress(body: bytes, encoding: str = 'gzip') -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    def __init__(self, encoding: str) -> None:
+        self.compressor: Any
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(settings.COMPRESSION_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self.brotli = encoding == 'br'
+
+    def compress(self, chunk: bytes, last: bool) -> bytes:
+        # Flushed every chunk, so the client gets what was streamed so far.
+        if self.brotli:
+            data = self.compressor.process(chunk)
+            return data + (self.compressor.finish() if last else self.compressor.flush())
+        data = self.compressor.compress(chunk)
+        return data + self.compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def compressible(headers: Headers) -> bool:
+    return headers.get('content-type', '').startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get('accept-encoding'))
+        start: Optional[Message] = None
+        stream: Optional[StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, stream, passthrough
+            if message['type'] == 'http.response.start':
+                # Held until the first body message tells the size.
+                start = {**message, 'headers': list(message.get('headers', []))}
+                return
+            if message['type'] != 'http.response.body' or passthrough:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            if stream is not None:
+                await send({**message, 'body': stream.compress(body, last=not more_body)})
+                return
+
+            assert start is not None
+            headers = MutableHeaders(raw=start['headers'])
+            if compressible(headers):
+                headers.add_vary_header('Accept-Encoding')
+            small = not more_body and len(body) < settings.COMPRESSION_MIN_SIZE
+            if encoding is None or small or 'content-encoding' in headers or not compressible(headers):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            headers['Content-Encoding'] = encoding
+            if 'etag' in headers:
+                headers['ETag'] = weak_etag(headers['etag'])
+            if more_body:
+                del headers['Content-Length']
+                stream = StreamCompressor(encoding)
+                body = stream.compress(body, last=False)
+            else:
+                body = compress(body, encoding)
+                headers['Content-Length'] = str(len(body))
+            await send(start)
+            await send({**message, 'body': body})
+
+        await self.app(scope, receive, send_compressed)
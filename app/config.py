@@ -1,4 +1,5 @@
 import os
+from typing import List, Optional
 
 from pydantic import BaseSettings
 
@@ -10,12 +11,46 @@ class BaseConfig(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_HOST: str
     POSTGRES_HOSTNAME: str
+    # Overrides the Postgres URL, e.g. sqlite+aiosqlite:///./menu.db
+    DATABASE_URL: Optional[str] = None
+    # Logs every statement; for debugging only
+    DATABASE_ECHO: bool = False
+    # Read replicas for read-only endpoints, as a JSON list of URLs
+    DATABASE_REPLICA_URLS: List[str] = []
+    # Seconds the replicas may trail the primary: clients read from the
+    # primary for that long after a write, and cached responses are
+    # invalidated again once it has passed
+    DATABASE_REPLICA_LAG: int = 5
+    # Clients sending this in X-Profile-Token can profile single requests
+    # (see app/profiling.py); unset, profiling is off
+    PROFILING_TOKEN: Optional[str] = None
+    PROFILING_DIR: str = './profiles'
+    # Responses of at least this many bytes are compressed for clients that
+    # accept it: gzip at COMPRESSION_LEVEL (1-9), or brotli at
+    # COMPRESSION_BROTLI_QUALITY (0-11) when the brotli package is installed
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_LEVEL: int = 5
+    COMPRESSION_BROTLI_QUALITY: int = 4
 
 
 class AppConfig(BaseConfig):
     REDIS_HOST: str
     REDIS_PORT: int
     REDIS_DB: int
+    # In-process cache in front of Redis
+    CACHE_L1_MAXSIZE: int = 1024
+    CACHE_L1_TTL: int = 60
+    # Connection pool (per worker). Pre-ping tests each connection before
+    # use; recycle replaces connections older than that many seconds (-1
+    # never does).
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 20
+    DATABASE_POOL_TIMEOUT: float = 30
+    DATABASE_POOL_PRE_PING: bool = False
+    DATABASE_POOL_RECYCLE: int = -1
+    # Behind PgBouncer in transaction mode: no pool of our own and no
+    # prepared statement reuse
+    DATABASE_PGBOUNCER: bool = False
 
     class Config:
         env_file = './.env'
@@ -1,227 +1,956 @@
-from typing import List
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    ColumnElement,
+    bindparam,
+    delete,
+    insert,
+    null,
+    select,
+    true,
+    update,
+)
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app import schemas
 from app.models import Dish, Menu, SubMenu
-from app.validation import is_valid_dish, is_valid_menu, is_valid_submenu
+from app.pagination import decode_cursor, make_page, page_window
+from app.search import apply_search, index_item, reset_index, unindex_item
+from app.validation import is_valid_dish, is_valid_menu, is_valid_submenu, parse_price
+
+# Ids/titles per IN list when a batch is checked against the database, well
+# below the drivers' bind parameter limits.
+BATCH_LOOKUP_SIZE = 1000
+
+
+async def _execute_in(db: AsyncSession, stmt, column, values: List[Any]) -> List[Any]:
+    # Runs stmt (a select or delete) for chunks of values and returns all rows.
+    rows: List[Any] = []
+    for start in range(0, len(values), BATCH_LOOKUP_SIZE):
+        result = await db.execute(
+            stmt.where(column.in_(values[start:start + BATCH_LOOKUP_SIZE]))
+        )
+        rows.extend(result)
+    return rows
+
+
+def _price_error(item: Any) -> Optional[str]:
+    if not hasattr(item, 'price'):
+        return None
+    try:
+        parse_price(item.price)
+    except ValueError as exc:
+        return str(exc)
+    return None
+
+
+async def _batch_errors(
+    db: AsyncSession, model, name: str, items: List[Any], parent_column=None, parent_id=None
+) -> Dict[int, str]:
+    # Errors by item index for a batch create, or a batch update when the
+    # parent is given (items then carry the id of the row they update).
+    # Checked up front so that the remaining items can be written at once.
+    item_ids = [getattr(item, 'id', None) for item in items]
+    found = set()
+    if parent_column is not None:
+        rows = await _execute_in(
+            db, select(model.id).where(parent_column == parent_id), model.id, item_ids
+        )
+        found = {item_id for item_id, in rows}
+    rows = await _execute_in(
+        db, select(model.title, model.id), model.title, [item.title for item in items]
+    )
+    owners = dict(rows)
+
+    errors = {}
+    seen_ids, seen_titles = set(), set()
+    for index, (item, item_id) in enumerate(zip(items, item_ids)):
+        price_error = _price_error(item)
+        if parent_column is not None and item_id not in found:
+            errors[index] = f'{name} not found'
+        elif item_id is not None and item_id in seen_ids:
+            errors[index] = f'duplicate {name}'
+        elif item.title in seen_titles or owners.get(item.title, item_id) != item_id:
+            errors[index] = f'{name} title already exists'
+        elif price_error is not None:
+            errors[index] = f'{name} {price_error}'
+        else:
+            seen_ids.add(item_id)
+            seen_titles.add(item.title)
+    return errors
+
+
+def _batch_result(items: List[Any], errors: Dict[int, str]) -> Dict[str, Any]:
+    return {
+        'items': items,
+        'errors': [{'index': index, 'detail': detail} for index, detail in sorted(errors.items())],
+    }
+
+
+# List and tree reads return plain dicts shaped like their schemas, built
+# from column rows with one query per level. Large responses would spend
+# most of their time in per-object pydantic validation, so the routes send
+# these as they are (python -m benchmarks.bench_serialization). The child
+# levels of a page are looked up by id; a tree passes a filter on the
+# submenus instead, so it takes one query per level however large it is.
+
+DISH_COLUMNS = (Dish.title, Dish.description, Dish.price, Dish.id, Dish.submenu_id)
+SUBMENU_COLUMNS = (SubMenu.title, SubMenu.description, SubMenu.id, SubMenu.menu_id, SubMenu.dishes_count)
+MENU_COLUMNS = (Menu.title, Menu.description, Menu.id, Menu.submenus_count, Menu.dishes_count)
+
+
+def _dish_dict(row: Row) -> Dict[str, Any]:
+    return {
+        'title': row.title,
+        'description': row.description,
+        'price': str(row.price),
+        'id': str(row.id),
+        'submenu_id': str(row.submenu_id),
+    }
+
+
+async def _submenu_dicts(
+    db: AsyncSession, rows: Sequence[Row], counts: bool = True, where: Optional[ColumnElement[bool]] = None
+) -> List[Dict[str, Any]]:
+    # schemas.SubMenuReponse, or schemas.SubMenu without counts. where, a
+    # filter on SubMenu, selects the submenus of rows.
+    dishes: Dict[int, List[Dict[str, Any]]] = {row.id: [] for row in rows}
+    stmt = select(*DISH_COLUMNS).order_by(Dish.id)
+    if where is None:
+        dish_rows = await _execute_in(db, stmt, Dish.submenu_id, list(dishes))
+    else:
+        dish_rows = list(await db.execute(stmt.where(Dish.submenu_id.in_(select(SubMenu.id).where(where)))))
+    for dish in dish_rows:
+        # Dishes of a submenu added since rows were read are left out.
+        dishes.setdefault(dish.submenu_id, []).append(_dish_dict(dish))
+    submenus = []
+    for row in rows:
+        submenu = {
+            'title': row.title,
+            'description': row.description,
+            'id': str(row.id),
+            'menu_id': str(row.menu_id),
+            'dishes': dishes[row.id],
+        }
+        if counts:
+            submenu['dishes_count'] = row.dishes_count
+        submenus.append(submenu)
+    return submenus
+
+
+async def _menu_dicts(
+    db: AsyncSession, rows: Sequence[Row], counts: bool = False, where: Optional[ColumnElement[bool]] = None
+) -> List[Dict[str, Any]]:
+    # schemas.MenuReponse, or schemas.MenuTree with submenu counts. where, a
+    # filter on SubMenu, selects the submenus of rows.
+    stmt = select(*SUBMENU_COLUMNS).order_by(SubMenu.id)
+    if where is None:
+        submenu_rows = await _execute_in(db, stmt, SubMenu.menu_id, [row.id for row in rows])
+    else:
+        submenu_rows = list(await db.execute(stmt.where(where)))
+    submenus: Dict[int, List[Dict[str, Any]]] = {row.id: [] for row in rows}
+    for row, submenu in zip(submenu_rows, await _submenu_dicts(db, submenu_rows, counts, where)):
+        submenus.setdefault(row.menu_id, []).append(submenu)
+    return [
+        {
+            'title': row.title,
+            'description': row.description,
+            'id': str(row.id),
+            'submenus': submenus[row.id],
+            'submenus_count': row.submenus_count,
+            'dishes_count': row.dishes_count,
+        }
+        for row in rows
+    ]
+
+
+async def _dish_dicts(db: AsyncSession, rows: Sequence[Row]) -> List[Dict[str, Any]]:
+    return [_dish_dict(row) for row in rows]
+
+
+async def _page_dicts(db: AsyncSession, rows: Sequence[Row], limit: int, to_dicts) -> Dict[str, Any]:
+    page = make_page(list(rows), limit)
+    page['items'] = await to_dicts(db, page['items'])
+    return page
 
 
 class MenuCRUD:
-    def create_item(
+    async def create_item(
         self,
-        db: Session,
-        item_schema: Menu,
+        db: AsyncSession,
+        item_schema: schemas.MenuCreate,
     ) -> Menu:
-        db_item = Menu(**item_schema.dict())
-        db.add(db_item)
-        db.commit()
-        db.refresh(db_item)
+        db_item = (await db.scalars(insert(Menu).values(**item_schema.dict()).returning(Menu))).one()
+        set_committed_value(db_item, 'submenus', [])
+        await db.commit()
+        index_item(db_item)
         return db_item
 
-    def read_item(
+    async def read_item(
         self,
-        db: Session,
+        db: AsyncSession,
         menu_id: int,
     ) -> Menu:
-        valid_menu = is_valid_menu(db=db, menu_id=menu_id)
-        if valid_menu:
-            return valid_menu
+        menu = await db.scalar(
+            select(Menu)
+            .options(selectinload(Menu.submenus).selectinload(SubMenu.dishes))
+            .where(Menu.id == menu_id)
+            .execution_options(populate_existing=True)
+        )
+        if menu:
+            return menu
         raise HTTPException(status_code=404, detail='menu not found')
 
-    def read_items(
+    async def read_items(
         self,
-        db: Session,
+        db: AsyncSession,
         limit: int = 20,
         page: int = 1,
         search: str = '',
-    ) -> List[Menu]:
+    ) -> List[Dict[str, Any]]:
         skip = (page - 1) * limit
 
-        return (
-            db.query(Menu)
-            .filter(Menu.title.contains(search))
-            .limit(limit)
-            .offset(skip)
-            .all()
+        stmt = await apply_search(
+            db,
+            select(*MENU_COLUMNS),
+            Menu,
+            search,
+            limit=limit,
+            offset=skip,
         )
+        result = await db.execute(stmt)
+        return await _menu_dicts(db, list(result))
 
-    def update_item(
-        self, db: Session, item_schema: Menu, item_id: int, menu_id: int
-    ) -> Menu:
-        valid_menu = is_valid_menu(db=db, menu_id=menu_id)
-        if valid_menu:
-            update_data = item_schema.dict(exclude_unset=True)
-            item_query = db.query(Menu).filter(Menu.id == menu_id)
-            item_query.filter(Menu.id == item_id).update(
-                update_data, synchronize_session=False
+    async def read_page(
+        self,
+        db: AsyncSession,
+        limit: int = 20,
+        cursor: str = '',
+        search: str = '',
+    ) -> Dict[str, Any]:
+        stmt = await apply_search(
+            db,
+            select(*MENU_COLUMNS),
+            Menu,
+            search,
+            limit=limit + 1,
+            after=decode_cursor(cursor),
+        )
+        result = await db.execute(stmt)
+        return await _page_dicts(db, list(result), limit, _menu_dicts)
+
+    async def read_version(self, db: AsyncSession, menu_id: int) -> Optional[int]:
+        return await db.scalar(select(Menu.version).where(Menu.id == menu_id))
+
+    async def read_versions(
+        self,
+        db: AsyncSession,
+        limit: int = 20,
+        page: int = 1,
+        search: str = '',
+        cursor: Optional[str] = None,
+    ) -> List[Tuple[int, int]]:
+        # Ids and versions of the rows read_items/read_page would return.
+        stmt = await apply_search(
+            db,
+            select(Menu.id, Menu.version),
+            Menu,
+            search,
+            **page_window(limit, page, cursor),
+        )
+        result = await db.execute(stmt)
+        return [(item_id, version) for item_id, version in result]
+
+    async def read_tree(
+        self,
+        db: AsyncSession,
+        menu_id: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        # One query per level, however large the tree is.
+        stmt = select(*MENU_COLUMNS).order_by(Menu.id)
+        where: ColumnElement[bool] = true()
+        if menu_id is not None:
+            stmt = stmt.where(Menu.id == menu_id)
+            where = SubMenu.menu_id == menu_id
+        result = await db.execute(stmt)
+        rows = list(result)
+        if menu_id is not None and not rows:
+            raise HTTPException(status_code=404, detail='menu not found')
+        return await _menu_dicts(db, rows, counts=True, where=where)
+
+    async def stream_catalogue(
+        self, db: AsyncSession, chunk_size: int = 1000
+    ) -> AsyncIterator[Sequence[Row]]:
+        # One row per dish with its submenu and menu; submenus without
+        # dishes and menus without submenus get a row of their own. Rows
+        # come from server-side cursors, chunk_size at a time, in the
+        # order of ix_dishes_submenu_id_id so the database never sorts the
+        # whole catalogue before the first chunk: by submenu and dish,
+        # then the menus without submenus.
+        menu_columns = (
+            Menu.id.label('menu_id'),
+            Menu.title.label('menu_title'),
+            Menu.description.label('menu_description'),
+        )
+        dishes = (
+            select(
+                *menu_columns,
+                SubMenu.id.label('submenu_id'),
+                SubMenu.title.label('submenu_title'),
+                SubMenu.description.label('submenu_description'),
+                Dish.id.label('dish_id'),
+                Dish.title.label('dish_title'),
+                Dish.description.label('dish_description'),
+                Dish.price.label('dish_price'),
             )
+            .select_from(SubMenu)
+            .join(Menu, Menu.id == SubMenu.menu_id)
+            .outerjoin(Dish, Dish.submenu_id == SubMenu.id)
+            .order_by(SubMenu.id, Dish.id)
+        )
+        empty_menus = (
+            select(*menu_columns, *(null() for _ in range(7)))
+            .outerjoin(SubMenu, SubMenu.menu_id == Menu.id)
+            .where(SubMenu.id.is_(None))
+            .order_by(Menu.id)
+        )
+        for stmt in (dishes, empty_menus):
+            result = await db.stream(stmt.execution_options(yield_per=chunk_size))
+            async for rows in result.partitions():
+                yield rows
 
-            db.commit()
-            db.refresh(valid_menu)
-            return valid_menu
+    async def update_item(
+        self, db: AsyncSession, item_schema: schemas.MenuUpdate, item_id: int, menu_id: int
+    ) -> Menu:
+        update_data = item_schema.dict(exclude_unset=True)
+        menu = await db.scalar(
+            update(Menu)
+            .where(Menu.id == menu_id, Menu.id == item_id)
+            .values({**update_data, 'version': Menu.version + 1})
+            .returning(Menu)
+            .options(selectinload(Menu.submenus).selectinload(SubMenu.dishes))
+            .execution_options(populate_existing=True)
+        )
+        if menu:
+            await db.commit()
+            index_item(menu)
+            return menu
         raise HTTPException(status_code=404, detail='menu not found')
 
-    def delete_item(
+    async def delete_item(
         self,
-        db: Session,
+        db: AsyncSession,
         item_id: int,
         menu_id: int,
     ) -> None:
-        valid_menu = is_valid_menu(db=db, menu_id=menu_id)
-        if valid_menu:
-            db.query(Menu).filter(Menu.id == item_id).delete(synchronize_session=False)
+        deleted = await db.scalar(
+            delete(Menu)
+            .where(Menu.id == menu_id, Menu.id == item_id)
+            .returning(Menu.id)
+            .execution_options(synchronize_session=False)
+        )
 
-        db.commit()
+        await db.commit()
+        if deleted:
+            unindex_item(Menu, item_id)
+            reset_index(SubMenu, Dish)
 
 
 class SubmenuCRUD:
-    def create_item(
+    async def create_item(
         self,
-        db: Session,
-        item_schema: SubMenu,
+        db: AsyncSession,
+        item_schema: schemas.SubMenuCreate,
         menu_id: int,
     ) -> SubMenu:
-        valid_menu = is_valid_menu(db=db, menu_id=menu_id)
+        # Bumping the menu's counter doubles as the check that it exists.
+        valid_menu = await db.scalar(
+            update(Menu)
+            .where(Menu.id == menu_id)
+            .values({Menu.submenus_count: Menu.submenus_count + 1, Menu.version: Menu.version + 1})
+            .returning(Menu.id)
+            .execution_options(synchronize_session=False)
+        )
         if valid_menu:
-            db_item = SubMenu(**item_schema.dict(), menu_id=menu_id)
-            db.add(db_item)
-            db.commit()
-            db.refresh(db_item)
+            db_item = (await db.scalars(
+                insert(SubMenu).values(**item_schema.dict(), menu_id=menu_id).returning(SubMenu)
+            )).one()
+            set_committed_value(db_item, 'dishes', [])
+            await db.commit()
+            index_item(db_item)
             return db_item
         raise HTTPException(status_code=404, detail='menu not found')
 
-    def read_item(self, db: Session, menu_id: int, submenu_id: int) -> SubMenu:
-        valid_submenu = is_valid_submenu(db=db, menu_id=menu_id, submenu_id=submenu_id)
+    async def read_item(
+        self, db: AsyncSession, menu_id: int, submenu_id: int
+    ) -> SubMenu:
+        valid_submenu = await is_valid_submenu(
+            db=db, menu_id=menu_id, submenu_id=submenu_id
+        )
         if valid_submenu:
+            await db.refresh(valid_submenu, attribute_names=['dishes'])
             return valid_submenu
         raise HTTPException(status_code=404, detail='submenu not found')
 
-    def read_items(
+    async def read_items(
         self,
-        db: Session,
+        db: AsyncSession,
+        menu_id: int,
         limit: int = 20,
         page: int = 1,
         search: str = '',
-    ) -> List[SubMenu]:
+    ) -> List[Dict[str, Any]]:
         skip = (page - 1) * limit
 
-        return (
-            db.query(SubMenu)
-            .filter(SubMenu.title.contains(search))
-            .limit(limit)
-            .offset(skip)
-            .all()
+        stmt = await apply_search(
+            db,
+            select(*SUBMENU_COLUMNS).where(SubMenu.menu_id == menu_id),
+            SubMenu,
+            search,
+            limit=limit,
+            offset=skip,
+            parent_id=menu_id,
         )
+        result = await db.execute(stmt)
+        return await _submenu_dicts(db, list(result))
 
-    def update_item(
+    async def read_page(
         self,
-        db: Session,
-        item_schema: SubMenu,
+        db: AsyncSession,
+        menu_id: int,
+        limit: int = 20,
+        cursor: str = '',
+        search: str = '',
+    ) -> Dict[str, Any]:
+        stmt = await apply_search(
+            db,
+            select(*SUBMENU_COLUMNS).where(SubMenu.menu_id == menu_id),
+            SubMenu,
+            search,
+            limit=limit + 1,
+            after=decode_cursor(cursor),
+            parent_id=menu_id,
+        )
+        result = await db.execute(stmt)
+        return await _page_dicts(db, list(result), limit, _submenu_dicts)
+
+    async def read_version(
+        self, db: AsyncSession, menu_id: int, submenu_id: int
+    ) -> Optional[int]:
+        return await db.scalar(
+            select(SubMenu.version).where(SubMenu.id == submenu_id, SubMenu.menu_id == menu_id)
+        )
+
+    async def read_versions(
+        self,
+        db: AsyncSession,
+        menu_id: int,
+        limit: int = 20,
+        page: int = 1,
+        search: str = '',
+        cursor: Optional[str] = None,
+    ) -> List[Tuple[int, int]]:
+        stmt = await apply_search(
+            db,
+            select(SubMenu.id, SubMenu.version).where(SubMenu.menu_id == menu_id),
+            SubMenu,
+            search,
+            parent_id=menu_id,
+            **page_window(limit, page, cursor),
+        )
+        result = await db.execute(stmt)
+        return [(item_id, version) for item_id, version in result]
+
+    async def update_item(
+        self,
+        db: AsyncSession,
+        item_schema: schemas.SubMenuUpdate,
         item_id: int,
         menu_id: int,
         submenu_id: int,
     ) -> SubMenu:
-        valid_submenu = is_valid_submenu(db=db, menu_id=menu_id, submenu_id=submenu_id)
-        if valid_submenu:
-            update_data = item_schema.dict(exclude_unset=True)
-            item_query = db.query(SubMenu).filter(SubMenu.id == submenu_id)
-            item_query.filter(SubMenu.id == item_id).update(
-                update_data, synchronize_session=False
+        update_data = item_schema.dict(exclude_unset=True)
+        submenu = await db.scalar(
+            update(SubMenu)
+            .where(SubMenu.id == submenu_id, SubMenu.id == item_id, SubMenu.menu_id == menu_id)
+            .values({**update_data, 'version': SubMenu.version + 1})
+            .returning(SubMenu)
+            .options(selectinload(SubMenu.dishes))
+            .execution_options(populate_existing=True)
+        )
+        if submenu:
+            await db.execute(
+                update(Menu)
+                .where(Menu.id == menu_id)
+                .values({Menu.version: Menu.version + 1})
+                .execution_options(synchronize_session=False)
             )
 
-            db.commit()
-            db.refresh(valid_submenu)
-            return valid_submenu
+            await db.commit()
+            index_item(submenu)
+            return submenu
+        # Nothing was written; tell a missing menu from a missing submenu.
+        await is_valid_submenu(db=db, menu_id=menu_id, submenu_id=submenu_id)
         raise HTTPException(status_code=404, detail='submenu not found')
 
-    def delete_item(
-        self, db: Session, item_id: int, menu_id: int, submenu_id: int
+    async def delete_item(
+        self, db: AsyncSession, item_id: int, menu_id: int, submenu_id: int
     ) -> None:
-        valid_submenu = is_valid_submenu(db=db, menu_id=menu_id, submenu_id=submenu_id)
-        if valid_submenu:
-            db.query(SubMenu).filter(SubMenu.id == item_id).delete(
-                synchronize_session=False
+        dishes_count = await db.scalar(
+            delete(SubMenu)
+            .where(SubMenu.id == submenu_id, SubMenu.id == item_id, SubMenu.menu_id == menu_id)
+            .returning(SubMenu.dishes_count)
+            .execution_options(synchronize_session=False)
+        )
+        if dishes_count is None:
+            await is_valid_submenu(db=db, menu_id=menu_id, submenu_id=submenu_id)
+            return
+        # Cascaded dishes go away with the submenu, so the menu loses
+        # the submenu's whole dish counter at once.
+        await db.execute(
+            update(Menu)
+            .where(Menu.id == menu_id)
+            .values(
+                {
+                    Menu.submenus_count: Menu.submenus_count - 1,
+                    Menu.version: Menu.version + 1,
+                    Menu.dishes_count: Menu.dishes_count - dishes_count,
+                }
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        unindex_item(SubMenu, item_id)
+        reset_index(Dish)
+
+    async def create_items(
+        self, db: AsyncSession, items: List[schemas.SubMenuCreate], menu_id: int
+    ) -> Dict[str, Any]:
+        valid_menu = await is_valid_menu(db=db, menu_id=menu_id)
+        if valid_menu:
+            errors = await _batch_errors(db, SubMenu, 'submenu', items)
+            rows = [
+                {**item.dict(), 'menu_id': menu_id}
+                for index, item in enumerate(items)
+                if index not in errors
+            ]
+            submenus = []
+            if rows:
+                # Multi-row RETURNING comes back in no promised order;
+                # titles are unique, so they line results up with items.
+                result = await db.scalars(insert(SubMenu).returning(SubMenu), rows)
+                by_title = {submenu.title: submenu for submenu in result}
+                submenus = [by_title[row['title']] for row in rows]
+                await db.execute(
+                    update(Menu)
+                    .where(Menu.id == menu_id)
+                    .values(
+                        {
+                            Menu.submenus_count: Menu.submenus_count + len(submenus),
+                            Menu.version: Menu.version + 1,
+                        }
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+            for submenu in submenus:
+                set_committed_value(submenu, 'dishes', [])
+                index_item(submenu)
+            return _batch_result(submenus, errors)
+        raise HTTPException(status_code=404, detail='menu not found')
+
+    async def update_items(
+        self, db: AsyncSession, items: List[schemas.SubMenuBatchUpdate], menu_id: int
+    ) -> Dict[str, Any]:
+        valid_menu = await is_valid_menu(db=db, menu_id=menu_id)
+        if valid_menu:
+            errors = await _batch_errors(
+                db, SubMenu, 'submenu', items, SubMenu.menu_id, menu_id
             )
-            db.commit()
+            rows = [item for index, item in enumerate(items) if index not in errors]
+            submenus = []
+            if rows:
+                # An executemany through the connection: one statement
+                # for all rows, where the ORM would update them one by one.
+                conn = await db.connection()
+                await conn.execute(
+                    update(SubMenu)
+                    .where(SubMenu.id == bindparam('item_id'))
+                    .values(
+                        title=bindparam('new_title'),
+                        description=bindparam('new_description'),
+                        version=SubMenu.version + 1,
+                    ),
+                    [
+                        {
+                            'item_id': item.id,
+                            'new_title': item.title,
+                            'new_description': item.description,
+                        }
+                        for item in rows
+                    ],
+                )
+                await db.execute(
+                    update(Menu)
+                    .where(Menu.id == menu_id)
+                    .values({Menu.version: Menu.version + 1})
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+                found = await _execute_in(
+                    db,
+                    select(SubMenu)
+                    .options(selectinload(SubMenu.dishes))
+                    .execution_options(populate_existing=True),
+                    SubMenu.id,
+                    [item.id for item in rows],
+                )
+                by_id = {submenu.id: submenu for submenu, in found}
+                submenus = [by_id[item.id] for item in rows]
+            for submenu in submenus:
+                index_item(submenu)
+            return _batch_result(submenus, errors)
+        raise HTTPException(status_code=404, detail='menu not found')
+
+    async def delete_items(
+        self, db: AsyncSession, item_ids: List[int], menu_id: int
+    ) -> Dict[str, Any]:
+        valid_menu = await is_valid_menu(db=db, menu_id=menu_id)
+        if valid_menu:
+            rows = await _execute_in(
+                db,
+                delete(SubMenu)
+                .where(SubMenu.menu_id == menu_id)
+                .returning(SubMenu.id, SubMenu.dishes_count)
+                .execution_options(synchronize_session=False),
+                SubMenu.id,
+                item_ids,
+            )
+            dishes_counts = dict(rows)
+            if dishes_counts:
+                await db.execute(
+                    update(Menu)
+                    .where(Menu.id == menu_id)
+                    .values(
+                        {
+                            Menu.submenus_count: Menu.submenus_count - len(dishes_counts),
+                            Menu.dishes_count: Menu.dishes_count - sum(dishes_counts.values()),
+                            Menu.version: Menu.version + 1,
+                        }
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+
+            deleted, errors = [], {}
+            for index, item_id in enumerate(item_ids):
+                if item_id in dishes_counts:
+                    deleted.append(item_id)
+                    unindex_item(SubMenu, item_id)
+                    del dishes_counts[item_id]
+                else:
+                    errors[index] = 'submenu not found'
+            reset_index(Dish)
+            return _batch_result(deleted, errors)
+        raise HTTPException(status_code=404, detail='menu not found')
 
 
 class DishCRUD:
-    def create_item(
-        self, db: Session, item_schema: Dish, menu_id: int, submenu_id: int
-    ) -> Dish:
-        if is_valid_submenu(db=db, menu_id=menu_id, submenu_id=submenu_id):
-            db_item = Dish(**item_schema.dict(), submenu_id=submenu_id)
+    async def _touch_parents(
+        self, db: AsyncSession, submenu_id: int, delta: int = 0, menu_id: Optional[int] = None
+    ) -> bool:
+        # Moves the dish counters by delta and bumps the parents' versions.
+        # Returns False, having written nothing, if the submenu does not
+        # exist (under menu_id, when given).
+        stmt = update(SubMenu).where(SubMenu.id == submenu_id)
+        if menu_id is not None:
+            stmt = stmt.where(SubMenu.menu_id == menu_id)
+        parent_menu_id = await db.scalar(
+            stmt.values(
+                {
+                    SubMenu.dishes_count: SubMenu.dishes_count + delta,
+                    SubMenu.version: SubMenu.version + 1,
+                }
+            )
+            .returning(SubMenu.menu_id)
+            .execution_options(synchronize_session=False)
+        )
+        if parent_menu_id is None:
+            return False
+        await db.execute(
+            update(Menu)
+            .where(Menu.id == parent_menu_id)
+            .values({Menu.dishes_count: Menu.dishes_count + delta, Menu.version: Menu.version + 1})
+            .execution_options(synchronize_session=False)
+        )
+        return True
 
-            db.add(db_item)
-            db.commit()
-            db.refresh(db_item)
+    def _in_path(self, menu_id: int, submenu_id: int):
+        # Limits a dish write to the submenu in the path, if it belongs to
+        # the menu in the path.
+        return Dish.submenu_id == (
+            select(SubMenu.id)
+            .where(SubMenu.id == submenu_id, SubMenu.menu_id == menu_id)
+            .scalar_subquery()
+        )
+
+    async def create_item(
+        self, db: AsyncSession, item_schema: schemas.DishCreate, menu_id: int, submenu_id: int
+    ) -> Dish:
+        if await self._touch_parents(db, submenu_id, 1, menu_id=menu_id):
+            db_item = (await db.scalars(
+                insert(Dish).values(**item_schema.dict(), submenu_id=submenu_id).returning(Dish)
+            )).one()
+            await db.commit()
+            index_item(db_item)
             return db_item
+        await is_valid_submenu(db=db, menu_id=menu_id, submenu_id=submenu_id)
         raise HTTPException(status_code=404, detail='submenu not found')
 
-    def read_item(
-        self, db: Session, menu_id: int, submenu_id: int, dish_id: int
+    async def read_item(
+        self, db: AsyncSession, menu_id: int, submenu_id: int, dish_id: int
     ) -> Dish:
-        valid_dish = is_valid_dish(
+        valid_dish = await is_valid_dish(
             db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
         )
         if valid_dish:
             return valid_dish
         raise HTTPException(status_code=404, detail='dish not found')
 
-    # For current test
+    def _dishes_of(self, menu_id: int, submenu_id: int, *columns):
+        # Served by ix_dishes_submenu_id_id; the join only checks that the
+        # submenu belongs to the menu in the path.
+        return (
+            select(*(columns or [Dish]))
+            .join(SubMenu, SubMenu.id == Dish.submenu_id)
+            .where(Dish.submenu_id == submenu_id, SubMenu.menu_id == menu_id)
+        )
 
-    def read_items(
+    async def read_items(
         self,
-        db: Session,
+        db: AsyncSession,
+        menu_id: int,
+        submenu_id: int,
         limit: int = 20,
         page: int = 1,
         search: str = '',
-    ) -> List[Dish]:
+    ) -> List[Dict[str, Any]]:
         skip = (page - 1) * limit
-        return (
-            db.query(Dish)
-            .filter(Dish.title.contains(search))
-            .limit(limit)
-            .offset(skip)
-            .all()
+        stmt = await apply_search(
+            db,
+            self._dishes_of(menu_id, submenu_id, *DISH_COLUMNS),
+            Dish,
+            search,
+            limit=limit,
+            offset=skip,
+            parent_id=submenu_id,
         )
+        result = await db.execute(stmt)
+        return await _dish_dicts(db, list(result))
 
-    def update_item(
+    async def read_page(
         self,
-        db: Session,
-        item_schema: Dish,
+        db: AsyncSession,
+        menu_id: int,
+        submenu_id: int,
+        limit: int = 20,
+        cursor: str = '',
+        search: str = '',
+    ) -> Dict[str, Any]:
+        stmt = await apply_search(
+            db,
+            self._dishes_of(menu_id, submenu_id, *DISH_COLUMNS),
+            Dish,
+            search,
+            limit=limit + 1,
+            after=decode_cursor(cursor),
+            parent_id=submenu_id,
+        )
+        result = await db.execute(stmt)
+        return await _page_dicts(db, list(result), limit, _dish_dicts)
+
+    async def read_version(
+        self, db: AsyncSession, menu_id: int, submenu_id: int, dish_id: int
+    ) -> Optional[int]:
+        return await db.scalar(
+            self._dishes_of(menu_id, submenu_id, Dish.version).where(Dish.id == dish_id)
+        )
+
+    async def read_versions(
+        self,
+        db: AsyncSession,
+        menu_id: int,
+        submenu_id: int,
+        limit: int = 20,
+        page: int = 1,
+        search: str = '',
+        cursor: Optional[str] = None,
+    ) -> List[Tuple[int, int]]:
+        stmt = await apply_search(
+            db,
+            self._dishes_of(menu_id, submenu_id, Dish.id, Dish.version),
+            Dish,
+            search,
+            parent_id=submenu_id,
+            **page_window(limit, page, cursor),
+        )
+        result = await db.execute(stmt)
+        return [(item_id, version) for item_id, version in result]
+
+    async def update_item(
+        self,
+        db: AsyncSession,
+        item_schema: schemas.DishUpdate,
         item_id: int,
         menu_id: int,
         submenu_id: int,
         dish_id: int,
     ) -> Dish:
-        valid_dish = is_valid_dish(
-            db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
+        update_data = item_schema.dict(exclude_unset=True)
+        dish = await db.scalar(
+            update(Dish)
+            .where(Dish.id == dish_id, Dish.id == item_id, self._in_path(menu_id, submenu_id))
+            .values({**update_data, 'version': Dish.version + 1})
+            .returning(Dish)
+            .execution_options(populate_existing=True)
         )
-        if valid_dish:
-            update_data = item_schema.dict(exclude_unset=True)
-            item_query = db.query(Dish).filter(Dish.id == dish_id)
-            item_query.filter(Dish.id == item_id).update(
-                update_data, synchronize_session=False
-            )
+        if dish:
+            await self._touch_parents(db, submenu_id)
 
-            db.commit()
-            db.refresh(valid_dish)
-            return valid_dish
+            await db.commit()
+            index_item(dish)
+            return dish
+        # Nothing was written; find out which part of the path is missing.
+        await is_valid_dish(db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
         raise HTTPException(status_code=404, detail='dish not found')
 
-    def delete_item(
+    async def delete_item(
         self,
-        db: Session,
+        db: AsyncSession,
         item_id: int,
         menu_id: int,
         submenu_id: int,
         dish_id: int,
     ) -> None:
-        valid_dish = is_valid_dish(
-            db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
-        if valid_dish:
-            db.query(Dish).filter(Dish.id == item_id).delete(synchronize_session=False)
+        deleted = await db.scalar(
+            delete(Dish)
+            .where(Dish.id == dish_id, Dish.id == item_id, self._in_path(menu_id, submenu_id))
+            .returning(Dish.id)
+            .execution_options(synchronize_session=False)
+        )
+        if deleted is None:
+            await is_valid_dish(db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
+            return
+        await self._touch_parents(db, submenu_id, -1)
+
+        await db.commit()
+        unindex_item(Dish, item_id)
 
-            db.commit()
+    async def create_items(
+        self, db: AsyncSession, items: List[schemas.DishCreate], menu_id: int, submenu_id: int
+    ) -> Dict[str, Any]:
+        valid_submenu = await is_valid_submenu(
+            db=db, menu_id=menu_id, submenu_id=submenu_id
+        )
+        if valid_submenu:
+            errors = await _batch_errors(db, Dish, 'dish', items)
+            rows = [
+                {**item.dict(), 'submenu_id': submenu_id}
+                for index, item in enumerate(items)
+                if index not in errors
+            ]
+            dishes = []
+            if rows:
+                result = await db.scalars(insert(Dish).returning(Dish), rows)
+                by_title = {dish.title: dish for dish in result}
+                dishes = [by_title[row['title']] for row in rows]
+                await self._touch_parents(db, submenu_id, len(dishes))
+                await db.commit()
+            for dish in dishes:
+                index_item(dish)
+            return _batch_result(dishes, errors)
+        raise HTTPException(status_code=404, detail='submenu not found')
+
+    async def update_items(
+        self, db: AsyncSession, items: List[schemas.DishBatchUpdate], menu_id: int, submenu_id: int
+    ) -> Dict[str, Any]:
+        valid_submenu = await is_valid_submenu(
+            db=db, menu_id=menu_id, submenu_id=submenu_id
+        )
+        if valid_submenu:
+            errors = await _batch_errors(
+                db, Dish, 'dish', items, Dish.submenu_id, submenu_id
+            )
+            rows = [item for index, item in enumerate(items) if index not in errors]
+            dishes = []
+            if rows:
+                conn = await db.connection()
+                await conn.execute(
+                    update(Dish)
+                    .where(Dish.id == bindparam('item_id'))
+                    .values(
+                        title=bindparam('new_title'),
+                        description=bindparam('new_description'),
+                        price=bindparam('new_price'),
+                        version=Dish.version + 1,
+                    ),
+                    [
+                        {
+                            'item_id': item.id,
+                            'new_title': item.title,
+                            'new_description': item.description,
+                            'new_price': item.price,
+                        }
+                        for item in rows
+                    ],
+                )
+                await self._touch_parents(db, submenu_id)
+                await db.commit()
+                found = await _execute_in(
+                    db,
+                    select(Dish).execution_options(populate_existing=True),
+                    Dish.id,
+                    [item.id for item in rows],
+                )
+                by_id = {dish.id: dish for dish, in found}
+                dishes = [by_id[item.id] for item in rows]
+            for dish in dishes:
+                index_item(dish)
+            return _batch_result(dishes, errors)
+        raise HTTPException(status_code=404, detail='submenu not found')
+
+    async def delete_items(
+        self, db: AsyncSession, item_ids: List[int], menu_id: int, submenu_id: int
+    ) -> Dict[str, Any]:
+        valid_submenu = await is_valid_submenu(
+            db=db, menu_id=menu_id, submenu_id=submenu_id
+        )
+        if valid_submenu:
+            rows = await _execute_in(
+                db,
+                delete(Dish)
+                .where(Dish.submenu_id == submenu_id)
+                .returning(Dish.id)
+                .execution_options(synchronize_session=False),
+                Dish.id,
+                item_ids,
+            )
+            found = {item_id for item_id, in rows}
+            if found:
+                await self._touch_parents(db, submenu_id, -len(found))
+            await db.commit()
+
+            deleted, errors = [], {}
+            for index, item_id in enumerate(item_ids):
+                if item_id in found:
+                    deleted.append(item_id)
+                    unindex_item(Dish, item_id)
+                    found.discard(item_id)
+                else:
+                    errors[index] = 'dish not found'
+            return _batch_result(deleted, errors)
+        raise HTTPException(status_code=404, detail='submenu not found')
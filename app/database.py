@@ -1,27 +1,230 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import itertools
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+from uuid import uuid4
 
-from app.config import settings
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, PoolProxiedConnection
+
+from app import metrics, profiling
+from app.config import AppConfig, BaseConfig, settings
+from app.metrics import CHECKOUT_SECONDS
+
+logger = logging.getLogger(__name__)
 
 POSTGRES_URL = (
-    'postgresql://'
+    'postgresql+asyncpg://'
     f'{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}'
     f'@{settings.POSTGRES_HOSTNAME}:{settings.DATABASE_PORT}'
     f'/{settings.POSTGRES_DB}'
 )
 
+DATABASE_URL = settings.DATABASE_URL or POSTGRES_URL
+
+
+def timed_connect(connect: Callable[[], PoolProxiedConnection]) -> PoolProxiedConnection:
+    # Sessions check out a connection when they first run a statement, so
+    # this times the wait for a free one (or connecting) of the requests
+    # that use the database, and responses served from the cache take none.
+    start = time.perf_counter()
+    try:
+        return connect()
+    finally:
+        CHECKOUT_SECONDS.observe(time.perf_counter() - start)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def connect(self) -> PoolProxiedConnection:
+        return timed_connect(super().connect)
+
+
+class TimedNullPool(NullPool):
+    def connect(self) -> PoolProxiedConnection:
+        return timed_connect(super().connect)
+
+
+def engine_options(config: BaseConfig, url: str) -> Dict[str, Any]:
+    options: Dict[str, Any] = {'echo': config.DATABASE_ECHO}
+    if not isinstance(config, AppConfig):
+        # The test client runs every request in its own event loop and async
+        # connections cannot move between loops, so tests do not pool.
+        options['poolclass'] = TimedNullPool
+    elif url.startswith('sqlite'):
+        # Opening the database file is cheap and there is no server to keep
+        # connections to, nor pool options to apply.
+        options['poolclass'] = TimedNullPool
+    elif config.DATABASE_PGBOUNCER:
+        # PgBouncer pools the connections and runs each transaction on any
+        # server connection, which may not hold the statements asyncpg
+        # prepared on another one: prepare under unique names, reuse none.
+        options['poolclass'] = TimedNullPool
+        if url.startswith('postgresql+asyncpg'):
+            options['connect_args'] = {
+                'statement_cache_size': 0,
+                'prepared_statement_cache_size': 0,
+                'prepared_statement_name_func': lambda: f'__asyncpg_{uuid4()}__',
+            }
+    else:
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=config.DATABASE_POOL_SIZE,
+            max_overflow=config.DATABASE_MAX_OVERFLOW,
+            pool_timeout=config.DATABASE_POOL_TIMEOUT,
+            pool_pre_ping=config.DATABASE_POOL_PRE_PING,
+            pool_recycle=config.DATABASE_POOL_RECYCLE,
+        )
+    return options
+
+
+class PoolMonitor:
+    # Counts connections checked out of an engine's pool, for GET
+    # /api/v1/db/stats. capacity is None when connections are not pooled.
+    # A checkout that takes the last free connection is saturated: the
+    # next request waits up to the pool timeout for one to come back.
+    def __init__(self, engine: Engine, capacity: Optional[int] = None) -> None:
+        self.capacity = capacity
+        self.checked_out = 0
+        self.peak = 0
+        self.checkouts = 0
+        self.saturated = 0
+        event.listen(engine, 'checkout', self.on_checkout)
+        event.listen(engine, 'checkin', self.on_checkin)
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        self.checked_out += 1
+        self.checkouts += 1
+        self.peak = max(self.peak, self.checked_out)
+        if self.checked_out == self.capacity:
+            self.saturated += 1
+
+    def on_checkin(self, dbapi_connection, connection_record) -> None:
+        self.checked_out -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'capacity': self.capacity,
+            'checked_out': self.checked_out,
+            'peak_checked_out': self.peak,
+            'checkouts': self.checkouts,
+            'saturated_checkouts': self.saturated,
+            'saturation': self.checked_out / self.capacity if self.capacity else 0.0,
+        }
+
+
+options = engine_options(settings, DATABASE_URL)
+engine = create_async_engine(DATABASE_URL, **options)
+pool_monitor = PoolMonitor(
+    engine.sync_engine,
+    capacity=options['pool_size'] + options['max_overflow'] if 'pool_size' in options else None,
+)
+metrics.instrument_engine(engine.sync_engine)
+profiling.instrument_engine(engine.sync_engine)
 
-engine = create_engine(POSTGRES_URL, echo=True, pool_size=10, max_overflow=20)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def enable_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+if engine.dialect.name == 'sqlite':
+    event.listen(engine.sync_engine, 'connect', enable_foreign_keys)
+
+
+# Responses are serialized after commit and an async session cannot
+# lazily reload expired attributes at that point.
+SessionLocal = async_sessionmaker(
+    autoflush=False, bind=engine, expire_on_commit=False
+)
 
 Base = declarative_base()
 
 
-def get_db():
+async def init_models(drop: bool = False) -> None:
+    async with engine.begin() as conn:
+        if drop:
+            await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+# A replica that fails to connect or loses its connection is left out for
+# this many seconds.
+REPLICA_RETRY = 30
+# Set by writes; while it lasts, the client reads from the primary and so
+# sees its own writes even when the replicas trail behind.
+PRIMARY_COOKIE = 'menu_read_primary'
+
+
+class Replicas:
+    # Round-robin over the replica engines, skipping the ones that failed
+    # recently. Sessions connect on first use, like the primary's, and a
+    # replica is marked down when that fails (see get_read_db); the request
+    # that found it down gets the error.
+    def __init__(self, engines: List[AsyncEngine]) -> None:
+        self.engines = engines
+        self.down_until = [0.0] * len(engines)
+        self.turns = itertools.count()
+
+    def mark_down(self, index: int) -> None:
+        logger.warning(f'Read replica {self.engines[index].url!r} failed, using the others for {REPLICA_RETRY} s')
+        self.down_until[index] = time.monotonic() + REPLICA_RETRY
+
+    def session(self) -> Optional[AsyncSession]:
+        start = next(self.turns)
+        for offset in range(len(self.engines)):
+            index = (start + offset) % len(self.engines)
+            if self.down_until[index] <= time.monotonic():
+                return SessionLocal(bind=self.engines[index], info={'replica': index})
+        return None
+
+
+replicas = Replicas([
+    create_async_engine(url, **engine_options(settings, url)) for url in settings.DATABASE_REPLICA_URLS
+])
+for replica in replicas.engines:
+    metrics.instrument_engine(replica.sync_engine)
+    profiling.instrument_engine(replica.sync_engine)
+
+
+async def get_db(response: Response):
+    if replicas.engines:
+        response.set_cookie(PRIMARY_COOKIE, '1', max_age=settings.DATABASE_REPLICA_LAG, httponly=True)
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
+
+
+async def get_read_db(request: Request):
+    # For read-only endpoints: a replica session, or the primary when the
+    # client wrote recently or no replica is available.
+    db = None
+    if replicas.engines and PRIMARY_COOKIE not in request.cookies:
+        db = replicas.session()
+    if db is None:
+        db = SessionLocal()
+    try:
+        yield db
+    except OSError:
+        if 'replica' in db.info:
+            replicas.mark_down(db.info['replica'])
+        raise
+    except DBAPIError as exc:
+        # A statement of None means the connection could not be opened.
+        if 'replica' in db.info and (exc.connection_invalidated or exc.statement is None):
+            replicas.mark_down(db.info['replica'])
+        raise
+    finally:
+        await db.close()
@@ -0,0 +1,295 @@
+import codecs
+import csv
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    func,
+    insert,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.models import Dish, Menu, SubMenu
+from app.search import reset_index
+from app.validation import parse_price
+
+# Bulk import of menus, submenus and dishes from the rows GET /export
+# produces (ids are ignored; parents are found by title). The upload is
+# parsed as it arrives and loaded into a temporary staging table, with COPY
+# on Postgres and chunked executemany elsewhere, then upserted into the
+# real tables by title with a few set-based statements. Memory use depends
+# on the chunk size, not on the size of the upload.
+
+IMPORT_CHUNK_SIZE = 10_000
+# Rejected rows are counted, but only the first few are reported.
+IMPORT_MAX_ERRORS = 100
+
+COLUMNS = (
+    'menu_title',
+    'menu_description',
+    'submenu_title',
+    'submenu_description',
+    'dish_title',
+    'dish_description',
+    'dish_price',
+)
+
+staging = Table(
+    'import_rows',
+    MetaData(),
+    Column('n', Integer, primary_key=True),
+    *(Column(column, String) for column in COLUMNS[:-1]),
+    Column('dish_price', Numeric(5, 2)),
+    prefixes=['TEMPORARY'],
+)
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    tail = ''
+    try:
+        async for chunk in chunks:
+            lines = (tail + decoder.decode(chunk)).split('\n')
+            tail = lines.pop()
+            for line in lines:
+                yield line
+        tail += decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail='upload is not valid UTF-8')
+    if tail:
+        yield tail
+
+
+async def _ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    async for line in lines:
+        if line.strip():
+            try:
+                row = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                row = None
+            yield row if isinstance(row, dict) else None
+
+
+async def _csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    # A record ends at a line break outside quotes, i.e. once the quotes
+    # seen so far are balanced (escaped quotes are doubled).
+    header = None
+    record: List[str] = []
+    quotes = 0
+    async for line in lines:
+        record.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        values: List[str] = next(csv.reader(['\n'.join(record)]), [])
+        record, quotes = [], 0
+        if header is None:
+            header = values
+            if 'menu_title' not in header:
+                raise HTTPException(status_code=400, detail='menu_title column is required')
+        elif any(values):
+            yield dict(zip(header, values))
+
+
+def _record(row: Optional[Dict[str, Any]]) -> Tuple[Any, ...]:
+    # Validates a parsed row; raises ValueError with the reason it is rejected.
+    if row is None:
+        raise ValueError('row is not a JSON object')
+    # Empty CSV fields and missing keys both mean no value.
+    values = {column: row.get(column) for column in COLUMNS}
+    for column, value in values.items():
+        if value == '':
+            values[column] = None
+        elif value is not None and not isinstance(value, str) and column != 'dish_price':
+            raise ValueError(f'{column} must be a string')
+    if values['menu_title'] is None:
+        raise ValueError('menu_title is required')
+    if values['dish_title'] is not None:
+        if values['submenu_title'] is None:
+            raise ValueError('submenu_title is required for a dish')
+        try:
+            values['dish_price'] = parse_price(values['dish_price'])
+        except ValueError as exc:
+            raise ValueError(f'dish_{exc}')
+    else:
+        values['dish_price'] = None
+    return tuple(values[column] for column in COLUMNS)
+
+
+async def _records(
+    rows: AsyncIterator[Optional[Dict[str, Any]]], report: Dict[str, Any]
+) -> AsyncIterator[Tuple[Any, ...]]:
+    index = 0
+    async for row in rows:
+        try:
+            record = _record(row)
+        except ValueError as exc:
+            report['skipped'] += 1
+            if len(report['errors']) < IMPORT_MAX_ERRORS:
+                report['errors'].append({'index': index, 'detail': str(exc)})
+        else:
+            report['rows'] += 1
+            yield record
+        index += 1
+
+
+async def _load(conn: AsyncConnection, records: AsyncIterator[Tuple[Any, ...]]) -> None:
+    if conn.dialect.name == 'postgresql':
+        raw = await conn.get_raw_connection()
+        assert raw.driver_connection is not None
+        await raw.driver_connection.copy_records_to_table(
+            staging.name, records=records, columns=COLUMNS
+        )
+        # Temporary tables are never analyzed automatically.
+        await conn.execute(text(f'ANALYZE {staging.name}'))
+        return
+
+    chunk = []
+    async for record in records:
+        chunk.append(dict(zip(COLUMNS, record)))
+        if len(chunk) == IMPORT_CHUNK_SIZE:
+            await conn.execute(insert(staging), chunk)
+            chunk = []
+    if chunk:
+        await conn.execute(insert(staging), chunk)
+
+
+def _latest(title):
+    # The last row mentioning each title wins.
+    return select(func.max(staging.c.n)).where(title.is_not(None)).group_by(title)
+
+
+def _description(model, title, description):
+    # A row without a description keeps the stored one; new rows get ''.
+    stored = select(model.description).where(model.title == title).scalar_subquery()
+    return func.coalesce(description, stored, '')
+
+
+async def _upsert(conn: AsyncConnection) -> Dict[str, int]:
+    dialect_insert: Callable[..., Any] = postgresql.insert if conn.dialect.name == 'postgresql' else sqlite.insert
+    rows = staging.c
+
+    stmt = dialect_insert(Menu).from_select(
+        ['title', 'description'],
+        select(rows.menu_title, _description(Menu, rows.menu_title, rows.menu_description))
+        .where(rows.n.in_(_latest(rows.menu_title))),
+    )
+    menus = await conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[Menu.title],
+            set_={'description': stmt.excluded.description, 'version': Menu.version + 1},
+        )
+    )
+
+    stmt = dialect_insert(SubMenu).from_select(
+        ['title', 'description', 'menu_id'],
+        select(rows.submenu_title, _description(SubMenu, rows.submenu_title, rows.submenu_description), Menu.id)
+        .join(Menu, Menu.title == rows.menu_title)
+        .where(rows.n.in_(_latest(rows.submenu_title))),
+    )
+    submenus = await conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[SubMenu.title],
+            set_={
+                'description': stmt.excluded.description,
+                'menu_id': stmt.excluded.menu_id,
+                'version': SubMenu.version + 1,
+            },
+        )
+    )
+
+    stmt = dialect_insert(Dish).from_select(
+        ['title', 'description', 'price', 'submenu_id'],
+        select(
+            rows.dish_title,
+            _description(Dish, rows.dish_title, rows.dish_description),
+            rows.dish_price,
+            SubMenu.id,
+        )
+        .join(SubMenu, SubMenu.title == rows.submenu_title)
+        .where(rows.n.in_(_latest(rows.dish_title))),
+    )
+    dishes = await conn.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[Dish.title],
+            set_={
+                'description': stmt.excluded.description,
+                'price': stmt.excluded.price,
+                'submenu_id': stmt.excluded.submenu_id,
+                'version': Dish.version + 1,
+            },
+        )
+    )
+    return {'menus': menus.rowcount, 'submenus': submenus.rowcount, 'dishes': dishes.rowcount}
+
+
+async def _recount(conn: AsyncConnection) -> None:
+    # Counters of the parents that gained or lost children, and versions
+    # of every parent the upload mentions, since something below it may
+    # have changed. The title lists are distinct so that Postgres can hash
+    # them instead of rescanning the staging table for every parent.
+    dishes_count = (
+        select(func.count(Dish.id)).where(Dish.submenu_id == SubMenu.id).scalar_subquery()
+    )
+    await conn.execute(
+        update(SubMenu)
+        .where(
+            or_(
+                SubMenu.title.in_(select(staging.c.submenu_title).distinct()),
+                SubMenu.dishes_count != dishes_count,
+            )
+        )
+        .values(dishes_count=dishes_count, version=SubMenu.version + 1)
+    )
+    submenus_count = (
+        select(func.count(SubMenu.id)).where(SubMenu.menu_id == Menu.id).scalar_subquery()
+    )
+    menu_dishes_count = (
+        select(func.coalesce(func.sum(SubMenu.dishes_count), 0))
+        .where(SubMenu.menu_id == Menu.id)
+        .scalar_subquery()
+    )
+    await conn.execute(
+        update(Menu)
+        .where(
+            or_(
+                Menu.title.in_(select(staging.c.menu_title).distinct()),
+                Menu.submenus_count != submenus_count,
+                Menu.dishes_count != menu_dishes_count,
+            )
+        )
+        .values(
+            submenus_count=submenus_count,
+            dishes_count=menu_dishes_count,
+            version=Menu.version + 1,
+        )
+    )
+
+
+async def import_catalogue(
+    db: AsyncSession, chunks: AsyncIterator[bytes], format: str = 'ndjson'
+) -> Dict[str, Any]:
+    # Everything happens in one transaction: a failed import changes nothing.
+    report: Dict[str, Any] = {'rows': 0, 'skipped': 0, 'errors': []}
+    parse = _csv_rows if format == 'csv' else _ndjson_rows
+    conn = await db.connection()
+    await conn.run_sync(staging.create)
+    await _load(conn, _records(parse(_lines(chunks)), report))
+    report.update(await _upsert(conn))
+    await _recount(conn)
+    await conn.run_sync(staging.drop)
+    await db.commit()
+    reset_index(Menu, SubMenu, Dish)
+    return report
@@ -1,24 +1,65 @@
+import asyncio
+from typing import Any, Dict
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from redis import asyncio as aioredis
+from starlette.responses import Response
 
-from app import models
+from app import models  # noqa: F401 (registers the tables on Base.metadata)
+from app.cache import OrjsonCoder, TieredBackend
+from app.compression import CompressionMiddleware
 from app.config import settings
-from app.database import engine
-from app.menu_endpoints import dish, menu, submenu
-
-models.Base.metadata.create_all(bind=engine)
+from app.database import engine, pool_monitor
+from app.menu_endpoints import dish, export, imports, menu, submenu, tree
+from app.metrics import MetricsMiddleware, register_stats
+from app.profiling import ProfilingMiddleware
+from app.profiling import router as profiling_router
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 
 @app.on_event('startup')
 async def startup():
     redis = aioredis.from_url(
-        f'redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}', encoding='utf8', decode_responses=True)
-    FastAPICache.init(RedisBackend(redis), prefix='fastapi-cache')
+        f'redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}')
+    backend = TieredBackend(redis, maxsize=settings.CACHE_L1_MAXSIZE, ttl=settings.CACHE_L1_TTL)
+    FastAPICache.init(backend, prefix='fastapi-cache', coder=OrjsonCoder)
+    app.state.cache_backend = backend
+    app.state.cache_listener = asyncio.create_task(backend.listen())
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    listener = getattr(app.state, 'cache_listener', None)
+    if listener:
+        listener.cancel()
+
+
+def _cache_stats() -> Dict[str, Any]:
+    backend = getattr(app.state, 'cache_backend', None)
+    return backend.stats() if backend else {}
+
+
+@app.get('/api/v1/cache/stats', tags=['Cache'])
+async def cache_stats() -> Dict[str, Any]:
+    return _cache_stats()
+
+
+@app.get('/api/v1/db/stats', tags=['Database'])
+async def db_stats() -> Dict[str, Any]:
+    return pool_monitor.stats()
+
+
+register_stats(_cache_stats, pool_monitor.stats)
+
+
+@app.get('/metrics', name='metrics', include_in_schema=False)
+async def metrics() -> Response:
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 origins = [
@@ -32,8 +73,15 @@ app.add_middleware(
     allow_methods=['*'],
     allow_headers=['*'],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware, engine=engine)
+app.add_middleware(MetricsMiddleware)
 
 
 app.include_router(menu.router, tags=['Menu'], prefix='/api/v1')
 app.include_router(submenu.router, tags=['Submenu'], prefix='/api/v1')
 app.include_router(dish.router, tags=['Dish'], prefix='/api/v1')
+app.include_router(tree.router, tags=['Tree'], prefix='/api/v1')
+app.include_router(export.router, tags=['Export'], prefix='/api/v1')
+app.include_router(imports.router, tags=['Import'], prefix='/api/v1')
+app.include_router(profiling_router, tags=['Profiling'], prefix='/api/v1')
@@ -1,27 +1,18 @@
-import os
-from typing import List
+from typing import List, Optional, Union
 
-from fastapi import APIRouter, Depends
-from fastapi_cache.decorator import cache
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import schemas
+from app.cache import batch_write_tags, get_cache, invalidate, write_tags
 from app.crud import DishCRUD
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models import Dish
 
 router = APIRouter()
 
 
-def get_cache(expire=60):
-    if os.environ.get('MENU_ENV') == 'app':
-        return cache(expire=expire)
-    else:
-        def no_cache_decorator(func):
-            return func
-        return no_cache_decorator
-
-
 dish_crud = DishCRUD()
 
 
@@ -38,25 +29,41 @@ async def create_dish(
     menu_id: int,
     submenu_id: int,
     item_schema: schemas.DishCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> Dish:
-    new_dish = dish_crud.create_item(
+    new_dish = await dish_crud.create_item(
         db=db, item_schema=item_schema, menu_id=menu_id, submenu_id=submenu_id
     )
+    await invalidate(*write_tags(menu_id, submenu_id))
     return new_dish
 
 
 @router.get(
     '/menus/{menu_id}/submenus/{submenu_id}/dishes/',
     name='get_dishes',
-    response_model=List[schemas.Dish],
+    response_model=Union[List[schemas.Dish], schemas.DishPage],
+)
+@get_cache(
+    tags=('submenu:{submenu_id}', 'menu:{menu_id}:deleted'),
+    versions=dish_crud.read_versions,
 )
-@get_cache(expire=60)
 async def read_dishes(
-    db: Session = Depends(get_db), limit: int = 10, page: int = 1, search: str = ''
-) -> List[Dish]:
-    dishes = dish_crud.read_items(db=db, limit=limit, page=page, search=search)
-    return dishes
+    menu_id: int,
+    submenu_id: int,
+    db: AsyncSession = Depends(get_read_db), limit: int = Query(10, ge=1), page: int = Query(1, ge=1), search: str = '',
+    cursor: Optional[str] = None,
+):
+    # Already shaped like the response model (see app.crud).
+    if cursor is not None:
+        return ORJSONResponse(await dish_crud.read_page(
+            db=db, menu_id=menu_id, submenu_id=submenu_id,
+            limit=limit, cursor=cursor, search=search,
+        ))
+    dishes = await dish_crud.read_items(
+        db=db, menu_id=menu_id, submenu_id=submenu_id,
+        limit=limit, page=page, search=search,
+    )
+    return ORJSONResponse(dishes)
 
 
 @router.get(
@@ -64,11 +71,14 @@ async def read_dishes(
     name='get_dish',
     response_model=schemas.Dish,
 )
-@get_cache(expire=60)
+@get_cache(
+    tags=('dish:{dish_id}', 'submenu:{submenu_id}:deleted', 'menu:{menu_id}:deleted'),
+    versions=dish_crud.read_version,
+)
 async def read_dish(
-    menu_id: int, submenu_id: int, dish_id: int, db: Session = Depends(get_db)
+    menu_id: int, submenu_id: int, dish_id: int, db: AsyncSession = Depends(get_read_db)
 ) -> Dish:
-    dish = dish_crud.read_item(
+    dish = await dish_crud.read_item(
         db=db, submenu_id=submenu_id, menu_id=menu_id, dish_id=dish_id
     )
     return dish
@@ -84,9 +94,9 @@ async def update_dish(
     submenu_id: int,
     dish_id: int,
     item_schema: schemas.DishUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> Dish:
-    updated_dish = dish_crud.update_item(
+    updated_dish = await dish_crud.update_item(
         db=db,
         item_id=dish_id,
         submenu_id=submenu_id,
@@ -94,6 +104,7 @@ async def update_dish(
         dish_id=dish_id,
         item_schema=item_schema,
     )
+    await invalidate(*write_tags(menu_id, submenu_id, dish_id))
 
     return updated_dish
 
@@ -102,8 +113,65 @@ async def update_dish(
     '/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}', name='delete_dish'
 )
 async def delete_dish(
-    menu_id: int, submenu_id: int, dish_id: int, db: Session = Depends(get_db)
+    menu_id: int, submenu_id: int, dish_id: int, db: AsyncSession = Depends(get_db)
 ) -> None:
-    return dish_crud.delete_item(
+    await dish_crud.delete_item(
         db=db, item_id=dish_id, submenu_id=submenu_id, menu_id=menu_id, dish_id=dish_id
     )
+    await invalidate(*write_tags(menu_id, submenu_id, dish_id, deleted=True))
+
+
+@router.post(
+    '/menus/{menu_id}/submenus/{submenu_id}/dishes:batch',
+    name='post_dishes_batch',
+    response_model=schemas.DishBatch,
+)
+async def create_dishes(
+    menu_id: int,
+    submenu_id: int,
+    items: List[schemas.DishCreate],
+    db: AsyncSession = Depends(get_db),
+):
+    result = await dish_crud.create_items(
+        db=db, items=items, menu_id=menu_id, submenu_id=submenu_id
+    )
+    await invalidate(*write_tags(menu_id, submenu_id))
+    return result
+
+
+@router.patch(
+    '/menus/{menu_id}/submenus/{submenu_id}/dishes:batch',
+    name='patch_dishes_batch',
+    response_model=schemas.DishBatch,
+)
+async def update_dishes(
+    menu_id: int,
+    submenu_id: int,
+    items: List[schemas.DishBatchUpdate],
+    db: AsyncSession = Depends(get_db),
+):
+    result = await dish_crud.update_items(
+        db=db, items=items, menu_id=menu_id, submenu_id=submenu_id
+    )
+    await invalidate(
+        *batch_write_tags(menu_id, submenu_id, [item.id for item in result['items']])
+    )
+    return result
+
+
+@router.delete(
+    '/menus/{menu_id}/submenus/{submenu_id}/dishes:batch',
+    name='delete_dishes_batch',
+    response_model=schemas.BatchDelete,
+)
+async def delete_dishes(
+    menu_id: int,
+    submenu_id: int,
+    item_ids: List[int],
+    db: AsyncSession = Depends(get_db),
+):
+    result = await dish_crud.delete_items(
+        db=db, item_ids=item_ids, menu_id=menu_id, submenu_id=submenu_id
+    )
+    await invalidate(*batch_write_tags(menu_id, submenu_id, result['items'], deleted=True))
+    return result
@@ -0,0 +1,87 @@
+import csv
+import io
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, Optional, Sequence
+
+import orjson
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import MenuCRUD
+from app.database import get_read_db
+
+router = APIRouter()
+
+menu_crud = MenuCRUD()
+
+# Rows fetched from the server-side cursor and sent per chunk; memory use
+# depends on this, not on the size of the catalogue.
+EXPORT_CHUNK_SIZE = 1000
+
+FIELDS = (
+    'menu_id',
+    'menu_title',
+    'menu_description',
+    'submenu_id',
+    'submenu_title',
+    'submenu_description',
+    'dish_id',
+    'dish_title',
+    'dish_description',
+    'dish_price',
+)
+
+
+class ExportFormat(str, Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
+
+
+# EXPORT
+
+
+def _str(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def row_to_dict(row: Row) -> Dict[str, Any]:
+    # Ids and prices as strings, like the rest of the API.
+    values = dict(zip(FIELDS, row))
+    for field in ('menu_id', 'submenu_id', 'dish_id', 'dish_price'):
+        values[field] = _str(values[field])
+    return values
+
+
+async def ndjson_chunks(chunks: AsyncIterator[Sequence[Row]]) -> AsyncIterator[bytes]:
+    async for rows in chunks:
+        yield b''.join(orjson.dumps(row_to_dict(row)) + b'\n' for row in rows)
+
+
+async def csv_chunks(chunks: AsyncIterator[Sequence[Row]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    yield buffer.getvalue().encode()
+    async for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(row_to_dict(row).values() for row in rows)
+        yield buffer.getvalue().encode()
+
+
+@router.get('/export', name='get_export', response_class=StreamingResponse)
+async def export_catalogue(
+    format: ExportFormat = ExportFormat.ndjson, db: AsyncSession = Depends(get_read_db)
+) -> StreamingResponse:
+    rows = menu_crud.stream_catalogue(db=db, chunk_size=EXPORT_CHUNK_SIZE)
+    if format == ExportFormat.csv:
+        body, media_type = csv_chunks(rows), 'text/csv'
+    else:
+        body, media_type = ndjson_chunks(rows), 'application/x-ndjson'
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="menus.{format.value}"'},
+    )
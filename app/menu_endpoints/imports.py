@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.cache import CATALOGUE_TAG, invalidate
+from app.database import get_db
+from app.importer import import_catalogue
+from app.menu_endpoints.export import ExportFormat
+
+router = APIRouter()
+
+
+# IMPORT
+
+
+@router.post('/import', name='post_import', response_model=schemas.ImportReport)
+async def import_menus(
+    request: Request, format: ExportFormat = ExportFormat.ndjson, db: AsyncSession = Depends(get_db)
+):
+    # The body is the upload itself (not a multipart form), read as it
+    # arrives.
+    report = await import_catalogue(db=db, chunks=request.stream(), format=format.value)
+    await invalidate(CATALOGUE_TAG)
+    return report
@@ -1,27 +1,18 @@
-import os
-from typing import List
+from typing import List, Optional, Union
 
-from fastapi import APIRouter, Depends
-from fastapi_cache.decorator import cache
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import schemas
+from app.cache import get_cache, invalidate, write_tags
 from app.crud import MenuCRUD
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models import Menu
 
 router = APIRouter()
 
 
-def get_cache(expire=60):
-    if os.environ.get('MENU_ENV') == 'app':
-        return cache(expire=expire)
-    else:
-        def no_cache_decorator(func):
-            return func
-        return no_cache_decorator
-
-
 menu_crud = MenuCRUD()
 
 
@@ -29,51 +20,55 @@ menu_crud = MenuCRUD()
 
 
 @router.post('/menus/', name='post_menu', status_code=201, response_model=schemas.Menu)
-def create_menu(item_schema: schemas.MenuCreate, db: Session = Depends(get_db)) -> Menu:
-    new_menu = menu_crud.create_item(db=db, item_schema=item_schema)
+async def create_menu(item_schema: schemas.MenuCreate, db: AsyncSession = Depends(get_db)) -> Menu:
+    new_menu = await menu_crud.create_item(db=db, item_schema=item_schema)
+    await invalidate('menus')
     return new_menu
 
 
-@router.get('/menus/', name='get_menus', response_model=List[schemas.MenuReponse])
-@get_cache(expire=60)
-def read_menus(
-    db: Session = Depends(get_db), limit: int = 10, page: int = 1, search: str = ''
-) -> List[Menu]:
-    menus = menu_crud.read_items(db=db, limit=limit, page=page, search=search)
-    for menu in menus:
-        menu.submenus_count = len(menu.submenus)
-        menu.dishes_count = sum(len(submenu.dishes) for submenu in menu.submenus)
-    return menus
+@router.get(
+    '/menus/',
+    name='get_menus',
+    response_model=Union[List[schemas.MenuReponse], schemas.MenuPage],
+)
+@get_cache(tags=('menus',), versions=menu_crud.read_versions)
+async def read_menus(
+    db: AsyncSession = Depends(get_read_db), limit: int = Query(10, ge=1), page: int = Query(1, ge=1), search: str = '',
+    cursor: Optional[str] = None,
+):
+    # Already shaped like the response model (see app.crud).
+    if cursor is not None:
+        return ORJSONResponse(await menu_crud.read_page(db=db, limit=limit, cursor=cursor, search=search))
+    menus = await menu_crud.read_items(db=db, limit=limit, page=page, search=search)
+    return ORJSONResponse(menus)
 
 
 @router.get('/menus/{menu_id}', name='get_menu', response_model=schemas.MenuReponse)
-@get_cache(expire=60)
-async def read_menu(menu_id: int, db: Session = Depends(get_db)):
-    menu = menu_crud.read_item(db=db, menu_id=menu_id)
-
-    menu.submenus_count = len(menu.submenus)
-    menu.dishes_count = sum(len(submenu.dishes) for submenu in menu.submenus)
-
+@get_cache(tags=('menu:{menu_id}',), versions=menu_crud.read_version)
+async def read_menu(menu_id: int, db: AsyncSession = Depends(get_read_db)):
+    menu = await menu_crud.read_item(db=db, menu_id=menu_id)
     return menu
 
 
 @router.patch('/menus/{menu_id}', name='patch_menu', response_model=schemas.Menu)
 async def update_menu(
-    menu_id: int, item_schema: schemas.MenuUpdate, db: Session = Depends(get_db)
+    menu_id: int, item_schema: schemas.MenuUpdate, db: AsyncSession = Depends(get_db)
 ) -> Menu:
-    updated_menu = menu_crud.update_item(
+    updated_menu = await menu_crud.update_item(
         db=db,
         item_schema=item_schema,
         item_id=menu_id,
         menu_id=menu_id,
     )
+    await invalidate(*write_tags(menu_id))
     return updated_menu
 
 
 @router.delete('/menus/{menu_id}', name='delete_menu')
-async def delete_menu(menu_id: int, db: Session = Depends(get_db)) -> None:
-    return menu_crud.delete_item(
+async def delete_menu(menu_id: int, db: AsyncSession = Depends(get_db)) -> None:
+    await menu_crud.delete_item(
         db=db,
         item_id=menu_id,
         menu_id=menu_id,
     )
+    await invalidate(*write_tags(menu_id, deleted=True))
@@ -1,27 +1,18 @@
-import os
-from typing import List
+from typing import List, Optional, Union, cast
 
-from fastapi import APIRouter, Depends
-from fastapi_cache.decorator import cache
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import schemas
+from app.cache import batch_write_tags, get_cache, invalidate, write_tags
 from app.crud import SubmenuCRUD
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models import SubMenu
 
 router = APIRouter()
 
 
-def get_cache(expire=60):
-    if os.environ.get('MENU_ENV') == 'app':
-        return cache(expire=expire)
-    else:
-        def no_cache_decorator(func):
-            return func
-        return no_cache_decorator
-
-
 submenu_crud = SubmenuCRUD()
 
 
@@ -35,11 +26,12 @@ submenu_crud = SubmenuCRUD()
     response_model=schemas.SubMenu,
 )
 async def create_submenu(
-    menu_id: int, item_schema: schemas.SubMenuCreate, db: Session = Depends(get_db)
+    menu_id: int, item_schema: schemas.SubMenuCreate, db: AsyncSession = Depends(get_db)
 ) -> SubMenu:
-    new_submenu = submenu_crud.create_item(
+    new_submenu = await submenu_crud.create_item(
         db=db, item_schema=item_schema, menu_id=menu_id
     )
+    await invalidate(*write_tags(menu_id, cast(int, new_submenu.id)))
 
     return new_submenu
 
@@ -47,16 +39,23 @@ async def create_submenu(
 @router.get(
     '/menus/{menu_id}/submenus',
     name='get_submenus',
-    response_model=List[schemas.SubMenuReponse]
+    response_model=Union[List[schemas.SubMenuReponse], schemas.SubMenuPage]
 )
-@get_cache(expire=60)
+@get_cache(tags=('menu:{menu_id}',), versions=submenu_crud.read_versions)
 async def read_submenus(
-    db: Session = Depends(get_db), limit: int = 10, page: int = 1, search: str = ''
-) -> List[SubMenu]:
-    submenus = submenu_crud.read_items(db=db, limit=limit, page=page, search=search)
-    for submenu in submenus:
-        submenu.dishes_count = len(submenu.dishes)
-    return submenus
+    menu_id: int,
+    db: AsyncSession = Depends(get_read_db), limit: int = Query(10, ge=1), page: int = Query(1, ge=1), search: str = '',
+    cursor: Optional[str] = None,
+):
+    # Already shaped like the response model (see app.crud).
+    if cursor is not None:
+        return ORJSONResponse(await submenu_crud.read_page(
+            db=db, menu_id=menu_id, limit=limit, cursor=cursor, search=search
+        ))
+    submenus = await submenu_crud.read_items(
+        db=db, menu_id=menu_id, limit=limit, page=page, search=search
+    )
+    return ORJSONResponse(submenus)
 
 
 @router.get(
@@ -64,12 +63,14 @@ async def read_submenus(
     name='get_submenu',
     response_model=schemas.SubMenuReponse,
 )
-@get_cache(expire=60)
+@get_cache(
+    tags=('submenu:{submenu_id}', 'menu:{menu_id}:deleted'),
+    versions=submenu_crud.read_version,
+)
 async def read_submenu(
-    menu_id: int, submenu_id: int, db: Session = Depends(get_db)
+    menu_id: int, submenu_id: int, db: AsyncSession = Depends(get_read_db)
 ) -> SubMenu:
-    submenu = submenu_crud.read_item(db=db, menu_id=menu_id, submenu_id=submenu_id)
-    submenu.dishes_count = len(submenu.dishes)
+    submenu = await submenu_crud.read_item(db=db, menu_id=menu_id, submenu_id=submenu_id)
     return submenu
 
 
@@ -82,23 +83,64 @@ async def update_submenu(
     menu_id: int,
     submenu_id: int,
     item_schema: schemas.SubMenuUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> SubMenu:
-    updated_menu = submenu_crud.update_item(
+    updated_menu = await submenu_crud.update_item(
         db=db,
         item_schema=item_schema,
         menu_id=menu_id,
         submenu_id=submenu_id,
         item_id=submenu_id,
     )
+    await invalidate(*write_tags(menu_id, submenu_id))
 
     return updated_menu
 
 
 @router.delete('/menus/{menu_id}/submenus/{submenu_id}')
 async def delete_submenu(
-    menu_id: int, submenu_id: int, db: Session = Depends(get_db)
+    menu_id: int, submenu_id: int, db: AsyncSession = Depends(get_db)
 ) -> None:
-    return submenu_crud.delete_item(
+    await submenu_crud.delete_item(
         db=db, menu_id=menu_id, submenu_id=submenu_id, item_id=submenu_id
     )
+    await invalidate(*write_tags(menu_id, submenu_id, deleted=True))
+
+
+@router.post(
+    '/menus/{menu_id}/submenus:batch',
+    name='post_submenus_batch',
+    response_model=schemas.SubMenuBatch,
+)
+async def create_submenus(
+    menu_id: int, items: List[schemas.SubMenuCreate], db: AsyncSession = Depends(get_db)
+):
+    result = await submenu_crud.create_items(db=db, items=items, menu_id=menu_id)
+    await invalidate(*batch_write_tags(menu_id, item_ids=[item.id for item in result['items']]))
+    return result
+
+
+@router.patch(
+    '/menus/{menu_id}/submenus:batch',
+    name='patch_submenus_batch',
+    response_model=schemas.SubMenuBatch,
+)
+async def update_submenus(
+    menu_id: int, items: List[schemas.SubMenuBatchUpdate], db: AsyncSession = Depends(get_db)
+):
+    result = await submenu_crud.update_items(db=db, items=items, menu_id=menu_id)
+    await invalidate(*batch_write_tags(menu_id, item_ids=[item.id for item in result['items']]))
+    return result
+
+
+@router.delete(
+    '/menus/{menu_id}/submenus:batch',
+    name='delete_submenus_batch',
+    response_model=schemas.BatchDelete,
+)
+async def delete_submenus(
+    menu_id: int, item_ids: List[int], db: AsyncSession = Depends(get_db)
+):
+    result = await submenu_crud.delete_items(db=db, item_ids=item_ids, menu_id=menu_id)
+    await invalidate(*batch_write_tags(menu_id, item_ids=result['items'], deleted=True))
+    return result
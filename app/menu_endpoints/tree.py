@@ -0,0 +1,28 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import schemas
+from app.crud import MenuCRUD
+from app.database import get_read_db
+
+router = APIRouter()
+
+menu_crud = MenuCRUD()
+
+
+# TREE
+
+
+@router.get('/tree', name='get_tree', response_model=List[schemas.MenuTree])
+async def read_tree(db: AsyncSession = Depends(get_read_db)) -> Response:
+    # Already shaped like the response model (see app.crud).
+    return ORJSONResponse(await menu_crud.read_tree(db=db))
+
+
+@router.get('/menus/{menu_id}/tree', name='get_menu_tree', response_model=schemas.MenuTree)
+async def read_menu_tree(menu_id: int, db: AsyncSession = Depends(get_read_db)) -> Response:
+    menus = await menu_crud.read_tree(db=db, menu_id=menu_id)
+    return ORJSONResponse(menus[0])
@@ -0,0 +1,126 @@
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from prometheus_client import Histogram
+from prometheus_client.core import REGISTRY, CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Prometheus metrics for GET /metrics. Each worker reports its own; scrape
+# them all (or run one worker per container). Requests are labelled with
+# the route name, e.g. get_menus, so paths with ids don't multiply series.
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds',
+    'Time to answer a request, including streaming the body',
+    ['route', 'method', 'status'],
+)
+REQUEST_STATEMENTS = Histogram(
+    'http_request_db_statements',
+    'SQL statements run for a request',
+    ['route'],
+    buckets=(0, 1, 2, 3, 4, 5, 7, 10, 20, 50, 100),
+)
+REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_seconds',
+    'Time a request spent running SQL statements',
+    ['route'],
+)
+CHECKOUT_SECONDS = Histogram(
+    'db_pool_checkout_seconds',
+    'Time to check out a connection from the pool (the wait for a free one, or connecting)',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+# Statements and DB time of the request being handled, if any.
+_request_db: ContextVar[Optional[Dict[str, Any]]] = ContextVar('request_db', default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    stats = _request_db.get()
+    if stats is not None:
+        stats['statements'] += 1
+        stats['seconds'] += elapsed
+
+
+def instrument_engine(engine: Engine) -> None:
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware: it adds no task per request
+    # and sees streamed bodies to the end.
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_status(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        stats = {'statements': 0, 'seconds': 0.0}
+        token = _request_db.set(stats)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_db.reset(token)
+            # The router leaves the matched route in the scope.
+            route = scope.get('route')
+            name = route.name if route is not None else 'unmatched'
+            REQUEST_SECONDS.labels(name, scope['method'], str(status)).observe(elapsed)
+            REQUEST_STATEMENTS.labels(name).observe(stats['statements'])
+            REQUEST_DB_SECONDS.labels(name).observe(stats['seconds'])
+
+
+class StatsCollector(Collector):
+    # Exposes the counters the cache backend and the pool monitor keep
+    # anyway, read when scraped.
+    def __init__(self, cache_stats: Callable[[], Dict[str, Any]], pool_stats: Callable[[], Dict[str, Any]]) -> None:
+        self.cache_stats = cache_stats
+        self.pool_stats = pool_stats
+
+    def collect(self) -> Iterator[Any]:
+        cache = self.cache_stats()
+        if cache:
+            lookups = CounterMetricFamily('cache_lookups', 'Cached route lookups by result', labels=['result'])
+            for result, key in (('l1_hit', 'l1_hits'), ('l2_hit', 'l2_hits'), ('miss', 'misses')):
+                lookups.add_metric([result], cache[key])
+            yield lookups
+            yield GaugeMetricFamily('cache_l1_entries', 'Entries in the in-process cache', value=cache['l1_size'])
+
+        pool = self.pool_stats()
+        yield GaugeMetricFamily('db_pool_checked_out', 'Connections in use', value=pool['checked_out'])
+        yield GaugeMetricFamily(
+            'db_pool_peak_checked_out', 'Most connections in use at once', value=pool['peak_checked_out']
+        )
+        if pool['capacity'] is not None:
+            yield GaugeMetricFamily('db_pool_capacity', 'Pool size plus overflow', value=pool['capacity'])
+        yield CounterMetricFamily('db_pool_checkouts', 'Connections checked out', value=pool['checkouts'])
+        yield CounterMetricFamily(
+            'db_pool_saturated_checkouts',
+            'Checkouts that took the last free connection',
+            value=pool['saturated_checkouts'],
+        )
+
+
+def register_stats(cache_stats: Callable[[], Dict[str, Any]], pool_stats: Callable[[], Dict[str, Any]]) -> None:
+    REGISTRY.register(StatsCollector(cache_stats, pool_stats))
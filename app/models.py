@@ -1,14 +1,51 @@
-from sqlalchemy import Column, ForeignKey, Integer, Numeric, String
+from sqlalchemy import DDL, Column, ForeignKey, Index, Integer, Numeric, String, event
 from sqlalchemy.orm import relationship
 
 from app.database import Base
 
 
+def has_pg_trgm(ddl, target, bind, tables=None, state=None, **kw) -> bool:
+    # pg_trgm is a contrib extension that some servers do not ship; search
+    # then falls back to an in-process index (see app.search).
+    if bind is None:
+        return True
+    return bool(
+        bind.exec_driver_sql(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        ).scalar()
+    )
+
+
+def trigram_index(name: str, column: str) -> Index:
+    return Index(
+        name, column,
+        postgresql_using='gin',
+        postgresql_ops={column: 'gin_trgm_ops'},
+    ).ddl_if(dialect='postgresql', callable_=has_pg_trgm)
+
+
+event.listen(
+    Base.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(
+        dialect='postgresql', callable_=has_pg_trgm
+    ),
+)
+
+
 class Menu(Base):
     __tablename__ = 'menus'
+    __table_args__ = (
+        trigram_index('ix_menus_title_trgm', 'title'),
+        trigram_index('ix_menus_description_trgm', 'description'),
+    )
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, unique=True, index=True)
     description = Column(String, index=True)
+    submenus_count = Column(Integer, nullable=False, default=0, server_default='0')
+    dishes_count = Column(Integer, nullable=False, default=0, server_default='0')
+    # Bumped by every write to the row or to anything nested in it.
+    version = Column(Integer, nullable=False, default=1, server_default='1')
 
     submenus = relationship(
         'SubMenu', back_populates='menu',
@@ -19,10 +56,17 @@ class Menu(Base):
 
 class SubMenu(Base):
     __tablename__ = 'submenus'
+    __table_args__ = (
+        trigram_index('ix_submenus_title_trgm', 'title'),
+        trigram_index('ix_submenus_description_trgm', 'description'),
+        Index('ix_submenus_menu_id_id', 'menu_id', 'id'),
+    )
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, unique=True, index=True)
     description = Column(String, index=True)
     menu_id = Column(Integer, ForeignKey('menus.id', ondelete='CASCADE'))
+    dishes_count = Column(Integer, nullable=False, default=0, server_default='0')
+    version = Column(Integer, nullable=False, default=1, server_default='1')
 
     menu = relationship('Menu', back_populates='submenus')
     dishes = relationship(
@@ -34,11 +78,17 @@ class SubMenu(Base):
 
 class Dish(Base):
     __tablename__ = 'dishes'
+    __table_args__ = (
+        trigram_index('ix_dishes_title_trgm', 'title'),
+        trigram_index('ix_dishes_description_trgm', 'description'),
+        Index('ix_dishes_submenu_id_id', 'submenu_id', 'id'),
+    )
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, unique=True, index=True)
     description = Column(String, index=True)
     price = Column(Numeric(5, 2))
     submenu_id = Column(Integer, ForeignKey('submenus.id', ondelete='CASCADE'))
+    version = Column(Integer, nullable=False, default=1, server_default='1')
 
     submenu = relationship(
         'SubMenu',
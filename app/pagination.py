@@ -0,0 +1,39 @@
+import base64
+import binascii
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+# Keyset pagination over the primary key. The cursor is the last id of the
+# previous page, base64 encoded so clients treat it as opaque; an empty
+# cursor starts from the beginning.
+
+
+def encode_cursor(item_id: int) -> str:
+    return base64.urlsafe_b64encode(str(item_id).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    if not cursor:
+        return 0
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail='invalid cursor')
+
+
+def page_window(limit: int, page: int = 1, cursor: Optional[str] = None) -> Dict[str, Any]:
+    # apply_search arguments selecting the rows of a page or a cursor page.
+    if cursor is None:
+        return {'limit': limit, 'offset': (page - 1) * limit}
+    return {'limit': limit + 1, 'after': decode_cursor(cursor)}
+
+
+def make_page(items: List[Any], limit: int) -> Dict[str, Any]:
+    # Callers fetch limit + 1 rows; the extra row only tells that another
+    # page exists and is never returned.
+    next_cursor: Optional[str] = None
+    if len(items) > limit:
+        items = items[:max(limit, 0)]
+        next_cursor = encode_cursor(items[-1].id) if items else None
+    return {'items': items, 'next_cursor': next_cursor}
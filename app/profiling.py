@@ -0,0 +1,177 @@
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import re
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+import orjson
+from fastapi import APIRouter, Header, HTTPException, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Opt-in profiling of single requests. With PROFILING_TOKEN set, a request
+# that sends it in the X-Profile-Token header runs under cProfile with its
+# SQL statements recorded; the slowest of them are explained afterwards.
+# The report is stored as PROFILING_DIR/<id>.json, the response carries
+# the id in X-Profile-Id, and GET /api/v1/profiles/{id} (same header)
+# returns it. Without the header a request only pays for a header lookup.
+
+PROFILE_HEADER = 'x-profile-token'
+# Statements explained per report, slowest first.
+PROFILE_EXPLAIN_COUNT = 3
+# Functions listed per report, by cumulative time.
+PROFILE_FUNCTION_COUNT = 40
+
+router = APIRouter()
+
+_profile: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar('profile', default=None)
+# cProfile hooks the whole thread, so one request is profiled at a time.
+_profiling = False
+
+
+def token_matches(token: Optional[str]) -> bool:
+    if settings.PROFILING_TOKEN is None or token is None:
+        return False
+    return hmac.compare_digest(token.encode(), settings.PROFILING_TOKEN.encode())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _profile.get() is not None:
+        conn.info.setdefault('profile_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    statements = _profile.get()
+    if statements is not None:
+        elapsed = time.perf_counter() - conn.info['profile_start'].pop()
+        if executemany:
+            # Explained with the first set of parameters.
+            parameters = parameters[0] if parameters else ()
+        statements.append(
+            {'sql': statement, 'parameters': parameters, 'executemany': executemany, 'ms': elapsed * 1000}
+        )
+
+
+def instrument_engine(engine: Engine) -> None:
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _explain_prefix(dialect: str, sql: str) -> str:
+    if dialect == 'sqlite':
+        return 'EXPLAIN QUERY PLAN '
+    # ANALYZE runs the statement; writes are only planned.
+    if sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return 'EXPLAIN (ANALYZE, BUFFERS) '
+    return 'EXPLAIN '
+
+
+async def explain(engine: AsyncEngine, statements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    slowest = sorted(statements, key=lambda statement: statement['ms'], reverse=True)[:PROFILE_EXPLAIN_COUNT]
+    plans = []
+    async with engine.connect() as conn:
+        for statement in slowest:
+            sql = statement['sql']
+            # Rolled back, so nothing an explained statement does is kept.
+            trans = await conn.begin()
+            try:
+                result = await conn.exec_driver_sql(
+                    _explain_prefix(engine.dialect.name, sql) + sql, statement['parameters']
+                )
+                plan = [' '.join(str(value) for value in row) for row in result]
+            except Exception as exc:
+                plan = [f'not explained: {exc}']
+            finally:
+                await trans.rollback()
+            plans.append({'sql': sql, 'ms': statement['ms'], 'plan': plan})
+    return plans
+
+
+def _top_functions(profiler: cProfile.Profile) -> str:
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_FUNCTION_COUNT)
+    return output.getvalue()
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp, engine: AsyncEngine) -> None:
+        self.app = app
+        self.engine = engine
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        global _profiling
+        enabled = scope['type'] == 'http' and settings.PROFILING_TOKEN is not None and not _profiling
+        if not enabled or not token_matches(Headers(scope=scope).get(PROFILE_HEADER)):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        status = 500
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                message['headers'] = [*message.get('headers', []), (b'x-profile-id', profile_id.encode())]
+            await send(message)
+
+        statements: List[Dict[str, Any]] = []
+        token = _profile.set(statements)
+        profiler = cProfile.Profile()
+        _profiling = True
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - start
+            _profiling = False
+            _profile.reset(token)
+            route = scope.get('route')
+            report = {
+                'id': profile_id,
+                'method': scope['method'],
+                'path': scope['path'],
+                'route': route.name if route is not None else None,
+                'status': status,
+                'ms': elapsed * 1000,
+                'statements': statements,
+                'explain': [],
+                'functions': _top_functions(profiler),
+            }
+            try:
+                report['explain'] = await explain(self.engine, statements)
+            except Exception:
+                logger.warning(f'Error explaining the statements of profile {profile_id}:', exc_info=True)
+            os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+            with open(os.path.join(settings.PROFILING_DIR, f'{profile_id}.json'), 'wb') as file:
+                file.write(orjson.dumps(report, default=str))
+
+
+@router.get('/profiles/{profile_id}', name='get_profile', include_in_schema=False)
+async def read_profile(profile_id: str, x_profile_token: Optional[str] = Header(None)) -> Response:
+    if not token_matches(x_profile_token):
+        raise HTTPException(status_code=403, detail='profiling is not enabled for this client')
+    # Ids are hex, which also keeps the path inside PROFILING_DIR.
+    if not re.fullmatch('[0-9a-f]{32}', profile_id):
+        raise HTTPException(status_code=404, detail='profile not found')
+    try:
+        with open(os.path.join(settings.PROFILING_DIR, f'{profile_id}.json'), 'rb') as file:
+            content = file.read()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail='profile not found')
+    return Response(content=content, media_type='application/json')
@@ -0,0 +1,74 @@
+import asyncio
+
+from fastapi_cache import FastAPICache
+from redis import asyncio as aioredis
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import (
+    CATALOGUE_TAG,
+    OrjsonCoder,
+    TieredBackend,
+    cache_enabled,
+    invalidate,
+)
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Dish, Menu, SubMenu
+
+# Rebuild the denormalized submenus_count/dishes_count counters from the
+# actual rows. Run with `python -m app.recount` to repair drift. Only the
+# rows that drifted are rewritten, and their versions bumped so that ETags
+# change; the script then invalidates the cached responses.
+
+
+async def recount(db: AsyncSession) -> int:
+    # Returns how many menus and submenus were repaired.
+    conn = await db.connection()
+    dishes_count = (
+        select(func.count(Dish.id)).where(Dish.submenu_id == SubMenu.id).scalar_subquery()
+    )
+    submenus = await conn.execute(
+        update(SubMenu)
+        .where(SubMenu.dishes_count != dishes_count)
+        .values(dishes_count=dishes_count, version=SubMenu.version + 1)
+    )
+    submenus_count = (
+        select(func.count(SubMenu.id)).where(SubMenu.menu_id == Menu.id).scalar_subquery()
+    )
+    menu_dishes_count = (
+        select(func.count(Dish.id))
+        .join(SubMenu, SubMenu.id == Dish.submenu_id)
+        .where(SubMenu.menu_id == Menu.id)
+        .scalar_subquery()
+    )
+    menus = await conn.execute(
+        update(Menu)
+        .where(
+            or_(
+                Menu.submenus_count != submenus_count,
+                Menu.dishes_count != menu_dishes_count,
+            )
+        )
+        .values(
+            submenus_count=submenus_count,
+            dishes_count=menu_dishes_count,
+            version=Menu.version + 1,
+        )
+    )
+    await db.commit()
+    return submenus.rowcount + menus.rowcount
+
+
+async def main() -> None:
+    async with SessionLocal() as db:
+        repaired = await recount(db)
+    if repaired and cache_enabled():
+        redis = aioredis.from_url(
+            f'redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}')
+        FastAPICache.init(TieredBackend(redis), prefix='fastapi-cache', coder=OrjsonCoder)
+        await invalidate(CATALOGUE_TAG)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,7 +1,29 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel
 
+# Batch Schema
+
+
+class BatchError(BaseModel):
+    index: int
+    detail: str
+
+
+class BatchDelete(BaseModel):
+    items: List[str]
+    errors: List[BatchError]
+
+
+class ImportReport(BaseModel):
+    rows: int
+    skipped: int
+    menus: int
+    submenus: int
+    dishes: int
+    errors: List[BatchError]
+
+
 # Dish Schema
 
 
@@ -27,6 +49,20 @@ class Dish(DishBase):
         orm_mode = True
 
 
+class DishPage(BaseModel):
+    items: List[Dish]
+    next_cursor: Optional[str]
+
+
+class DishBatchUpdate(DishUpdate):
+    id: int
+
+
+class DishBatch(BaseModel):
+    items: List[Dish]
+    errors: List[BatchError]
+
+
 # SubMenu Schema
 
 
@@ -56,6 +92,20 @@ class SubMenuReponse(SubMenu):
     dishes_count: int
 
 
+class SubMenuPage(BaseModel):
+    items: List[SubMenuReponse]
+    next_cursor: Optional[str]
+
+
+class SubMenuBatchUpdate(SubMenuUpdate):
+    id: int
+
+
+class SubMenuBatch(BaseModel):
+    items: List[SubMenuReponse]
+    errors: List[BatchError]
+
+
 # Menu Schema
 
 
@@ -83,3 +133,12 @@ class Menu(MenuBase):
 class MenuReponse(Menu):
     submenus_count: int
     dishes_count: int
+
+
+class MenuPage(BaseModel):
+    items: List[MenuReponse]
+    next_cursor: Optional[str]
+
+
+class MenuTree(MenuReponse):
+    submenus: List[SubMenuReponse] = []  # type: ignore[assignment]
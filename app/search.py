@@ -0,0 +1,173 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import Select, case, false, func, null, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Title/description search. On Postgres the ILIKE filter does the matching;
+# with pg_trgm it is served by the GIN trigram indexes and results are
+# ranked by similarity(), without it results stay in id order. On SQLite an
+# in-process trigram inverted index does the matching and ranking, and the
+# database only fetches the matched ids. The index lives in one process and
+# is only kept current by that process's writes, so it is not used on
+# Postgres, where several workers share the database. Submenus and dishes
+# are indexed together with their parent id so lists scoped to a parent
+# rank only the parent's rows.
+
+
+def trigrams(value: str) -> Set[str]:
+    value = value.lower()
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def similarity(left: Set[str], right: Set[str]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class TrigramIndex:
+    def __init__(self) -> None:
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        self.children: Dict[Optional[int], Set[int]] = defaultdict(set)
+        self.documents: Dict[int, Tuple[str, str, Optional[int]]] = {}
+
+    def add(
+        self, item_id: int, title: str, description: str, parent_id: Optional[int] = None
+    ) -> None:
+        self.discard(item_id)
+        title, description = (title or '').lower(), (description or '').lower()
+        self.documents[item_id] = (title, description, parent_id)
+        self.children[parent_id].add(item_id)
+        for gram in trigrams(title) | trigrams(description):
+            self.postings[gram].add(item_id)
+
+    def discard(self, item_id: int) -> None:
+        document = self.documents.pop(item_id, None)
+        if document:
+            title, description, parent_id = document
+            self.children[parent_id].discard(item_id)
+            for gram in trigrams(title) | trigrams(description):
+                self.postings[gram].discard(item_id)
+
+    def search(self, query: str, parent_id: Optional[int] = None) -> List[int]:
+        query = query.lower()
+        grams = trigrams(query)
+        if grams:
+            candidates = set.intersection(
+                *(self.postings.get(gram, set()) for gram in grams)
+            )
+        else:
+            candidates = set(self.documents)
+        if parent_id is not None:
+            candidates &= self.children.get(parent_id, set())
+
+        ranked = []
+        for item_id in candidates:
+            title, description, _ = self.documents[item_id]
+            if query in title or query in description:
+                ranked.append((-similarity(grams, trigrams(title)), item_id))
+        return [item_id for _, item_id in sorted(ranked)]
+
+
+_indexes: Dict[str, TrigramIndex] = {}
+
+_pg_trgm: Optional[bool] = None
+
+
+async def _has_pg_trgm(db: AsyncSession) -> bool:
+    global _pg_trgm
+    if _pg_trgm is None:
+        _pg_trgm = bool(
+            await db.scalar(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            )
+        )
+    return _pg_trgm
+
+
+def _parent_column(model):
+    # The foreign key to the parent table; menus have none.
+    return next(
+        (model.__table__.c[fk.parent.name] for fk in model.__table__.foreign_keys),
+        None,
+    )
+
+
+async def _load_index(db: AsyncSession, model) -> TrigramIndex:
+    index = _indexes.get(model.__tablename__)
+    if index is None:
+        index = TrigramIndex()
+        parent_column = _parent_column(model)
+        rows = await db.execute(
+            select(
+                model.id,
+                model.title,
+                model.description,
+                parent_column if parent_column is not None else null(),
+            )
+        )
+        for item_id, title, description, parent_id in rows:
+            index.add(item_id, title, description, parent_id)
+        _indexes[model.__tablename__] = index
+    return index
+
+
+def index_item(item) -> None:
+    index = _indexes.get(item.__tablename__)
+    if index is not None:
+        parent_column = _parent_column(type(item))
+        parent_id = None if parent_column is None else getattr(item, parent_column.key)
+        index.add(item.id, item.title, item.description, parent_id)
+
+
+def unindex_item(model, item_id: int) -> None:
+    index = _indexes.get(model.__tablename__)
+    if index is not None:
+        index.discard(item_id)
+
+
+def reset_index(*models) -> None:
+    # Cascaded deletes remove children we never saw; rebuild on next search.
+    for model in models:
+        _indexes.pop(model.__tablename__, None)
+
+
+async def apply_search(
+    db: AsyncSession,
+    stmt: Select,
+    model,
+    search: str,
+    limit: int,
+    offset: int = 0,
+    after: Optional[int] = None,
+    parent_id: Optional[int] = None,
+) -> Select:
+    # Adds the search filter, ordering and page window to a select of model.
+    # With `after` (keyset pagination) results stay in id order. `parent_id`
+    # must repeat the parent filter already applied to stmt.
+    if after is not None:
+        stmt = stmt.where(model.id > after)
+
+    if not search:
+        return stmt.order_by(model.id).limit(limit).offset(offset)
+
+    if db.bind.dialect.name == 'postgresql':
+        pattern = f'%{search}%'
+        stmt = stmt.where(
+            or_(model.title.ilike(pattern), model.description.ilike(pattern))
+        )
+        if after is None and await _has_pg_trgm(db):
+            stmt = stmt.order_by(func.similarity(model.title, search).desc())
+        return stmt.order_by(model.id).limit(limit).offset(offset)
+
+    index = await _load_index(db, model)
+    item_ids = index.search(search, parent_id)
+    if after is not None:
+        item_ids = sorted(item_id for item_id in item_ids if item_id > after)
+    item_ids = item_ids[offset:offset + limit]
+    if not item_ids:
+        return stmt.where(false())
+    return stmt.where(model.id.in_(item_ids)).order_by(
+        case({item_id: rank for rank, item_id in enumerate(item_ids)}, value=model.id)
+    )
@@ -1,5 +1,5 @@
 from fastapi import Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import schemas
 from app.crud import DishCRUD, MenuCRUD
@@ -25,20 +25,20 @@ class MenuService:
         self.notification = Notification()
         self.discount = Discount()
 
-    def create_menu(
-        self, item_schema: schemas.MenuCreate, db: Session = Depends(get_db)
+    async def create_menu(
+        self, item_schema: schemas.MenuCreate, db: AsyncSession = Depends(get_db)
     ) -> Menu:
-        menu = self.menu_crud.create_item(
+        menu = await self.menu_crud.create_item(
             db=db, item_schema=item_schema
         )
 
         return self.notification.send(menu)
 
-    def get_dishes(
+    async def get_dishes(
         self, menu_id: int, submenu_id: int, dish_id: int,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
     ) -> Dish:
-        dish = self.dish_crud.read_item(
+        dish = await self.dish_crud.read_item(
             db=db, submenu_id=submenu_id, menu_id=menu_id, dish_id=dish_id
         )
 
@@ -1,44 +1,85 @@
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Any
+
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Dish, Menu, SubMenu
 
+# Prices are stored as Numeric(5, 2).
+MAX_PRICE = Decimal('1000')
+
+
+def parse_price(value: Any) -> Decimal:
+    # Raises ValueError with the reason a price is rejected.
+    try:
+        price = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError('price is not a number')
+    if not price.is_finite() or not -MAX_PRICE < price.quantize(Decimal('0.01'), ROUND_HALF_UP) < MAX_PRICE:
+        raise ValueError('price is out of range')
+    return price
+
+
 # validate menu
 
 
-def is_valid_menu(db: Session, menu_id: int):
-    return db.query(Menu).filter(Menu.id == menu_id).first()
+async def is_valid_menu(db: AsyncSession, menu_id: int):
+    return await db.scalar(select(Menu).where(Menu.id == menu_id))
 
 
 # validate submenu
 
 
-def is_valid_submenu(
-    db: Session, menu_id: int, submenu_id: int
+async def is_valid_submenu(
+    db: AsyncSession, menu_id: int, submenu_id: int
 ):
-    item_query = db.query(Menu).filter(Menu.id == menu_id).first()
+    # One lookup for the whole path: the submenu is outer joined to its
+    # menu, so a missing row means the menu is gone and a NULL submenu
+    # means it does not exist under this menu.
+    item_query = (
+        await db.execute(
+            select(Menu.id, SubMenu)
+            .select_from(Menu)
+            .outerjoin(
+                SubMenu, and_(SubMenu.menu_id == Menu.id, SubMenu.id == submenu_id)
+            )
+            .where(Menu.id == menu_id)
+        )
+    ).first()
     if not item_query:
         raise HTTPException(status_code=404, detail='menu not found')
     else:
-        return db.query(SubMenu).filter(SubMenu.id == submenu_id).first()
+        return item_query[1]
 
 
 # validate dish
 
 
-def is_valid_dish(
-    db: Session,
+async def is_valid_dish(
+    db: AsyncSession,
     menu_id: int,
     submenu_id: int,
     dish_id: int
 ):
-    item_query = db.query(Menu).filter(Menu.id == menu_id).first()
+    item_query = (
+        await db.execute(
+            select(Menu.id, SubMenu.id, Dish)
+            .select_from(Menu)
+            .outerjoin(
+                SubMenu, and_(SubMenu.menu_id == Menu.id, SubMenu.id == submenu_id)
+            )
+            .outerjoin(Dish, and_(Dish.submenu_id == SubMenu.id, Dish.id == dish_id))
+            .where(Menu.id == menu_id)
+        )
+    ).first()
     if not item_query:
         raise HTTPException(status_code=404, detail='menu not found')
     else:
-        item_query = db.query(SubMenu).filter(SubMenu.id == submenu_id).first()
-        if not item_query:
+        _, found_submenu_id, dish = item_query
+        if found_submenu_id is None:
             raise HTTPException(status_code=404, detail='submenu not found')
 
         else:
-            return db.query(Dish).filter(Dish.id == dish_id).first()
+            return dish
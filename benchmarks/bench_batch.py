@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import time
+
+from app.crud import DishCRUD
+from app.database import SessionLocal
+from app.schemas import DishCreate
+from benchmarks.seed import seed
+
+# Time creating dishes one create_item call at a time and with one
+# create_items batch:
+#   python -m benchmarks.bench_batch --dishes 10000
+
+
+def make_dishes(prefix: str, count: int):
+    return [
+        DishCreate(title=f'{prefix} Dish {i}', description=f'Dish Description {i}', price='12.50')
+        for i in range(count)
+    ]
+
+
+async def main(args) -> None:
+    await seed(menus=1, submenus=2, dishes=0)
+    dish_crud = DishCRUD()
+
+    start = time.perf_counter()
+    async with SessionLocal() as db:
+        for dish in make_dishes('Single', args.single):
+            await dish_crud.create_item(db=db, item_schema=dish, menu_id=1, submenu_id=1)
+    single = (time.perf_counter() - start) / args.single * args.dishes
+
+    start = time.perf_counter()
+    async with SessionLocal() as db:
+        result = await dish_crud.create_items(
+            db=db, items=make_dishes('Batch', args.dishes), menu_id=1, submenu_id=2
+        )
+    batch = time.perf_counter() - start
+    assert len(result['items']) == args.dishes
+
+    print(f'{args.dishes} dishes')
+    print(f'{"one by one":>12}: {single:8.2f} s (extrapolated from {args.single})')
+    print(f'{"batch":>12}: {batch:8.2f} s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dishes', type=int, default=10_000)
+    parser.add_argument('--single', type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
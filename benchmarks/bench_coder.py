@@ -0,0 +1,77 @@
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict
+
+from fastapi.encoders import jsonable_encoder
+from fastapi_cache.coder import JsonCoder
+
+from app import schemas
+from app.cache import OrjsonCoder, _compress, _pack, _unpack
+
+# Stored size and per-hit cost of a cached menu detail, comparing
+# fastapi-cache's JsonCoder (decode, validate against the response model,
+# encode again on every hit) with the raw body entries app.cache stores:
+#   python -m benchmarks.bench_coder --submenus 20 --dishes 50
+
+
+def make_menu(submenus: int, dishes: int) -> Dict[str, Any]:
+    return {
+        'id': '1',
+        'title': 'Menu',
+        'description': 'Menu Description',
+        'submenus_count': submenus,
+        'dishes_count': submenus * dishes,
+        'submenus': [
+            {
+                'id': str(i),
+                'title': f'SubMenu {i}',
+                'description': f'SubMenu Description {i}',
+                'menu_id': '1',
+                'dishes': [
+                    {
+                        'id': str(i * dishes + j),
+                        'title': f'Dish {i}.{j}',
+                        'description': f'Dish Description {i}.{j}',
+                        'price': '12.50',
+                        'submenu_id': str(i),
+                    }
+                    for j in range(dishes)
+                ],
+            }
+            for i in range(submenus)
+        ],
+    }
+
+
+def timed(call: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def json_coder_hit(stored: str) -> bytes:
+    content = jsonable_encoder(schemas.MenuReponse.parse_obj(JsonCoder.decode(stored)))
+    return json.dumps(content, separators=(',', ':')).encode()
+
+
+def main(args) -> None:
+    menu = make_menu(args.submenus, args.dishes)
+    json_stored = JsonCoder.encode(menu)
+    raw_stored = _pack((None, _compress(OrjsonCoder.encode(menu).encode())), 60, 0.0)
+
+    print(f'{"":>10}  {"stored":>10}  {"per hit":>10}')
+    print(f'{"json":>10}  {len(json_stored.encode()):>8} B  {timed(lambda: json_coder_hit(json_stored), args.repeat):7.3f} ms')
+    print(f'{"raw body":>10}  {len(raw_stored):>8} B  {timed(lambda: _unpack(raw_stored), args.repeat):7.3f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--submenus', type=int, default=20)
+    parser.add_argument('--dishes', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=100)
+    main(parser.parse_args())
@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+from app import compression
+from app.main import app
+from benchmarks.seed import seed
+
+# Bytes sent and latency of the menu list and tree routes per encoding,
+# plus what the transfer adds over a slow mobile link:
+#   python -m benchmarks.bench_compression --menus 10 --submenus 10 --dishes 10 --kbps 1600
+# Latency is measured in-process; the link time is size / bandwidth.
+
+ROUTES: Dict[str, Dict[str, Any]] = {
+    'get_menus': {'limit': 100},
+    'get_tree': {},
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def measure(client: httpx.AsyncClient, url: str, params: dict, encoding: str, repeat: int):
+    timings, size = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        async with client.stream('GET', url, params=params, headers={'Accept-Encoding': encoding}) as response:
+            size = sum([len(chunk) async for chunk in response.aiter_raw()])
+        timings.append((time.perf_counter() - start) * 1000)
+    return size, percentile(timings, 0.5), percentile(timings, 0.99)
+
+
+async def main(args) -> None:
+    await seed(menus=args.menus, submenus=args.submenus, dishes=args.dishes)
+    encodings = ['identity', 'gzip'] + (['br'] if compression.brotli is not None else [])
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        for name, params in ROUTES.items():
+            for encoding in encodings:
+                size, p50, p99 = await measure(client, app.url_path_for(name), params, encoding, args.repeat)
+                link = size * 8 / args.kbps
+                print(
+                    f'{name:>10} {encoding:>8}: {size:>9} B  {p50:7.1f} ms p50  {p99:7.1f} ms p99  '
+                    f'{link:8.1f} ms on the link  {p99 + link:8.1f} ms p99 total'
+                )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--menus', type=int, default=10)
+    parser.add_argument('--submenus', type=int, default=10)
+    parser.add_argument('--dishes', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--kbps', type=float, default=1600, help='link bandwidth in kbit/s')
+    asyncio.run(main(parser.parse_args()))
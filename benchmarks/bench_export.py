@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from app.main import app
+from benchmarks.seed import seed
+
+# Time to first byte, total time and peak Python memory of a full export:
+#   python -m benchmarks.bench_export --dishes 1000000 --format csv
+# The app is called as a bare ASGI app; test clients buffer whole bodies.
+
+
+async def export(export_format: str):
+    request = {'type': 'http.request', 'body': b'', 'more_body': False}
+    disconnected = asyncio.Event()
+    start = time.perf_counter()
+    first_byte = None
+    size = 0
+
+    async def receive():
+        nonlocal request
+        if request is not None:
+            message, request = request, None
+            return message
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal first_byte, size
+        if message['type'] == 'http.response.body':
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            size += len(message.get('body', b''))
+
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': '/api/v1/export',
+        'raw_path': b'/api/v1/export',
+        'root_path': '',
+        'query_string': f'format={export_format}'.encode(),
+        'headers': [],
+        'client': ('bench', 0),
+        'server': ('bench', 80),
+    }
+    await app(scope, receive, send)
+    return first_byte, time.perf_counter() - start, size
+
+
+async def main(args) -> None:
+    submenus = max(args.dishes // 1000, 1)
+    await seed(menus=1, submenus=submenus, dishes=args.dishes // submenus)
+
+    first_byte, total, size = await export(args.format)
+    # A second run for memory; tracing allocations slows everything down.
+    tracemalloc.start()
+    await export(args.format)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'{args.dishes} dishes, {size / 2 ** 20:.1f} MB of {args.format}')
+    print(f'{"first byte":>12}: {first_byte * 1000:8.1f} ms')
+    print(f'{"total":>12}: {total:8.2f} s')
+    print(f'{"peak memory":>12}: {peak / 2 ** 20:8.1f} MB')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dishes', type=int, default=1_000_000)
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    asyncio.run(main(parser.parse_args()))
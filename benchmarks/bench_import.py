@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import resource
+import time
+from typing import AsyncIterator
+
+import orjson
+
+from app.database import SessionLocal
+from app.importer import import_catalogue
+from benchmarks.seed import seed
+
+# Import a generated NDJSON upload of menus x submenus x dishes into an
+# empty scratch database, then import it again (every row an update):
+#   python -m benchmarks.bench_import --dishes 1000000
+
+
+async def upload(menus: int, submenus: int, dishes: int, chunk_size: int = 1 << 16) -> AsyncIterator[bytes]:
+    buffer = bytearray()
+    for i in range(menus):
+        for j in range(submenus):
+            for k in range(dishes):
+                buffer += orjson.dumps({
+                    'menu_title': f'Menu {i}',
+                    'menu_description': f'Menu Description {i}',
+                    'submenu_title': f'Submenu {i}.{j}',
+                    'submenu_description': f'Submenu Description {i}.{j}',
+                    'dish_title': f'Dish {i}.{j}.{k}',
+                    'dish_description': f'Dish Description {i}.{j}.{k}',
+                    'dish_price': '9.99',
+                }) + b'\n'
+                if len(buffer) >= chunk_size:
+                    yield bytes(buffer)
+                    buffer.clear()
+    yield bytes(buffer)
+
+
+async def timed_import(args) -> float:
+    submenus = max(args.dishes // 1000, 1)
+    start = time.perf_counter()
+    async with SessionLocal() as db:
+        report = await import_catalogue(
+            db=db, chunks=upload(args.menus, submenus // args.menus or 1, args.dishes // submenus)
+        )
+    assert report['skipped'] == 0
+    return time.perf_counter() - start
+
+
+async def main(args) -> None:
+    await seed(menus=0, submenus=0, dishes=0)
+    insert = await timed_import(args)
+    upsert = await timed_import(args)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f'{args.dishes} dishes')
+    print(f'{"insert":>12}: {insert:8.2f} s')
+    print(f'{"update":>12}: {upsert:8.2f} s')
+    print(f'{"peak RSS":>12}: {peak:8.1f} MB')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dishes', type=int, default=1_000_000)
+    parser.add_argument('--menus', type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
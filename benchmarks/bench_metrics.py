@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.metrics import MetricsMiddleware, instrument_engine
+
+# What the metrics cost per request and per SQL statement, measured
+# without a database or network in the way:
+#   python -m benchmarks.bench_metrics --requests 100000
+
+
+async def endpoint(scope, receive, send) -> None:
+    scope['route'] = ROUTE
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b'{}'})
+
+
+class Route:
+    name = 'get_menus'
+
+
+ROUTE = Route()
+
+
+async def receive():
+    return {'type': 'http.request', 'body': b''}
+
+
+async def send(message) -> None:
+    pass
+
+
+async def per_request(app, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app({'type': 'http', 'method': 'GET', 'path': '/api/v1/menus/'}, receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def per_statement(instrumented: bool, statements: int) -> float:
+    engine = create_async_engine('sqlite+aiosqlite://')
+    if instrumented:
+        instrument_engine(engine.sync_engine)
+    async with engine.connect() as conn:
+        start = time.perf_counter()
+        for _ in range(statements):
+            await conn.execute(text('SELECT 1'))
+        elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return elapsed / statements * 1e6
+
+
+async def main(args) -> None:
+    bare = await per_request(endpoint, args.requests)
+    measured = await per_request(MetricsMiddleware(endpoint), args.requests)
+    print(f'{"request":>10}: {bare:7.1f} us bare, {measured:7.1f} us measured, {measured - bare:+7.1f} us')
+
+    # aiosqlite hands every statement to a thread, which is noisy: best of
+    # a few alternating runs.
+    runs = [(await per_statement(False, args.statements), await per_statement(True, args.statements)) for _ in range(5)]
+    bare, measured = (min(timings) for timings in zip(*runs))
+    print(f'{"statement":>10}: {bare:7.1f} us bare, {measured:7.1f} us measured, {measured - bare:+7.1f} us')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=100_000)
+    parser.add_argument('--statements', type=int, default=20_000)
+    asyncio.run(main(parser.parse_args()))
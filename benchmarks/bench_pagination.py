@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import select
+
+from app.crud import DishCRUD
+from app.database import SessionLocal
+from app.models import Dish
+from app.pagination import encode_cursor
+from benchmarks.seed import seed
+
+# Compare OFFSET and keyset pagination on the first and on a deep page:
+#   python -m benchmarks.bench_pagination --dishes 1000000 --page 10000
+
+
+async def timed(call, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        async with SessionLocal() as db:
+            start = time.perf_counter()
+            await call(db)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+async def main(args) -> None:
+    # One submenu holding every dish, so the deep page exists in a list.
+    await seed(menus=1, submenus=1, dishes=args.dishes)
+
+    dish_crud = DishCRUD()
+    # The cursor pointing at the same rows as the deep OFFSET page.
+    cursor = ''
+    skip = (args.page - 1) * args.limit
+    if skip:
+        async with SessionLocal() as db:
+            last_id = (
+                await db.execute(select(Dish.id).order_by(Dish.id).offset(skip - 1).limit(1))
+            ).scalar_one()
+        cursor = encode_cursor(last_id)
+
+    results = {
+        'offset page 1': await timed(
+            lambda db: dish_crud.read_items(db=db, menu_id=1, submenu_id=1, limit=args.limit, page=1), args.repeat
+        ),
+        f'offset page {args.page}': await timed(
+            lambda db: dish_crud.read_items(db=db, menu_id=1, submenu_id=1, limit=args.limit, page=args.page),
+            args.repeat,
+        ),
+        'cursor page 1': await timed(
+            lambda db: dish_crud.read_page(db=db, menu_id=1, submenu_id=1, limit=args.limit, cursor=''), args.repeat
+        ),
+        f'cursor page {args.page}': await timed(
+            lambda db: dish_crud.read_page(db=db, menu_id=1, submenu_id=1, limit=args.limit, cursor=cursor),
+            args.repeat,
+        ),
+    }
+    for name, median in results.items():
+        print(f'{name:>24}: {median:8.2f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dishes', type=int, default=1_000_000)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--page', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import select
+
+from app.crud import DishCRUD
+from app.database import SessionLocal
+from app.models import Dish
+from benchmarks.seed import seed
+
+# Search latency over a seeded dishes table, against the unindexed
+# LIKE '%x%' scan it replaces:
+#   python -m benchmarks.bench_search --dishes 100000
+
+QUERIES = ['Dish 1.7', 'description 1.42', '.99', 'no such dish']
+
+
+async def timed(call, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        async with SessionLocal() as db:
+            start = time.perf_counter()
+            await call(db)
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def like_scan(query: str, limit: int):
+    async def call(db):
+        return list(
+            await db.scalars(
+                select(Dish).where(Dish.title.contains(query)).order_by(Dish.id).limit(limit)
+            )
+        )
+    return call
+
+
+async def main(args) -> None:
+    # One submenu holding every dish, so a search covers the whole table.
+    await seed(menus=1, submenus=1, dishes=args.dishes)
+
+    dish_crud = DishCRUD()
+    # The first search may build the in-process index; keep it out of the timings.
+    async with SessionLocal() as db:
+        await dish_crud.read_items(db=db, menu_id=1, submenu_id=1, limit=args.limit, search=QUERIES[0])
+
+    for query in QUERIES:
+        indexed = await timed(
+            lambda db: dish_crud.read_items(db=db, menu_id=1, submenu_id=1, limit=args.limit, search=query),
+            args.repeat,
+        )
+        scan = await timed(like_scan(query, args.limit), args.repeat)
+        print(f'{query!r:>18}: search {indexed:8.2f} ms   LIKE scan {scan:8.2f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dishes', type=int, default=100_000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
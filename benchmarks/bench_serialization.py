@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import time
+from typing import List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app import schemas
+from app.crud import DishCRUD, MenuCRUD
+from app.database import SessionLocal
+from app.models import Dish, Menu, SubMenu
+from benchmarks.seed import seed
+
+# Time to build a JSON list of dishes and a menu tree of the same number of
+# dishes, both ways:
+#   pydantic  ORM objects validated by the response model, dumped by json
+#             (what the routes did before)
+#   light     column rows made into dicts, dumped by orjson (app.crud)
+#   python -m benchmarks.bench_serialization --dishes 1000 10000
+
+menu_crud = MenuCRUD()
+dish_crud = DishCRUD()
+
+DISHES_FIELD = create_response_field('dishes', List[schemas.Dish])
+TREE_FIELD = create_response_field('tree', schemas.MenuTree)
+
+
+async def pydantic_dishes(db, limit: int) -> bytes:
+    dishes = list(await db.scalars(select(Dish).where(Dish.submenu_id == 1).order_by(Dish.id).limit(limit)))
+    return JSONResponse(await serialize_response(field=DISHES_FIELD, response_content=dishes)).body
+
+
+async def light_dishes(db, limit: int) -> bytes:
+    return ORJSONResponse(await dish_crud.read_items(db=db, menu_id=1, submenu_id=1, limit=limit)).body
+
+
+async def pydantic_tree(db, limit: int) -> bytes:
+    menu = await db.scalar(
+        select(Menu).options(selectinload(Menu.submenus).selectinload(SubMenu.dishes)).where(Menu.id == 1)
+    )
+    return JSONResponse(await serialize_response(field=TREE_FIELD, response_content=menu)).body
+
+
+async def light_tree(db, limit: int) -> bytes:
+    return ORJSONResponse((await menu_crud.read_tree(db=db, menu_id=1))[0]).body
+
+
+async def best_of(call, limit: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        async with SessionLocal() as db:
+            start = time.perf_counter()
+            await call(db, limit)
+            timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+async def main(args) -> None:
+    for dishes in args.dishes:
+        # One menu with one submenu, so the list and the tree hold the same dishes.
+        await seed(menus=1, submenus=1, dishes=dishes)
+        for name, slow, fast in (('dishes', pydantic_dishes, light_dishes), ('tree', pydantic_tree, light_tree)):
+            pydantic_ms = await best_of(slow, dishes, args.repeat)
+            light_ms = await best_of(fast, dishes, args.repeat)
+            print(
+                f'{name:>6} {dishes:>7}: {pydantic_ms:8.1f} ms pydantic, {light_ms:8.1f} ms light, '
+                f'{pydantic_ms / light_ms:4.1f}x'
+            )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dishes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
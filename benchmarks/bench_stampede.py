@@ -0,0 +1,73 @@
+import argparse
+import asyncio
+import os
+
+import httpx
+from sqlalchemy import event
+
+from app.cache import invalidate
+from app.database import engine
+from app.main import app
+
+# Fire bursts of concurrent GET /menus/ right after the cached list is
+# dropped (as on expiry or a write) and count the SQL statements each burst
+# runs. Needs the app environment (MENU_ENV=app) with Redis; the menus it
+# creates are deleted afterwards:
+#   python -m benchmarks.bench_stampede --concurrency 200
+
+
+async def burst(client: httpx.AsyncClient, concurrency: int, headers=None) -> int:
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        responses = await asyncio.gather(
+            *(client.get('/api/v1/menus/', headers=headers) for _ in range(concurrency))
+        )
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+    assert all(response.status_code == 200 for response in responses)
+    return len(statements)
+
+
+async def main(args) -> None:
+    if os.environ.get('MENU_ENV') != 'app':
+        raise RuntimeError('the cache is only enabled with MENU_ENV=app')
+
+    await app.router.startup()
+    async with httpx.AsyncClient(app=app, base_url='http://bench') as client:
+        menu_ids = []
+        for i in range(args.menus):
+            response = await client.post(
+                '/api/v1/menus/',
+                json={'title': f'Stampede Menu {i}', 'description': 'Menu Description'},
+            )
+            menu_ids.append(response.json()['id'])
+
+        try:
+            uncached = await burst(client, args.concurrency, headers={'Cache-Control': 'no-cache'})
+            cold = []
+            for _ in range(args.rounds):
+                await invalidate('menus')
+                cold.append(await burst(client, args.concurrency))
+            warm = await burst(client, args.concurrency)
+        finally:
+            for menu_id in menu_ids:
+                await client.delete(f'/api/v1/menus/{menu_id}')
+    await app.router.shutdown()
+
+    print(f'{args.concurrency} concurrent requests, statements per burst')
+    print(f'{"uncached":>12}: {uncached}')
+    print(f'{"cold cache":>12}: {max(cold)} (worst of {args.rounds})')
+    print(f'{"warm cache":>12}: {warm}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--menus', type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,68 @@
+import os
+
+from sqlalchemy import insert
+
+from app import models  # noqa: F401 (registers the tables on Base.metadata)
+from app.database import engine, init_models
+from app.models import Dish, Menu, SubMenu
+
+# Seed a scratch database with menus x submenus x dishes. The tables are
+# dropped first, so this refuses to run in the app environment.
+
+CHUNK_SIZE = 10_000
+
+
+async def seed(menus: int, submenus: int, dishes: int) -> None:
+    if os.environ.get('MENU_ENV') == 'app':
+        raise RuntimeError('benchmarks drop all tables, use a scratch database')
+
+    await init_models(drop=True)
+
+    async with engine.begin() as conn:
+        menu_ids = (
+            await conn.execute(
+                insert(Menu).returning(Menu.id),
+                [
+                    {
+                        'title': f'Menu {i}',
+                        'description': f'Menu Description {i}',
+                        'submenus_count': submenus,
+                        'dishes_count': submenus * dishes,
+                    }
+                    for i in range(menus)
+                ],
+            )
+        ).scalars().all()
+
+        submenu_ids = (
+            await conn.execute(
+                insert(SubMenu).returning(SubMenu.id),
+                [
+                    {
+                        'title': f'Submenu {menu_id}.{j}',
+                        'description': f'Submenu Description {menu_id}.{j}',
+                        'menu_id': menu_id,
+                        'dishes_count': dishes,
+                    }
+                    for menu_id in menu_ids
+                    for j in range(submenus)
+                ],
+            )
+        ).scalars().all()
+
+        rows = []
+        for submenu_id in submenu_ids:
+            for k in range(dishes):
+                rows.append(
+                    {
+                        'title': f'Dish {submenu_id}.{k}',
+                        'description': f'Dish Description {submenu_id}.{k}',
+                        'price': '9.99',
+                        'submenu_id': submenu_id,
+                    }
+                )
+                if len(rows) == CHUNK_SIZE:
+                    await conn.execute(insert(Dish), rows)
+                    rows = []
+        if rows:
+            await conn.execute(insert(Dish), rows)
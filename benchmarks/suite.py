@@ -0,0 +1,493 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess  # nosec:B404
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app import validation
+from app.crud import DishCRUD, MenuCRUD, SubmenuCRUD
+from app.database import (
+    DATABASE_URL,
+    SessionLocal,
+    enable_foreign_keys,
+    get_db,
+    get_read_db,
+)
+from app.main import app
+from app.schemas import (
+    DishBatchUpdate,
+    DishCreate,
+    DishUpdate,
+    MenuCreate,
+    MenuUpdate,
+    SubMenuBatchUpdate,
+    SubMenuCreate,
+    SubMenuUpdate,
+)
+from benchmarks.seed import seed
+
+# The whole benchmark suite against a scratch database seeded with
+# menus x submenus x dishes:
+#   python -m benchmarks.suite --menus 10 --submenus 10 --dishes 100
+# 1. micro: every CRUD method and validation helper, one session per call,
+#    with min/max/mean/stddev/median per call and the statements it runs;
+# 2. load: concurrent clients sending a read-mostly mix of API requests
+#    through the app in-process (no network, no response cache), with
+#    p50/p95/p99 latency, requests per second and statements per request.
+# Results go to benchmarks/results/<time>-<commit>.json; pass an earlier
+# file with --compare to see what changed.
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+# Route name: weight, in percent. Writes only touch dishes the same client
+# created, so requests never fail because of another client.
+LOAD_MIX = {
+    'get_menus': 15,
+    'get_menu': 15,
+    'get_submenus': 10,
+    'get_submenu': 10,
+    'get_dishes': 15,
+    'get_dish': 20,
+    'get_menu_tree': 5,
+    'post_dish': 5,
+    'patch_dish': 3,
+    'delete_dish': 2,
+}
+
+menu_crud = MenuCRUD()
+submenu_crud = SubmenuCRUD()
+dish_crud = DishCRUD()
+
+_statements: ContextVar[Optional[List[int]]] = ContextVar('statements', default=None)
+
+
+def count_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = _statements.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class Catalogue:
+    # Ids of the seeded rows: seed() inserts them in order into new tables.
+    def __init__(self, menus: int, submenus: int, dishes: int, rng: random.Random) -> None:
+        self.menus, self.submenus, self.dishes, self.rng = menus, submenus, dishes, rng
+
+    def menu(self) -> int:
+        return self.rng.randint(1, self.menus)
+
+    def submenu(self) -> Tuple[int, int]:
+        submenu_id = self.rng.randint(1, self.menus * self.submenus)
+        return (submenu_id - 1) // self.submenus + 1, submenu_id
+
+    def dish(self) -> Tuple[int, int, int]:
+        dish_id = self.rng.randint(1, self.menus * self.submenus * self.dishes)
+        submenu_id = (dish_id - 1) // self.dishes + 1
+        return (submenu_id - 1) // self.submenus + 1, submenu_id, dish_id
+
+
+# MICRO
+
+
+def micro_benchmarks(catalogue: Catalogue, batch: int) -> Dict[str, Callable[[AsyncSession, int], Awaitable[Any]]]:
+    # Each takes a session and the round number. Writes of one kind run in
+    # a chain (create, update, delete) over the rows the create made.
+    created: Dict[str, List[Any]] = {'menus': [], 'submenus': [], 'dishes': [], 'batches': [], 'dish_batches': []}
+
+    def dish_update(i):
+        return DishUpdate(title=f'Bench Dish {i}', description='Updated', price='2.50')
+
+    async def create_menu(db, i):
+        menu = await menu_crud.create_item(db=db, item_schema=MenuCreate(title=f'Bench Menu {i}', description='d'))
+        created['menus'].append(menu.id)
+
+    async def create_submenu(db, i):
+        submenu = await submenu_crud.create_item(
+            db=db, item_schema=SubMenuCreate(title=f'Bench SubMenu {i}', description='d'), menu_id=1
+        )
+        created['submenus'].append(submenu.id)
+
+    async def create_dish(db, i):
+        dish = await dish_crud.create_item(
+            db=db, item_schema=DishCreate(title=f'Bench Dish {i}', description='d', price='1.50'),
+            menu_id=1, submenu_id=1,
+        )
+        created['dishes'].append(dish.id)
+
+    async def create_submenus(db, i):
+        result = await submenu_crud.create_items(
+            db=db,
+            items=[SubMenuCreate(title=f'Bench SubMenu {i}.{j}', description='d') for j in range(batch)],
+            menu_id=2,
+        )
+        created['batches'].append([submenu.id for submenu in result['items']])
+
+    async def create_dishes(db, i):
+        result = await dish_crud.create_items(
+            db=db,
+            items=[DishCreate(title=f'Bench Dish {i}.{j}', description='d', price='1.50') for j in range(batch)],
+            menu_id=1, submenu_id=2,
+        )
+        created['dish_batches'].append([dish.id for dish in result['items']])
+
+    def with_submenu(call):
+        def run(db, i):
+            return call(db, *catalogue.submenu())
+        return run
+
+    def with_dish(call):
+        def run(db, i):
+            return call(db, *catalogue.dish())
+        return run
+
+    return {
+        'validation.is_valid_menu': lambda db, i: validation.is_valid_menu(db=db, menu_id=catalogue.menu()),
+        'validation.is_valid_submenu': with_submenu(
+            lambda db, menu_id, submenu_id: validation.is_valid_submenu(db=db, menu_id=menu_id, submenu_id=submenu_id)
+        ),
+        'validation.is_valid_dish': with_dish(
+            lambda db, menu_id, submenu_id, dish_id: validation.is_valid_dish(
+                db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
+            )
+        ),
+
+        'MenuCRUD.read_item': lambda db, i: menu_crud.read_item(db=db, menu_id=catalogue.menu()),
+        'MenuCRUD.read_items': lambda db, i: menu_crud.read_items(db=db, limit=10),
+        'MenuCRUD.read_page': lambda db, i: menu_crud.read_page(db=db, limit=10),
+        'MenuCRUD.read_version': lambda db, i: menu_crud.read_version(db=db, menu_id=catalogue.menu()),
+        'MenuCRUD.read_versions': lambda db, i: menu_crud.read_versions(db=db, limit=10),
+        'MenuCRUD.read_tree': lambda db, i: menu_crud.read_tree(db=db, menu_id=catalogue.menu()),
+        'MenuCRUD.create_item': create_menu,
+        'MenuCRUD.update_item': lambda db, i: menu_crud.update_item(
+            db=db, item_schema=MenuUpdate(title=f'Bench Menu {i}', description='Updated'),
+            item_id=created['menus'][i], menu_id=created['menus'][i],
+        ),
+        'MenuCRUD.delete_item': lambda db, i: menu_crud.delete_item(
+            db=db, item_id=created['menus'][i], menu_id=created['menus'][i]
+        ),
+
+        'SubmenuCRUD.read_item': with_submenu(
+            lambda db, menu_id, submenu_id: submenu_crud.read_item(db=db, menu_id=menu_id, submenu_id=submenu_id)
+        ),
+        'SubmenuCRUD.read_items': lambda db, i: submenu_crud.read_items(db=db, menu_id=catalogue.menu(), limit=10),
+        'SubmenuCRUD.read_page': lambda db, i: submenu_crud.read_page(db=db, menu_id=catalogue.menu(), limit=10),
+        'SubmenuCRUD.read_version': with_submenu(
+            lambda db, menu_id, submenu_id: submenu_crud.read_version(db=db, menu_id=menu_id, submenu_id=submenu_id)
+        ),
+        'SubmenuCRUD.read_versions': lambda db, i: submenu_crud.read_versions(
+            db=db, menu_id=catalogue.menu(), limit=10
+        ),
+        'SubmenuCRUD.create_item': create_submenu,
+        'SubmenuCRUD.update_item': lambda db, i: submenu_crud.update_item(
+            db=db, item_schema=SubMenuUpdate(title=f'Bench SubMenu {i}', description='Updated'),
+            item_id=created['submenus'][i], menu_id=1, submenu_id=created['submenus'][i],
+        ),
+        'SubmenuCRUD.delete_item': lambda db, i: submenu_crud.delete_item(
+            db=db, item_id=created['submenus'][i], menu_id=1, submenu_id=created['submenus'][i]
+        ),
+        'SubmenuCRUD.create_items': create_submenus,
+        'SubmenuCRUD.update_items': lambda db, i: submenu_crud.update_items(
+            db=db,
+            items=[
+                SubMenuBatchUpdate(id=submenu_id, title=f'Bench SubMenu {i}.{j}', description='Updated')
+                for j, submenu_id in enumerate(created['batches'][i])
+            ],
+            menu_id=2,
+        ),
+        'SubmenuCRUD.delete_items': lambda db, i: submenu_crud.delete_items(
+            db=db, item_ids=created['batches'][i], menu_id=2
+        ),
+
+        'DishCRUD.read_item': with_dish(
+            lambda db, menu_id, submenu_id, dish_id: dish_crud.read_item(
+                db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
+            )
+        ),
+        'DishCRUD.read_items': with_submenu(
+            lambda db, menu_id, submenu_id: dish_crud.read_items(
+                db=db, menu_id=menu_id, submenu_id=submenu_id, limit=10
+            )
+        ),
+        'DishCRUD.read_page': with_submenu(
+            lambda db, menu_id, submenu_id: dish_crud.read_page(
+                db=db, menu_id=menu_id, submenu_id=submenu_id, limit=10
+            )
+        ),
+        'DishCRUD.read_version': with_dish(
+            lambda db, menu_id, submenu_id, dish_id: dish_crud.read_version(
+                db=db, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id
+            )
+        ),
+        'DishCRUD.read_versions': with_submenu(
+            lambda db, menu_id, submenu_id: dish_crud.read_versions(
+                db=db, menu_id=menu_id, submenu_id=submenu_id, limit=10
+            )
+        ),
+        'DishCRUD.create_item': create_dish,
+        'DishCRUD.update_item': lambda db, i: dish_crud.update_item(
+            db=db, item_schema=dish_update(i), item_id=created['dishes'][i],
+            menu_id=1, submenu_id=1, dish_id=created['dishes'][i],
+        ),
+        'DishCRUD.delete_item': lambda db, i: dish_crud.delete_item(
+            db=db, item_id=created['dishes'][i], menu_id=1, submenu_id=1, dish_id=created['dishes'][i]
+        ),
+        'DishCRUD.create_items': create_dishes,
+        'DishCRUD.update_items': lambda db, i: dish_crud.update_items(
+            db=db,
+            items=[
+                DishBatchUpdate(id=dish_id, title=f'Bench Dish {i}.{j}', description='Updated', price='2.50')
+                for j, dish_id in enumerate(created['dish_batches'][i])
+            ],
+            menu_id=1, submenu_id=2,
+        ),
+        'DishCRUD.delete_items': lambda db, i: dish_crud.delete_items(
+            db=db, item_ids=created['dish_batches'][i], menu_id=1, submenu_id=2
+        ),
+
+        'MenuCRUD.stream_catalogue': stream_catalogue,
+    }
+
+
+async def stream_catalogue(db: AsyncSession, i: int) -> None:
+    async for _ in menu_crud.stream_catalogue(db=db):
+        pass
+
+
+async def run_micro(sessions, catalogue: Catalogue, rounds: int, warmup: int, batch: int) -> Dict[str, Any]:
+    results = {}
+    for name, call in micro_benchmarks(catalogue, batch).items():
+        timings, statements = [], []
+        for i in range(warmup + rounds):
+            counter = [0]
+            token = _statements.set(counter)
+            async with sessions() as db:
+                start = time.perf_counter()
+                await call(db, i)
+                elapsed = time.perf_counter() - start
+            _statements.reset(token)
+            if i >= warmup:
+                timings.append(elapsed * 1000)
+                statements.append(counter[0])
+        mean = statistics.mean(timings)
+        results[name] = {
+            'rounds': rounds,
+            'min_ms': min(timings),
+            'max_ms': max(timings),
+            'mean_ms': mean,
+            'stddev_ms': statistics.stdev(timings) if rounds > 1 else 0.0,
+            'median_ms': statistics.median(timings),
+            'ops': 1000 / mean,
+            'statements': statistics.mean(statements),
+        }
+        print(
+            f'{name:<30} {results[name]["median_ms"]:9.3f} ms median {results[name]["min_ms"]:9.3f} min '
+            f'{results[name]["stddev_ms"]:9.3f} stddev {results[name]["statements"]:5.1f} statements'
+        )
+    return results
+
+
+# LOAD
+
+
+def load_request(name: str, catalogue: Catalogue, created: List[Tuple[int, int, int]], title: str):
+    # Returns the method, path and body of one request of the mix.
+    if name in ('patch_dish', 'delete_dish') and not created:
+        name = 'post_dish'
+    if name == 'get_menus':
+        return name, 'GET', app.url_path_for(name), None
+    if name in ('get_menu', 'get_submenus', 'get_menu_tree'):
+        return name, 'GET', app.url_path_for(name, menu_id=catalogue.menu()), None
+    if name in ('get_submenu', 'get_dishes'):
+        menu_id, submenu_id = catalogue.submenu()
+        return name, 'GET', app.url_path_for(name, menu_id=menu_id, submenu_id=submenu_id), None
+    if name == 'get_dish':
+        menu_id, submenu_id, dish_id = catalogue.dish()
+        return name, 'GET', app.url_path_for(name, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id), None
+    if name == 'post_dish':
+        menu_id, submenu_id = catalogue.submenu()
+        body = {'title': title, 'description': 'Dish Description', 'price': '1.50'}
+        return name, 'POST', app.url_path_for(name, menu_id=menu_id, submenu_id=submenu_id), body
+    menu_id, submenu_id, dish_id = created.pop(catalogue.rng.randrange(len(created)))
+    path = app.url_path_for(name, menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id)
+    if name == 'patch_dish':
+        created.append((menu_id, submenu_id, dish_id))
+        return name, 'PATCH', path, {'title': title, 'description': 'Updated', 'price': '2.50'}
+    return name, 'DELETE', path, None
+
+
+async def load_client(
+    client: httpx.AsyncClient, number: int, requests: int, catalogue: Catalogue, results: List[Tuple]
+) -> None:
+    created: List[Tuple[int, int, int]] = []
+    names, weights = list(LOAD_MIX), list(LOAD_MIX.values())
+    for i in range(requests):
+        name, method, path, body = load_request(
+            catalogue.rng.choices(names, weights)[0], catalogue, created, f'Load Dish {number}.{i}'
+        )
+        counter = [0]
+        token = _statements.set(counter)
+        start = time.perf_counter()
+        response = await client.request(method, path, json=body)
+        elapsed = time.perf_counter() - start
+        _statements.reset(token)
+        results.append((name, response.status_code, elapsed * 1000, counter[0]))
+        if name == 'post_dish' and response.status_code == 201:
+            dish = response.json()
+            created.append((int(path.split('/')[4]), int(dish['submenu_id']), int(dish['id'])))
+
+
+def load_summary(rows: List[Tuple]) -> Dict[str, Any]:
+    latencies = [row[2] for row in rows]
+    return {
+        'requests': len(rows),
+        'errors': sum(1 for row in rows if row[1] >= 400),
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'statements_per_request': statistics.mean(row[3] for row in rows),
+    }
+
+
+async def run_load(catalogue: Catalogue, requests: int, concurrency: int) -> Dict[str, Any]:
+    results: List[Tuple] = []
+    share, extra = divmod(requests, concurrency)
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            load_client(
+                client, number, share + (1 if number < extra else 0),
+                Catalogue(catalogue.menus, catalogue.submenus, catalogue.dishes, random.Random(catalogue.rng.random())),
+                results,
+            )
+            for number in range(concurrency)
+        ))
+        seconds = time.perf_counter() - start
+
+    overall = {**load_summary(results), 'seconds': seconds, 'requests_per_second': len(results) / seconds}
+    routes = {
+        name: load_summary([row for row in results if row[0] == name])
+        for name in LOAD_MIX
+        if any(row[0] == name for row in results)
+    }
+    for name, summary in [('all', overall), *routes.items()]:
+        print(
+            f'{name:<15} {summary["requests"]:6} req {summary["p50_ms"]:8.2f} p50 {summary["p95_ms"]:8.2f} p95 '
+            f'{summary["p99_ms"]:8.2f} p99 ms {summary["statements_per_request"]:5.1f} statements '
+            f'{summary["errors"]} errors'
+        )
+    print(f'{overall["requests_per_second"]:.1f} requests/s')
+    return {'overall': overall, 'routes': routes}
+
+
+# RESULTS
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(  # nosec:B603,B607
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base: Dict[str, Any], current: Dict[str, Any], threshold: float) -> None:
+    # Lower is better for everything but requests per second.
+    def line(name: str, before: float, after: float, higher_is_better: bool = False) -> None:
+        change = (after - before) / before if before else 0.0
+        worse = -change if higher_is_better else change
+        flag = '  <- worse' if worse > threshold else ''
+        print(f'{name:<40} {before:10.3f} -> {after:10.3f} {change:+8.1%}{flag}')
+
+    print(f'\ncompared with {base["meta"]["commit"]} ({base["meta"]["date"]})')
+    for name, stats in current['micro'].items():
+        if name in base['micro']:
+            line(f'{name} median ms', base['micro'][name]['median_ms'], stats['median_ms'])
+    before, after = base['load']['overall'], current['load']['overall']
+    line('load requests/s', before['requests_per_second'], after['requests_per_second'], higher_is_better=True)
+    for key in ('p50_ms', 'p95_ms', 'p99_ms', 'statements_per_request'):
+        line(f'load {key}', before[key], after[key])
+
+
+async def main(args) -> None:
+    rng = random.Random(args.seed)
+    catalogue = Catalogue(args.menus, args.submenus, args.dishes, rng)
+    await seed(menus=args.menus, submenus=args.submenus, dishes=args.dishes)
+
+    # A pool sized for the clients, instead of the tests' NullPool.
+    bench_engine = create_async_engine(
+        DATABASE_URL, poolclass=AsyncAdaptedQueuePool, pool_size=args.concurrency, max_overflow=0
+    )
+    if bench_engine.dialect.name == 'sqlite':
+        event.listen(bench_engine.sync_engine, 'connect', enable_foreign_keys)
+    event.listen(bench_engine.sync_engine, 'before_cursor_execute', count_statement)
+
+    def sessions() -> AsyncSession:
+        return SessionLocal(bind=bench_engine)
+
+    async def bench_db():
+        async with sessions() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = bench_db
+    app.dependency_overrides[get_read_db] = bench_db
+
+    print(f'micro: {args.rounds} rounds after {args.warmup} warmup')
+    micro = await run_micro(sessions, catalogue, args.rounds, args.warmup, args.batch)
+    print(f'\nload: {args.requests} requests from {args.concurrency} clients')
+    load = await run_load(catalogue, args.requests, args.concurrency)
+    await bench_engine.dispose()
+
+    meta = {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'database': bench_engine.dialect.name,
+        **{key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+    }
+    results = {'meta': meta, 'micro': micro, 'load': load}
+    output = args.output or os.path.join(
+        RESULTS_DIR, f'{datetime.now():%Y%m%d-%H%M%S}-{meta["commit"] or "unknown"}.json'
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'\nresults saved to {output}')
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(json.load(file), results, args.threshold)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--menus', type=int, default=10)
+    parser.add_argument('--submenus', type=int, default=10)
+    parser.add_argument('--dishes', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--batch', type=int, default=100, help='items per batch create/update/delete')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0, help='makes the request mix and the ids reproducible')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<time>-<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare with')
+    parser.add_argument('--threshold', type=float, default=0.1, help='change flagged as worse, e.g. 0.1 for 10%%')
+    asyncio.run(main(parser.parse_args()))
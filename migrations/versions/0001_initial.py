@@ -0,0 +1,60 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 20:08:25
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'menus',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_menus_id', 'menus', ['id'])
+    op.create_index('ix_menus_title', 'menus', ['title'], unique=True)
+    op.create_index('ix_menus_description', 'menus', ['description'])
+
+    op.create_table(
+        'submenus',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('menu_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['menu_id'], ['menus.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_submenus_id', 'submenus', ['id'])
+    op.create_index('ix_submenus_title', 'submenus', ['title'], unique=True)
+    op.create_index('ix_submenus_description', 'submenus', ['description'])
+
+    op.create_table(
+        'dishes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('price', sa.Numeric(5, 2), nullable=True),
+        sa.Column('submenu_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['submenu_id'], ['submenus.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_dishes_id', 'dishes', ['id'])
+    op.create_index('ix_dishes_title', 'dishes', ['title'], unique=True)
+    op.create_index('ix_dishes_description', 'dishes', ['description'])
+
+
+def downgrade() -> None:
+    op.drop_table('dishes')
+    op.drop_table('submenus')
+    op.drop_table('menus')
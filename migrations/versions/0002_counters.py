@@ -0,0 +1,38 @@
+"""submenu and dish counters
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 20:15:26
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('menus', sa.Column('submenus_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('menus', sa.Column('dishes_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('submenus', sa.Column('dishes_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Same backfill as app.recount.
+    op.execute(
+        'UPDATE submenus SET dishes_count = '
+        '(SELECT count(*) FROM dishes WHERE dishes.submenu_id = submenus.id)'
+    )
+    op.execute(
+        'UPDATE menus SET '
+        'submenus_count = (SELECT count(*) FROM submenus WHERE submenus.menu_id = menus.id), '
+        'dishes_count = (SELECT coalesce(sum(submenus.dishes_count), 0) '
+        'FROM submenus WHERE submenus.menu_id = menus.id)'
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('submenus', 'dishes_count')
+    op.drop_column('menus', 'dishes_count')
+    op.drop_column('menus', 'submenus_count')
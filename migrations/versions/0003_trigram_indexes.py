@@ -0,0 +1,45 @@
+"""trigram indexes for title/description search
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 20:28:34
+
+"""
+from alembic import op
+
+from app.models import has_pg_trgm
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    (table, column, f'ix_{table}_{column}_trgm')
+    for table in ('menus', 'submenus', 'dishes')
+    for column in ('title', 'description')
+]
+
+
+def _enabled() -> bool:
+    bind = op.get_bind()
+    return bind.dialect.name == 'postgresql' and has_pg_trgm(None, None, bind)
+
+
+def upgrade() -> None:
+    if not _enabled():
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column, name in INDEXES:
+        op.create_index(
+            name, table, [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade() -> None:
+    if not _enabled():
+        return
+    for table, _, name in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
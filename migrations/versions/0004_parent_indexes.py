@@ -0,0 +1,23 @@
+"""composite indexes for parent-scoped lists
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 20:32:01
+
+"""
+from alembic import op
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_submenus_menu_id_id', 'submenus', ['menu_id', 'id'])
+    op.create_index('ix_dishes_submenu_id_id', 'dishes', ['submenu_id', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_dishes_submenu_id_id', table_name='dishes')
+    op.drop_index('ix_submenus_menu_id_id', table_name='submenus')
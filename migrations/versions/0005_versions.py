@@ -0,0 +1,24 @@
+"""row versions for ETags
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 20:48:08
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    for table in ('menus', 'submenus', 'dishes'):
+        op.add_column(table, sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    for table in ('dishes', 'submenus', 'menus'):
+        op.drop_column(table, 'version')
@@ -0,0 +1,167 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.database import init_models
+from app.main import app
+from tests.test_query_count import count_queries
+
+asyncio.run(init_models())
+
+
+client = TestClient(app)
+
+
+def create_menu(title):
+    response = client.post(
+        app.url_path_for('post_menu'), json={'title': title, 'description': 'Menu Description'}
+    )
+    assert response.status_code == 201
+    return response.json()['id']
+
+
+def test_dishes_batch():
+    menu_id = create_menu('Batch Menu')
+    response = client.post(
+        app.url_path_for('post_submenu', menu_id=menu_id),
+        json={'title': 'Batch SubMenu', 'description': 'SubMenu Description'},
+    )
+    submenu_id = response.json()['id']
+    url = app.url_path_for('post_dishes_batch', menu_id=menu_id, submenu_id=submenu_id)
+
+    items = [
+        {'title': f'Batch Dish {i}', 'description': 'Dish Description', 'price': '1.50'}
+        for i in range(200)
+    ]
+    # a repeated title is reported, the other items are still created
+    items.append(items[0])
+    with count_queries() as statements:
+        response = client.post(url, json=items)
+    assert response.status_code == 200
+    result = response.json()
+    assert [dish['title'] for dish in result['items']] == [item['title'] for item in items[:200]]
+    assert result['errors'] == [{'index': 200, 'detail': 'dish title already exists'}]
+    assert len(statements) <= 8
+
+    menu = client.get(app.url_path_for('get_menu', menu_id=menu_id)).json()
+    assert menu['dishes_count'] == 200
+    submenu = client.get(app.url_path_for('get_submenu', menu_id=menu_id, submenu_id=submenu_id)).json()
+    assert submenu['dishes_count'] == 200
+
+    dish_ids = [int(dish['id']) for dish in result['items']]
+    response = client.patch(
+        url,
+        json=[
+            {'id': dish_ids[0], 'title': 'Batch Dish 0', 'description': 'Updated', 'price': '2.50'},
+            {'id': dish_ids[1], 'title': 'Batch Dish 2', 'description': 'Updated', 'price': '2.50'},
+            {'id': 0, 'title': 'Batch Missing Dish', 'description': 'Updated', 'price': '2.50'},
+        ],
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert [(dish['id'], dish['description'], dish['price']) for dish in result['items']] == [
+        (str(dish_ids[0]), 'Updated', '2.50'),
+    ]
+    assert result['errors'] == [
+        {'index': 1, 'detail': 'dish title already exists'},
+        {'index': 2, 'detail': 'dish not found'},
+    ]
+
+    response = client.request('DELETE', url, json=[*dish_ids[:150], dish_ids[0]])
+    assert response.status_code == 200
+    result = response.json()
+    assert result['items'] == [str(dish_id) for dish_id in dish_ids[:150]]
+    assert result['errors'] == [{'index': 150, 'detail': 'dish not found'}]
+
+    menu = client.get(app.url_path_for('get_menu', menu_id=menu_id)).json()
+    assert menu['dishes_count'] == 50
+    dishes = client.get(
+        app.url_path_for('get_dishes', menu_id=menu_id, submenu_id=submenu_id), params={'limit': 100}
+    ).json()
+    assert len(dishes) == 50
+
+    response = client.post(
+        app.url_path_for('post_dishes_batch', menu_id=menu_id, submenu_id=0), json=items
+    )
+    assert response.status_code == 404
+    assert response.json()['detail'] == 'submenu not found'
+
+    client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+
+
+def test_dishes_batch_prices():
+    menu_id = create_menu('Batch Prices Menu')
+    response = client.post(
+        app.url_path_for('post_submenu', menu_id=menu_id),
+        json={'title': 'Batch Prices SubMenu', 'description': 'SubMenu Description'},
+    )
+    submenu_id = response.json()['id']
+    url = app.url_path_for('post_dishes_batch', menu_id=menu_id, submenu_id=submenu_id)
+
+    prices = ['1.50', 'x', '1000', '999.999', 'NaN', '999.99']
+    response = client.post(
+        url,
+        json=[
+            {'title': f'Batch Prices Dish {i}', 'description': 'Dish Description', 'price': price}
+            for i, price in enumerate(prices)
+        ],
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert [dish['price'] for dish in result['items']] == ['1.50', '999.99']
+    assert result['errors'] == [
+        {'index': 1, 'detail': 'dish price is not a number'},
+        {'index': 2, 'detail': 'dish price is out of range'},
+        {'index': 3, 'detail': 'dish price is out of range'},
+        {'index': 4, 'detail': 'dish price is out of range'},
+    ]
+
+    dish_id = result['items'][0]['id']
+    response = client.patch(
+        url, json=[{'id': dish_id, 'title': 'Batch Prices Dish 0', 'description': 'Updated', 'price': '-1e9'}]
+    )
+    assert response.status_code == 200
+    assert response.json() == {'items': [], 'errors': [{'index': 0, 'detail': 'dish price is out of range'}]}
+
+    client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+
+
+def test_submenus_batch():
+    menu_id = create_menu('Batch Submenus Menu')
+    url = app.url_path_for('post_submenus_batch', menu_id=menu_id)
+
+    response = client.post(
+        url,
+        json=[
+            {'title': f'Batch Submenus SubMenu {i}', 'description': 'SubMenu Description'}
+            for i in range(3)
+        ],
+    )
+    assert response.status_code == 200
+    submenus = response.json()['items']
+    assert [submenu['dishes'] for submenu in submenus] == [[], [], []]
+    submenu_ids = [submenu['id'] for submenu in submenus]
+
+    client.post(
+        app.url_path_for('post_dishes_batch', menu_id=menu_id, submenu_id=submenu_ids[0]),
+        json=[{'title': 'Batch Submenus Dish', 'description': 'Dish Description', 'price': '1.50'}],
+    )
+    response = client.patch(
+        url,
+        json=[{'id': submenu_ids[0], 'title': 'Batch Submenus Renamed', 'description': 'Updated'}],
+    )
+    assert response.status_code == 200
+    [submenu] = response.json()['items']
+    assert submenu['title'] == 'Batch Submenus Renamed'
+    assert submenu['dishes_count'] == 1
+    assert [dish['title'] for dish in submenu['dishes']] == ['Batch Submenus Dish']
+
+    response = client.request('DELETE', url, json=submenu_ids[:2])
+    assert response.status_code == 200
+    assert response.json() == {'items': submenu_ids[:2], 'errors': []}
+
+    menu = client.get(app.url_path_for('get_menu', menu_id=menu_id)).json()
+    assert menu['submenus_count'] == 1
+    assert menu['dishes_count'] == 0
+
+    client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
@@ -0,0 +1,242 @@
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
+from redis import asyncio as aioredis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app import schemas
+from app.cache import (
+    OrjsonCoder,
+    TieredBackend,
+    _compute,
+    batch_write_tags,
+    get_cache,
+    invalidate,
+    refresh_early,
+    write_tags,
+)
+
+
+@pytest.fixture()
+def cached_app(monkeypatch):
+    monkeypatch.setenv('MENU_ENV', 'app')
+    FastAPICache.reset()
+    FastAPICache.init(InMemoryBackend(), prefix='test-cache', coder=OrjsonCoder)
+    calls = []
+    app = FastAPI()
+
+    @app.get('/menus/{menu_id}/submenus/{submenu_id}')
+    @get_cache(tags=('submenu:{submenu_id}', 'menu:{menu_id}:deleted'))
+    async def read_submenu(menu_id: int, submenu_id: int, limit: int = 10, slow: bool = False):
+        calls.append((menu_id, submenu_id, limit))
+        if slow:
+            await asyncio.sleep(0.1)
+        return {'calls': len(calls)}
+
+    yield TestClient(app), calls
+    FastAPICache.reset()
+
+
+def test_write_tags():
+    assert write_tags(1) == ['menus', 'menu:1']
+    assert write_tags(1, 2, 3) == ['menus', 'menu:1', 'submenu:2', 'dish:3']
+    assert write_tags(1, 2, deleted=True) == ['menus', 'menu:1', 'submenu:2', 'submenu:2:deleted']
+    assert batch_write_tags(1, item_ids=[2, 3], deleted=True) == [
+        'menus', 'menu:1', 'submenu:2', 'submenu:2:deleted', 'submenu:3', 'submenu:3:deleted',
+    ]
+    assert batch_write_tags(1, 2, [3, 4]) == ['menus', 'menu:1', 'submenu:2', 'dish:3', 'dish:4']
+
+
+def test_cached_until_invalidated(cached_app):
+    client, calls = cached_app
+    url = '/menus/1/submenus/2'
+
+    assert client.get(url).json() == {'calls': 1}
+    assert client.get(url).json() == {'calls': 1}
+    # other query strings are cached separately
+    assert client.get(url, params={'limit': 5}).json() == {'calls': 2}
+
+    # writes elsewhere in the tree keep the entry
+    with client:
+        client.portal.call(invalidate, *write_tags(1, 3, 4))
+        assert client.get(url).json() == {'calls': 1}
+
+        # a dish write below the submenu evicts it
+        client.portal.call(invalidate, *write_tags(1, 2, 4))
+        assert client.get(url).json() == {'calls': 3}
+
+        # deleting the menu evicts everything below it
+        client.portal.call(invalidate, *write_tags(1, deleted=True))
+        assert client.get(url).json() == {'calls': 4}
+
+        # the same ids spelt differently carry the same tags
+        assert client.get('/menus/01/submenus/002').json() == {'calls': 5}
+        client.portal.call(invalidate, *write_tags(1, 2))
+        assert client.get('/menus/01/submenus/002').json() == {'calls': 6}
+
+
+def test_tiered_backend():
+    async def run():
+        redis = aioredis.from_url(os.environ.get('REDIS_URL', 'redis://localhost:6379/15'))
+        try:
+            await redis.ping()
+        except (RedisConnectionError, OSError):
+            pytest.skip('redis is not available')
+
+        # two workers sharing one Redis
+        first = TieredBackend(redis, channel='test-cache:invalidate')
+        second = TieredBackend(redis, channel='test-cache:invalidate')
+        listener = asyncio.create_task(second.listen())
+        await asyncio.sleep(0.1)
+
+        await first.set('test-cache:entry', b'body', 60)
+        assert await second.get_with_ttl('test-cache:entry') == (60, b'body')
+        assert await second.get_with_ttl('test-cache:entry') == (59, b'body')
+        assert await second.get_with_ttl('test-cache:missing') == (-2, None)
+        assert second.stats()['l1_hits'] == 1
+        assert second.stats()['l2_hits'] == 1
+        assert second.stats()['misses'] == 1
+
+        await first.set_many({'test-cache:version': 'a'}, 60)
+        assert await second.get_many(['test-cache:version']) == [b'a']
+        await first.set_many({'test-cache:version': 'b'}, 60)
+        await asyncio.sleep(0.1)
+        # the change reached the second worker's L1
+        assert await second.get_many(['test-cache:version']) == [b'b']
+
+        listener.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await listener
+        await redis.delete('test-cache:entry', 'test-cache:version')
+        await redis.close()
+
+    asyncio.run(run())
+
+
+def test_concurrent_misses_compute_once(cached_app):
+    client, calls = cached_app
+
+    async def run():
+        async with httpx.AsyncClient(app=client.app, base_url='http://test') as async_client:
+            responses = await asyncio.gather(
+                *(async_client.get('/menus/1/submenus/5', params={'slow': 1}) for _ in range(20))
+            )
+        return [response.json() for response in responses]
+
+    assert asyncio.run(run()) == [{'calls': 1}] * 20
+    assert len(calls) == 1
+
+
+def test_failed_lock_holder_is_not_waited_out():
+    async def run():
+        redis = aioredis.from_url(os.environ.get('REDIS_URL', 'redis://localhost:6379/15'))
+        try:
+            await redis.ping()
+        except (RedisConnectionError, OSError):
+            pytest.skip('redis is not available')
+        FastAPICache.reset()
+        FastAPICache.init(RedisBackend(redis), prefix='test-cache', coder=OrjsonCoder)
+        key = 'test-cache:failing'
+
+        async def failing_render():
+            await asyncio.sleep(0.1)
+            raise ValueError('menu not found')
+
+        async def render():
+            return b'{}'
+
+        # two workers: the first takes the lock and fails, the second waits
+        holder = asyncio.create_task(_compute(key, None, failing_render, 60, None))
+        await asyncio.sleep(0.02)
+        start = time.monotonic()
+        waiter = await _compute(key, None, render, 60, None)
+        with pytest.raises(ValueError):
+            await holder
+        assert waiter == (None, b'{}')
+        assert time.monotonic() - start < 1
+
+        await redis.delete(key, f'{key}:lock')
+        await redis.close()
+        FastAPICache.reset()
+
+    asyncio.run(run())
+
+
+def test_refresh_early():
+    now = time.time()
+    assert not refresh_early(now + 3600, delta=0.01)
+    assert refresh_early(now - 1, delta=0.01)
+    # the closer to expiry and the slower to compute, the likelier
+    early = sum(refresh_early(now + 0.5, delta=1.0) for _ in range(1000))
+    later = sum(refresh_early(now + 0.5, delta=0.1) for _ in range(1000))
+    assert early > later
+
+
+def test_large_bodies_are_compressed(cached_app):
+    client, calls = cached_app
+    app = client.app
+
+    @app.get('/menus/{menu_id}', response_model=schemas.MenuReponse)
+    @get_cache(tags=('menu:{menu_id}',))
+    async def read_menu(menu_id: int):
+        calls.append(menu_id)
+        return {
+            'id': menu_id,
+            'title': 'Menu',
+            'description': 'x' * 2000,
+            'submenus': [],
+            'submenus_count': 0,
+            'dishes_count': 0,
+            'ignored': True,
+        }
+
+    first = client.get('/menus/1')
+    second = client.get('/menus/1')
+    assert len(calls) == 1
+    # the cached body is what the response model produced
+    assert first.content == second.content
+    assert second.json()['id'] == '1'
+    assert 'ignored' not in second.json()
+
+    stored = [value.data for value in InMemoryBackend._store.values() if isinstance(value.data, bytes)]
+    assert any(data.split(b' ', 3)[3][:2] == b'\x1f\x8b' for data in stored)
+
+    # sent as stored to clients that accept gzip, decompressed for the rest
+    assert second.headers['content-encoding'] == 'gzip'
+    identity = client.get('/menus/1', headers={'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in identity.headers
+    assert identity.content == second.content
+    assert len(calls) == 1
+
+
+def test_gzipped_entry_etag_is_weak(cached_app):
+    client, calls = cached_app
+    app = client.app
+
+    async def versions(menu_id: int):
+        return 1
+
+    @app.get('/menus/{menu_id}/description')
+    @get_cache(tags=('menu:{menu_id}',), versions=versions)
+    async def read_description(menu_id: int):
+        return {'description': 'x' * 2000}
+
+    identity = client.get('/menus/1/description', headers={'Accept-Encoding': 'identity'})
+    etag = identity.headers['etag']
+    assert not etag.startswith('W/')
+    response = client.get('/menus/1/description', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['etag'] == f'W/{etag}'
+
+    response = client.get('/menus/1/description', headers={'If-None-Match': f'W/{etag}'})
+    assert (response.status_code, response.headers['etag']) == (304, f'W/{etag}')
+    response = client.get('/menus/1/description', headers={'If-None-Match': etag})
+    assert (response.status_code, response.headers['etag']) == (304, etag)
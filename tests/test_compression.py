@@ -0,0 +1,114 @@
+import asyncio
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.compression import CompressionMiddleware, accepts, choose_encoding
+from app.config import settings
+from app.database import init_models
+from app.main import app
+
+asyncio.run(init_models())
+
+
+client = TestClient(app)
+
+
+@pytest.fixture()
+def small_app():
+    small_app = FastAPI()
+    small_app.add_middleware(CompressionMiddleware)
+
+    @small_app.get('/text')
+    async def text(size: int = 2000):
+        return PlainTextResponse('x' * size)
+
+    @small_app.get('/stream')
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f'{{"chunk": {i}}}\n'.encode() * 100
+        return StreamingResponse(chunks(), media_type='application/x-ndjson')
+
+    @small_app.get('/etag')
+    async def etag():
+        return PlainTextResponse('x' * 2000, headers={'ETag': '"abc"'})
+
+    @small_app.get('/binary')
+    async def binary():
+        return PlainTextResponse(b'x' * 2000, media_type='application/octet-stream')
+
+    return TestClient(small_app)
+
+
+def test_accept_encoding():
+    assert accepts('gzip, deflate', 'gzip')
+    assert accepts('deflate, GZIP;q=0.5', 'gzip')
+    assert not accepts('gzip;q=0, deflate', 'gzip')
+    assert accepts('*', 'br')
+    assert not accepts('*;q=0', 'gzip')
+    assert not accepts(None, 'gzip')
+    assert choose_encoding('gzip, br') == ('br' if compression.brotli else 'gzip')
+    assert choose_encoding('gzip') == 'gzip'
+    assert choose_encoding('identity') is None
+
+
+def test_compression(small_app, monkeypatch):
+    response = small_app.get('/text', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['vary'] == 'Accept-Encoding'
+    assert int(response.headers['content-length']) < 100
+    assert response.text == 'x' * 2000
+
+    # below the minimum size, not accepted, or not a compressible type
+    response = small_app.get('/text', params={'size': 100}, headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in response.headers
+    assert response.headers['vary'] == 'Accept-Encoding'
+    assert 'content-encoding' not in small_app.get('/text', headers={'Accept-Encoding': 'identity'}).headers
+    assert 'content-encoding' not in small_app.get('/binary', headers={'Accept-Encoding': 'gzip'}).headers
+
+    monkeypatch.setattr(settings, 'COMPRESSION_MIN_SIZE', 50)
+    response = small_app.get('/text', params={'size': 100}, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+
+
+def test_compressed_etag_is_weak(small_app):
+    assert small_app.get('/etag', headers={'Accept-Encoding': 'gzip'}).headers['etag'] == 'W/"abc"'
+    assert small_app.get('/etag', headers={'Accept-Encoding': 'identity'}).headers['etag'] == '"abc"'
+
+
+def test_streamed_compression(small_app):
+    with small_app.stream('GET', '/stream', headers={'Accept-Encoding': 'gzip'}) as response:
+        assert response.headers['content-encoding'] == 'gzip'
+        assert 'content-length' not in response.headers
+        raw = b''.join(response.iter_raw())
+    assert gzip.decompress(raw) == b''.join(f'{{"chunk": {i}}}\n'.encode() * 100 for i in range(3))
+
+
+@pytest.mark.skipif(compression.brotli is None, reason='brotli is not installed')
+def test_brotli(small_app):
+    response = small_app.get('/text', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['content-encoding'] == 'br'
+    assert response.text == 'x' * 2000
+    with small_app.stream('GET', '/stream', headers={'Accept-Encoding': 'br'}) as response:
+        raw = b''.join(response.iter_raw())
+    assert compression.brotli.decompress(raw).count(b'chunk') == 300
+
+
+def test_app_responses_are_compressed():
+    menu_id = client.post(
+        app.url_path_for('post_menu'), json={'title': 'Compressed Menu', 'description': 'x' * 2000}
+    ).json()['id']
+
+    response = client.get(app.url_path_for('get_menu', menu_id=menu_id), headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.json()['description'] == 'x' * 2000
+    response = client.get(app.url_path_for('get_export'), headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert 'Compressed Menu' in response.text
+
+    client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
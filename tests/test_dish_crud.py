@@ -1,18 +1,18 @@
+import asyncio
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from app.database import Base, engine
+from app.database import engine, init_models
 from app.main import app
 
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False,
-                                   bind=engine)
+TestingSessionLocal = async_sessionmaker(autoflush=False, bind=engine,
+                                         expire_on_commit=False)
 
 # Drop all existing tables before each test
 
-Base.metadata.drop_all(bind=engine)
-
-Base.metadata.create_all(bind=engine)
+asyncio.run(init_models(drop=True))
 
 
 # Use a pytest fixture to create a clean database for each test
@@ -22,7 +22,7 @@ def db():
     try:
         yield db
     finally:
-        db.close()
+        asyncio.run(db.close())
 
 
 client = TestClient(app)
@@ -286,3 +286,55 @@ def test_delete_dish():
 
     response = client.get(app.url_path_for('get_menu', menu_id=menu_id))
     assert response.status_code == 404
+
+
+def test_dish_of_other_menu():
+    menu_ids = []
+    submenu_ids = []
+    for i in (1, 2):
+        response = client.post(
+            app.url_path_for('post_menu'),
+            json={'title': f'Parent Menu {i}', 'description': 'Menu Description'}
+        )
+        assert response.status_code == 201
+        menu_ids.append(response.json()['id'])
+
+        response = client.post(
+            app.url_path_for('post_submenu', menu_id=menu_ids[-1]),
+            json={'title': f'Parent SubMenu {i}', 'description': 'SubMenu Description'}
+        )
+        assert response.status_code == 201
+        submenu_ids.append(response.json()['id'])
+
+    response = client.post(
+        app.url_path_for('post_dish', menu_id=menu_ids[0], submenu_id=submenu_ids[0]),
+        json=dish_data
+    )
+    assert response.status_code == 201
+    dish_id = response.json()['id']
+
+    response = client.get(
+        app.url_path_for('get_dish', menu_id=menu_ids[1], submenu_id=submenu_ids[0], dish_id=dish_id)
+    )
+    assert response.status_code == 404
+    assert response.json()['detail'] == 'submenu not found'
+
+    response = client.get(
+        app.url_path_for('get_dish', menu_id=menu_ids[1], submenu_id=submenu_ids[1], dish_id=dish_id)
+    )
+    assert response.status_code == 404
+    assert response.json()['detail'] == 'dish not found'
+
+    response = client.get(
+        app.url_path_for('get_dish', menu_id=menu_ids[0], submenu_id=submenu_ids[0], dish_id=dish_id)
+    )
+    assert response.status_code == 200
+
+    for menu_id in menu_ids:
+        response = client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+
+    response = client.get(
+        app.url_path_for('get_dish', menu_id=menu_ids[0], submenu_id=submenu_ids[0], dish_id=dish_id)
+    )
+    assert response.status_code == 404
+    assert response.json()['detail'] == 'menu not found'
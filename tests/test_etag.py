@@ -0,0 +1,95 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.database import init_models
+from app.main import app
+from tests.test_query_count import count_queries
+
+asyncio.run(init_models())
+
+
+client = TestClient(app)
+
+
+def create_tree():
+    response = client.post(
+        app.url_path_for('post_menu'),
+        json={'title': 'ETag Menu', 'description': 'Menu Description'},
+    )
+    assert response.status_code == 201
+    menu_id = response.json()['id']
+
+    response = client.post(
+        app.url_path_for('post_submenu', menu_id=menu_id),
+        json={'title': 'ETag SubMenu', 'description': 'SubMenu Description'},
+    )
+    assert response.status_code == 201
+    submenu_id = response.json()['id']
+
+    response = client.post(
+        app.url_path_for('post_dish', menu_id=menu_id, submenu_id=submenu_id),
+        json={'title': 'ETag Dish', 'description': 'Dish Description', 'price': '1.50'},
+    )
+    assert response.status_code == 201
+    return menu_id, submenu_id, response.json()['id']
+
+
+def test_not_modified():
+    menu_id, submenu_id, dish_id = create_tree()
+    url = app.url_path_for('get_menu', menu_id=menu_id)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers['etag']
+    assert response.headers['cache-control'] == 'no-cache'
+
+    with count_queries() as statements:
+        response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.headers['etag'] == etag
+    assert len(statements) <= 1
+
+    response = client.get(url, headers={'If-None-Match': '"other", W/' + etag})
+    assert response.status_code == 304
+    response = client.get(url, headers={'If-None-Match': '"other"'})
+    assert response.status_code == 200
+
+    client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 404
+
+
+def test_nested_writes_change_etags():
+    menu_id, submenu_id, dish_id = create_tree()
+    urls = [
+        app.url_path_for('get_menus'),
+        app.url_path_for('get_menu', menu_id=menu_id),
+        app.url_path_for('get_submenus', menu_id=menu_id),
+        app.url_path_for('get_submenu', menu_id=menu_id, submenu_id=submenu_id),
+        app.url_path_for('get_dishes', menu_id=menu_id, submenu_id=submenu_id),
+        app.url_path_for('get_dish', menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id),
+    ]
+    etags = [client.get(url).headers['etag'] for url in urls]
+    for url, etag in zip(urls, etags):
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    response = client.patch(
+        app.url_path_for('patch_dish', menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id),
+        json={'title': 'ETag Dish', 'description': 'Dish Description', 'price': '2.50'},
+    )
+    assert response.status_code == 200
+
+    for url, etag in zip(urls, etags):
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['etag'] != etag
+
+    # the same path under another menu is a different resource
+    other = client.get(
+        app.url_path_for('get_submenu', menu_id=int(menu_id) + 1000, submenu_id=submenu_id)
+    )
+    assert other.status_code == 404
+
+    client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
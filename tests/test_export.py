@@ -0,0 +1,76 @@
+import asyncio
+import csv
+import io
+
+import orjson
+from fastapi.testclient import TestClient
+
+from app.database import init_models
+from app.main import app
+from app.menu_endpoints import export
+
+asyncio.run(init_models())
+
+
+client = TestClient(app)
+
+
+def test_export(monkeypatch):
+    monkeypatch.setattr(export, 'EXPORT_CHUNK_SIZE', 2)
+    response = client.post(
+        app.url_path_for('post_menu'), json={'title': 'Export Menu', 'description': 'Menu Description'}
+    )
+    menu_id = response.json()['id']
+    response = client.post(
+        app.url_path_for('post_menu'), json={'title': 'Export Empty Menu', 'description': 'Menu Description'}
+    )
+    empty_menu_id = response.json()['id']
+    submenu_ids = []
+    for title in ('Export SubMenu', 'Export Empty SubMenu'):
+        response = client.post(
+            app.url_path_for('post_submenu', menu_id=menu_id),
+            json={'title': title, 'description': 'SubMenu Description'},
+        )
+        submenu_ids.append(response.json()['id'])
+    client.post(
+        app.url_path_for('post_dishes_batch', menu_id=menu_id, submenu_id=submenu_ids[0]),
+        json=[
+            {'title': f'Export Dish {i}', 'description': 'Dish Description', 'price': '1.50'}
+            for i in range(3)
+        ],
+    )
+
+    response = client.get(app.url_path_for('get_export'))
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    rows = [
+        orjson.loads(line) for line in response.content.splitlines()
+        if orjson.loads(line)['menu_id'] == menu_id
+    ]
+    assert [(row['submenu_title'], row['dish_title']) for row in rows] == [
+        ('Export SubMenu', 'Export Dish 0'),
+        ('Export SubMenu', 'Export Dish 1'),
+        ('Export SubMenu', 'Export Dish 2'),
+        ('Export Empty SubMenu', None),
+    ]
+    assert rows[0]['dish_price'] == '1.50'
+    assert rows[0]['submenu_id'] == submenu_ids[0]
+    [empty_menu] = [
+        orjson.loads(line) for line in response.content.splitlines()
+        if orjson.loads(line)['menu_id'] == empty_menu_id
+    ]
+    assert empty_menu['menu_title'] == 'Export Empty Menu'
+    assert empty_menu['submenu_id'] is None
+
+    response = client.get(app.url_path_for('get_export'), params={'format': 'csv'})
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/csv')
+    reader = csv.DictReader(io.StringIO(response.text))
+    assert reader.fieldnames[0] == 'menu_id'
+    csv_rows = [row for row in reader if row['menu_id'] == menu_id]
+    assert [row['dish_title'] for row in csv_rows] == [row['dish_title'] or '' for row in rows]
+
+    assert client.get(app.url_path_for('get_export'), params={'format': 'xml'}).status_code == 422
+
+    client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+    client.delete(app.url_path_for('delete_menu', menu_id=empty_menu_id))
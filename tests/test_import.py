@@ -0,0 +1,130 @@
+import asyncio
+
+import orjson
+from fastapi.testclient import TestClient
+
+from app.database import init_models
+from app.main import app
+
+asyncio.run(init_models())
+
+
+client = TestClient(app)
+
+
+def find_menu(title):
+    menus = client.get(app.url_path_for('get_menus'), params={'limit': 1000}).json()
+    return next(menu for menu in menus if menu['title'] == title)
+
+
+def test_import_ndjson():
+    rows = [
+        {'menu_title': 'Import Menu', 'menu_description': 'Menu Description',
+         'submenu_title': 'Import SubMenu', 'submenu_description': 'SubMenu Description',
+         'dish_title': f'Import Dish {i}', 'dish_description': 'Dish Description', 'dish_price': '1.50'}
+        for i in range(5)
+    ]
+    rows.append({'menu_title': 'Import Menu', 'submenu_title': 'Import Empty SubMenu'})
+    rows.append({'menu_title': 'Import Menu', 'dish_title': 'Import Orphan Dish', 'dish_price': '1'})
+    rows.append({'menu_title': 'Import Menu', 'submenu_title': 'Import SubMenu',
+                 'dish_title': 'Import Bad Dish', 'dish_price': 'free'})
+    body = b''.join(orjson.dumps(row) + b'\n' for row in rows) + b'not json\n'
+
+    response = client.post(app.url_path_for('post_import'), content=body)
+    assert response.status_code == 200
+    report = response.json()
+    assert (report['rows'], report['skipped']) == (6, 3)
+    assert (report['menus'], report['submenus'], report['dishes']) == (1, 2, 5)
+    assert report['errors'] == [
+        {'index': 6, 'detail': 'submenu_title is required for a dish'},
+        {'index': 7, 'detail': 'dish_price is not a number'},
+        {'index': 8, 'detail': 'row is not a JSON object'},
+    ]
+
+    menu = find_menu('Import Menu')
+    assert (menu['submenus_count'], menu['dishes_count']) == (2, 5)
+    submenus = client.get(app.url_path_for('get_submenus', menu_id=menu['id'])).json()
+    assert {submenu['title']: submenu['dishes_count'] for submenu in submenus} == {
+        'Import SubMenu': 5,
+        'Import Empty SubMenu': 0,
+    }
+    assert submenus[1]['description'] == ''
+
+    # importing again updates by title: a dish moves and changes its price
+    etag = client.get(app.url_path_for('get_menu', menu_id=menu['id'])).headers['etag']
+    rows = [
+        {'menu_title': 'Import Menu', 'menu_description': 'Menu Description',
+         'submenu_title': 'Import Empty SubMenu', 'submenu_description': 'SubMenu Description',
+         'dish_title': 'Import Dish 0', 'dish_description': 'Dish Description', 'dish_price': 2.5},
+    ]
+    response = client.post(
+        app.url_path_for('post_import'), content=b''.join(orjson.dumps(row) + b'\n' for row in rows)
+    )
+    assert response.status_code == 200
+    assert (response.json()['menus'], response.json()['dishes']) == (1, 1)
+
+    response = client.get(app.url_path_for('get_menu', menu_id=menu['id']))
+    assert response.headers['etag'] != etag
+    menu = response.json()
+    assert (menu['submenus_count'], menu['dishes_count']) == (2, 5)
+    submenus = client.get(app.url_path_for('get_submenus', menu_id=menu['id'])).json()
+    assert {submenu['title']: submenu['dishes_count'] for submenu in submenus} == {
+        'Import SubMenu': 4,
+        'Import Empty SubMenu': 1,
+    }
+    dish = client.get(
+        app.url_path_for('get_dishes', menu_id=menu['id'], submenu_id=submenus[1]['id'])
+    ).json()[0]
+    assert (dish['title'], dish['price']) == ('Import Dish 0', '2.50')
+
+    # rows without descriptions keep the ones already stored
+    rows = [{'menu_title': 'Import Menu', 'submenu_title': 'Import Empty SubMenu',
+             'dish_title': 'Import Dish 0', 'dish_price': 3}]
+    response = client.post(
+        app.url_path_for('post_import'), content=b''.join(orjson.dumps(row) + b'\n' for row in rows)
+    )
+    assert response.status_code == 200
+    assert client.get(app.url_path_for('get_menu', menu_id=menu['id'])).json()['description'] == 'Menu Description'
+    submenu = client.get(app.url_path_for('get_submenu', menu_id=menu['id'], submenu_id=submenus[1]['id'])).json()
+    assert submenu['description'] == 'SubMenu Description'
+    dish = client.get(
+        app.url_path_for('get_dishes', menu_id=menu['id'], submenu_id=submenus[1]['id'])
+    ).json()[0]
+    assert (dish['description'], dish['price']) == ('Dish Description', '3.00')
+
+    client.delete(app.url_path_for('delete_menu', menu_id=menu['id']))
+
+
+def test_import_csv_round_trip():
+    menu_id = client.post(
+        app.url_path_for('post_menu'), json={'title': 'Import CSV Menu', 'description': 'Menu, "quoted"'}
+    ).json()['id']
+    submenu_id = client.post(
+        app.url_path_for('post_submenu', menu_id=menu_id),
+        json={'title': 'Import CSV SubMenu', 'description': 'Two\nlines'},
+    ).json()['id']
+    client.post(
+        app.url_path_for('post_dishes_batch', menu_id=menu_id, submenu_id=submenu_id),
+        json=[
+            {'title': f'Import CSV Dish {i}', 'description': 'Dish Description', 'price': '3.25'}
+            for i in range(3)
+        ],
+    )
+    exported = client.get(app.url_path_for('get_export'), params={'format': 'csv'}).content
+    client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+
+    response = client.post(app.url_path_for('post_import'), params={'format': 'csv'}, content=exported)
+    assert response.status_code == 200
+    assert response.json()['skipped'] == 0
+
+    menu = find_menu('Import CSV Menu')
+    assert menu['description'] == 'Menu, "quoted"'
+    assert (menu['submenus_count'], menu['dishes_count']) == (1, 3)
+    [submenu] = client.get(app.url_path_for('get_submenus', menu_id=menu['id'])).json()
+    assert submenu['description'] == 'Two\nlines'
+    assert sorted(dish['title'] for dish in submenu['dishes']) == [f'Import CSV Dish {i}' for i in range(3)]
+
+    response = client.post(app.url_path_for('post_import'), params={'format': 'csv'}, content=b'title\nx\n')
+    assert response.status_code == 400
+
+    client.delete(app.url_path_for('delete_menu', menu_id=menu['id']))
@@ -1,14 +1,19 @@
+import asyncio
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from app.database import Base, engine
+from app.database import engine, init_models
 from app.main import app
+from app.models import Menu
+from app.recount import recount
 
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False,
-                                   bind=engine)
+TestingSessionLocal = async_sessionmaker(autoflush=False, bind=engine,
+                                         expire_on_commit=False)
 
-Base.metadata.create_all(bind=engine)
+asyncio.run(init_models())
 
 
 # Use a pytest fixture to create a clean database for each test
@@ -18,7 +23,7 @@ def db():
     try:
         yield db
     finally:
-        db.close()
+        asyncio.run(db.close())
 
 
 client = TestClient(app)
@@ -133,3 +138,75 @@ def test_count_dishes():
 
     response = client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
     assert response.status_code == 200
+
+
+def test_counters_follow_deletes():
+    response = client.post(app.url_path_for('post_menu'), json=menu_data)
+    assert response.status_code == 201
+    menu_id = response.json()['id']
+
+    submenu_ids = []
+    for submenu_data in submenu_datas[:2]:
+        response = client.post(app.url_path_for('post_submenu', menu_id=menu_id), json=submenu_data)
+        assert response.status_code == 201
+        submenu_ids.append(response.json()['id'])
+
+    for submenu_id, dish_data in zip(submenu_ids * 2, dish_datas):
+        response = client.post(app.url_path_for('post_dish', menu_id=menu_id, submenu_id=submenu_id), json=dish_data)
+        assert response.status_code == 201
+
+    response = client.get(app.url_path_for('get_submenu', menu_id=menu_id, submenu_id=submenu_ids[0]))
+    assert response.json()['dishes_count'] == 2
+
+    response = client.get(app.url_path_for('get_dishes', menu_id=menu_id, submenu_id=submenu_ids[0]))
+    dish_id = response.json()[0]['id']
+    response = client.delete(
+        app.url_path_for('delete_dish', menu_id=menu_id, submenu_id=submenu_ids[0], dish_id=dish_id)
+    )
+    assert response.status_code == 200
+
+    response = client.get(app.url_path_for('get_menu', menu_id=menu_id))
+    assert response.json()['submenus_count'] == 2
+    assert response.json()['dishes_count'] == 3
+
+    response = client.delete(app.url_path_for('delete_submenu', menu_id=menu_id, submenu_id=submenu_ids[1]))
+    assert response.status_code == 200
+
+    response = client.get(app.url_path_for('get_menu', menu_id=menu_id))
+    assert response.json()['submenus_count'] == 1
+    assert response.json()['dishes_count'] == 1
+
+    response = client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+    assert response.status_code == 200
+
+
+def test_recount():
+    response = client.post(app.url_path_for('post_menu'), json=menu_data)
+    assert response.status_code == 201
+    menu_id = response.json()['id']
+
+    response = client.post(app.url_path_for('post_submenu', menu_id=menu_id), json=submenu_datas[0])
+    assert response.status_code == 201
+
+    etag = client.get(app.url_path_for('get_menu', menu_id=menu_id)).headers['etag']
+
+    async def drift_and_recount():
+        async with TestingSessionLocal() as db:
+            await db.execute(
+                update(Menu).where(Menu.id == int(menu_id)).values(submenus_count=42, dishes_count=7)
+            )
+            await db.commit()
+            assert await recount(db) >= 1
+            # nothing is left to repair, so nothing is rewritten
+            assert await recount(db) == 0
+
+    asyncio.run(drift_and_recount())
+
+    # the repaired menu has a new ETag, so clients do not keep the drifted counts
+    response = client.get(app.url_path_for('get_menu', menu_id=menu_id), headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json()['submenus_count'] == 1
+    assert response.json()['dishes_count'] == 0
+
+    response = client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+    assert response.status_code == 200
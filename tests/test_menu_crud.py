@@ -1,14 +1,16 @@
+import asyncio
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from app.database import Base, engine
+from app.database import engine, init_models
 from app.main import app
 
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False,
-                                   bind=engine)
+TestingSessionLocal = async_sessionmaker(autoflush=False, bind=engine,
+                                         expire_on_commit=False)
 
-Base.metadata.create_all(bind=engine)
+asyncio.run(init_models())
 
 
 # Use a pytest fixture to create a clean database for each test
@@ -18,7 +20,7 @@ def db():
     try:
         yield db
     finally:
-        db.close()
+        asyncio.run(db.close())
 
 
 client = TestClient(app)
@@ -0,0 +1,54 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from prometheus_client.parser import text_string_to_metric_families
+
+from app.database import init_models
+from app.main import app
+
+asyncio.run(init_models())
+
+
+client = TestClient(app)
+
+
+def scrape():
+    response = client.get(app.url_path_for('metrics'))
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    }
+
+
+def sample(samples, name, **labels):
+    return samples.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def test_metrics():
+    before = scrape()
+    response = client.post(
+        app.url_path_for('post_menu'), json={'title': 'Metrics Menu', 'description': 'Menu Description'}
+    )
+    menu_id = response.json()['id']
+    client.get(app.url_path_for('get_menu', menu_id=menu_id))
+    client.get('/api/v1/nowhere')
+    after = scrape()
+
+    def grew(name, **labels):
+        return sample(after, name, **labels) - sample(before, name, **labels)
+
+    assert grew('http_request_duration_seconds_count', route='post_menu', method='POST', status='201') == 1
+    assert grew('http_request_duration_seconds_count', route='get_menu', method='GET', status='200') == 1
+    assert grew('http_request_duration_seconds_count', route='unmatched', method='GET', status='404') == 1
+    # one INSERT ... RETURNING creates a menu
+    assert grew('http_request_db_statements_sum', route='post_menu') == 1
+    assert grew('http_request_db_seconds_sum', route='post_menu') > 0
+    assert grew('http_request_db_statements_sum', route='unmatched') == 0
+    assert grew('db_pool_checkout_seconds_count') == 2
+    assert grew('db_pool_checkouts_total') >= 2
+    assert sample(after, 'db_pool_checked_out') == 0
+
+    client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
@@ -0,0 +1,128 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.database import init_models
+from app.main import app
+
+asyncio.run(init_models())
+
+
+client = TestClient(app)
+
+menu_data = {'title': 'Paged Menu', 'description': 'Menu Description'}
+
+submenu_data = {'title': 'Paged SubMenu', 'description': 'SubMenu Description'}
+
+
+def test_dishes_cursor_pagination():
+    response = client.post(app.url_path_for('post_menu'), json=menu_data)
+    assert response.status_code == 201
+    menu_id = response.json()['id']
+
+    response = client.post(app.url_path_for('post_submenu', menu_id=menu_id), json=submenu_data)
+    assert response.status_code == 201
+    submenu_id = response.json()['id']
+
+    titles = [f'Paged Dish {i}' for i in range(7)]
+    for title in titles:
+        response = client.post(
+            app.url_path_for('post_dish', menu_id=menu_id, submenu_id=submenu_id),
+            json={'title': title, 'description': 'Dish Description', 'price': '1.50'},
+        )
+        assert response.status_code == 201
+
+    url = app.url_path_for('get_dishes', menu_id=menu_id, submenu_id=submenu_id)
+    seen = []
+    cursor = ''
+    pages = 0
+    while cursor is not None:
+        response = client.get(url, params={'limit': 3, 'cursor': cursor})
+        assert response.status_code == 200
+        page = response.json()
+        seen += [dish['title'] for dish in page['items']]
+        cursor = page['next_cursor']
+        pages += 1
+
+    assert seen == titles
+    assert pages == 3
+
+    # without a cursor the endpoint keeps returning a plain list
+    response = client.get(url, params={'limit': 3, 'page': 2})
+    assert [dish['title'] for dish in response.json()] == titles[3:6]
+
+    response = client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+    assert response.status_code == 200
+
+
+def test_menus_cursor_pagination():
+    response = client.post(app.url_path_for('post_menu'), json=menu_data)
+    assert response.status_code == 201
+    menu_id = response.json()['id']
+
+    response = client.get(app.url_path_for('get_menus'), params={'cursor': ''})
+    assert response.status_code == 200
+    page = response.json()
+    assert [menu['id'] for menu in page['items']] == [menu_id]
+    assert page['items'][0]['submenus_count'] == 0
+    assert page['next_cursor'] is None
+
+    response = client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+    assert response.status_code == 200
+
+
+def test_invalid_cursor():
+    response = client.get(app.url_path_for('get_menus'), params={'cursor': 'not a cursor'})
+    assert response.status_code == 400
+
+
+def test_invalid_limit():
+    for params in ({'limit': 0, 'cursor': ''}, {'limit': -1}, {'page': 0}):
+        response = client.get(app.url_path_for('get_menus'), params=params)
+        assert response.status_code == 422, params
+
+
+def test_lists_are_scoped_to_parent():
+    submenu_ids = {}
+    for menu_title in ('First', 'Second'):
+        response = client.post(
+            app.url_path_for('post_menu'),
+            json={'title': f'{menu_title} Scoped Menu', 'description': 'Menu Description'},
+        )
+        assert response.status_code == 201
+        menu_id = response.json()['id']
+
+        response = client.post(
+            app.url_path_for('post_submenu', menu_id=menu_id),
+            json={'title': f'{menu_title} Scoped SubMenu', 'description': 'SubMenu Description'},
+        )
+        assert response.status_code == 201
+        submenu_id = response.json()['id']
+        submenu_ids[menu_id] = submenu_id
+
+        response = client.post(
+            app.url_path_for('post_dish', menu_id=menu_id, submenu_id=submenu_id),
+            json={'title': f'{menu_title} Scoped Dish', 'description': 'Dish Description', 'price': '1.50'},
+        )
+        assert response.status_code == 201
+
+    for menu_id, submenu_id in submenu_ids.items():
+        response = client.get(app.url_path_for('get_submenus', menu_id=menu_id))
+        assert [submenu['id'] for submenu in response.json()] == [submenu_id]
+
+        url = app.url_path_for('get_dishes', menu_id=menu_id, submenu_id=submenu_id)
+        for params in ({}, {'search': 'scoped'}, {'cursor': ''}):
+            response = client.get(url, params=params)
+            assert response.status_code == 200
+            body = response.json()
+            dishes = body['items'] if 'cursor' in params else body
+            assert len(dishes) == 1
+
+    # a submenu listed under a menu it does not belong to has no dishes
+    (first_menu, first_submenu), (second_menu, _) = submenu_ids.items()
+    response = client.get(app.url_path_for('get_dishes', menu_id=second_menu, submenu_id=first_submenu))
+    assert response.json() == []
+
+    for menu_id in submenu_ids:
+        response = client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+        assert response.status_code == 200
@@ -0,0 +1,59 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.database import init_models
+from app.main import app
+
+asyncio.run(init_models())
+
+
+client = TestClient(app)
+
+
+def test_profiling(tmp_path, monkeypatch):
+    menu_id = client.post(
+        app.url_path_for('post_menu'), json={'title': 'Profiled Menu', 'description': 'Menu Description'}
+    ).json()['id']
+    url = app.url_path_for('get_menu', menu_id=menu_id)
+
+    # off unless a token is configured
+    assert 'x-profile-id' not in client.get(url, headers={'X-Profile-Token': 'secret'}).headers
+
+    monkeypatch.setattr(settings, 'PROFILING_TOKEN', 'secret')
+    monkeypatch.setattr(settings, 'PROFILING_DIR', str(tmp_path))
+    assert 'x-profile-id' not in client.get(url).headers
+    assert 'x-profile-id' not in client.get(url, headers={'X-Profile-Token': 'guess'}).headers
+
+    response = client.get(url, headers={'X-Profile-Token': 'secret'})
+    assert response.status_code == 200
+    assert response.json()['title'] == 'Profiled Menu'
+    profile_url = app.url_path_for('get_profile', profile_id=response.headers['x-profile-id'])
+
+    assert client.get(profile_url).status_code == 403
+    assert client.get(profile_url, headers={'X-Profile-Token': 'guess'}).status_code == 403
+    report = client.get(profile_url, headers={'X-Profile-Token': 'secret'}).json()
+    assert (report['route'], report['method'], report['status']) == ('get_menu', 'GET', 200)
+    assert report['statements']
+    assert all(statement['ms'] >= 0 for statement in report['statements'])
+    assert any('FROM menus' in statement['sql'] for statement in report['statements'])
+    assert 0 < len(report['explain']) <= 3
+    assert all(plan['plan'] and not plan['plan'][0].startswith('not explained') for plan in report['explain'])
+    assert 'read_menu' in report['functions']
+
+    # writes are planned, not run again
+    response = client.patch(
+        app.url_path_for('patch_menu', menu_id=menu_id),
+        json={'title': 'Profiled Menu', 'description': 'Updated'},
+        headers={'X-Profile-Token': 'secret'},
+    )
+    profile_url = app.url_path_for('get_profile', profile_id=response.headers['x-profile-id'])
+    report = client.get(profile_url, headers={'X-Profile-Token': 'secret'}).json()
+    assert any(plan['sql'].startswith('UPDATE menus') for plan in report['explain'])
+    assert client.get(url).json()['description'] == 'Updated'
+
+    missing = app.url_path_for('get_profile', profile_id='0' * 32)
+    assert client.get(missing, headers={'X-Profile-Token': 'secret'}).status_code == 404
+
+    client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
@@ -0,0 +1,303 @@
+import asyncio
+from contextlib import contextmanager
+
+import orjson
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app import crud
+from app.database import engine, init_models
+from app.main import app
+
+asyncio.run(init_models())
+
+
+client = TestClient(app)
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def create_menus(prefix, menus, submenus, dishes):
+    menu_ids = []
+    for i in range(menus):
+        response = client.post(
+            app.url_path_for('post_menu'),
+            json={'title': f'{prefix} Menu {i}', 'description': 'Menu Description'},
+        )
+        assert response.status_code == 201
+        menu_id = response.json()['id']
+        menu_ids.append(menu_id)
+
+        for j in range(submenus):
+            response = client.post(
+                app.url_path_for('post_submenu', menu_id=menu_id),
+                json={'title': f'{prefix} SubMenu {i}.{j}', 'description': 'SubMenu Description'},
+            )
+            assert response.status_code == 201
+            submenu_id = response.json()['id']
+
+            for k in range(dishes):
+                response = client.post(
+                    app.url_path_for('post_dish', menu_id=menu_id, submenu_id=submenu_id),
+                    json={
+                        'title': f'{prefix} Dish {i}.{j}.{k}',
+                        'description': 'Dish Description',
+                        'price': '1.50',
+                    },
+                )
+                assert response.status_code == 201
+    return menu_ids
+
+
+def delete_menus(menu_ids):
+    for menu_id in menu_ids:
+        response = client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+        assert response.status_code == 200
+
+
+def test_get_menus_query_count():
+    menu_ids = create_menus('Small', menus=1, submenus=1, dishes=1)
+    with count_queries() as small:
+        response = client.get(app.url_path_for('get_menus'))
+    assert response.status_code == 200
+
+    menu_ids += create_menus('Large', menus=3, submenus=3, dishes=3)
+    with count_queries() as large:
+        response = client.get(app.url_path_for('get_menus'))
+    assert response.status_code == 200
+
+    menu_list = response.json()
+    assert [menu['submenus_count'] for menu in menu_list] == [1, 3, 3, 3]
+    assert [menu['dishes_count'] for menu in menu_list] == [1, 9, 9, 9]
+
+    # one of them looks up the versions behind the ETag
+    assert len(small) <= 4
+    assert len(large) == len(small)
+
+    delete_menus(menu_ids)
+
+
+def test_get_menu_query_count():
+    menu_ids = create_menus('Detail', menus=1, submenus=4, dishes=5)
+    with count_queries() as statements:
+        response = client.get(app.url_path_for('get_menu', menu_id=menu_ids[0]))
+    assert response.status_code == 200
+
+    menu = response.json()
+    assert menu['submenus_count'] == 4
+    assert menu['dishes_count'] == 20
+    assert len(statements) <= 4
+
+    delete_menus(menu_ids)
+
+
+def test_menu_tree_query_count(monkeypatch):
+    menu_ids = create_menus('Tree', menus=2, submenus=3, dishes=2)
+    # id lookups split this small a tree into several queries
+    monkeypatch.setattr(crud, 'BATCH_LOOKUP_SIZE', 1)
+    with count_queries() as statements:
+        response = client.get(app.url_path_for('get_menu_tree', menu_id=menu_ids[1]))
+    assert response.status_code == 200
+    assert len(statements) <= 3
+
+    tree = response.json()
+    assert tree['id'] == menu_ids[1]
+    assert tree['submenus_count'] == 3
+    assert tree['dishes_count'] == 6
+    assert [submenu['title'] for submenu in tree['submenus']] == [f'Tree SubMenu 1.{j}' for j in range(3)]
+    assert [dish['title'] for dish in tree['submenus'][0]['dishes']] == ['Tree Dish 1.0.0', 'Tree Dish 1.0.1']
+    assert tree['submenus'][0]['dishes'][0]['price'] == '1.50'
+    assert tree['submenus'][0]['dishes_count'] == 2
+
+    with count_queries() as statements:
+        response = client.get(app.url_path_for('get_tree'))
+    assert response.status_code == 200
+    assert len(statements) <= 3
+    assert [menu['id'] for menu in response.json()] == menu_ids
+
+    delete_menus(menu_ids)
+    response = client.get(app.url_path_for('get_menu_tree', menu_id=menu_ids[0]))
+    assert response.status_code == 404
+
+
+def test_write_query_count():
+    # Writes return the row they produce (INSERT/UPDATE/DELETE ... RETURNING)
+    # and check the path in the same statement, so no write is followed by
+    # a refresh and none is preceded by a lookup.
+    statements = {}
+    with count_queries() as statements['post_menu']:
+        response = client.post(
+            app.url_path_for('post_menu'), json={'title': 'Write Menu', 'description': 'Menu Description'}
+        )
+    assert response.status_code == 201
+    menu_id = response.json()['id']
+    with count_queries() as statements['post_submenu']:
+        response = client.post(
+            app.url_path_for('post_submenu', menu_id=menu_id),
+            json={'title': 'Write SubMenu', 'description': 'SubMenu Description'},
+        )
+    assert response.status_code == 201
+    submenu_id = response.json()['id']
+    dish = {'title': 'Write Dish', 'description': 'Dish Description', 'price': '1.50'}
+    with count_queries() as statements['post_dish']:
+        response = client.post(app.url_path_for('post_dish', menu_id=menu_id, submenu_id=submenu_id), json=dish)
+    assert response.status_code == 201
+    dish_id = response.json()['id']
+
+    with count_queries() as statements['patch_menu']:
+        response = client.patch(
+            app.url_path_for('patch_menu', menu_id=menu_id),
+            json={'title': 'Write Menu', 'description': 'Updated'},
+        )
+    assert response.json()['submenus'][0]['dishes'][0]['id'] == dish_id
+    with count_queries() as statements['patch_submenu']:
+        response = client.patch(
+            app.url_path_for('patch_submenu', menu_id=menu_id, submenu_id=submenu_id),
+            json={'title': 'Write SubMenu', 'description': 'Updated'},
+        )
+    assert response.json()['description'] == 'Updated'
+    with count_queries() as statements['patch_dish']:
+        response = client.patch(
+            app.url_path_for('patch_dish', menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id),
+            json={**dish, 'price': '2.50'},
+        )
+    assert response.json()['price'] == '2.50'
+
+    with count_queries() as statements['delete_dish']:
+        client.delete(app.url_path_for('delete_dish', menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_id))
+    with count_queries() as statements['delete_submenu']:
+        client.delete(app.url_path_for('delete_submenu', menu_id=menu_id, submenu_id=submenu_id))
+    with count_queries() as statements['delete_menu']:
+        client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+    assert client.get(app.url_path_for('get_menu', menu_id=menu_id)).status_code == 404
+
+    assert {name: len(executed) for name, executed in statements.items()} == {
+        'post_menu': 1,
+        'post_submenu': 2,
+        'post_dish': 3,
+        'patch_menu': 3,
+        'patch_submenu': 3,
+        'patch_dish': 3,
+        'delete_dish': 3,
+        'delete_submenu': 2,
+        'delete_menu': 1,
+    }
+
+
+# The most statements a request to each route may run. Every API route
+# needs an entry, and test_query_budgets requests each of them at two data
+# sizes, so an N+1 query shows up as a count that grows with the data.
+QUERY_BUDGETS = {
+    'cache_stats': 0,
+    'db_stats': 0,
+    'metrics': 0,
+    'get_profile': 0,
+    'post_menu': 1,
+    'get_menus': 4,
+    'get_menu': 4,
+    'patch_menu': 3,
+    'delete_menu': 1,
+    'post_submenu': 2,
+    'get_submenus': 3,
+    'get_submenu': 4,
+    'patch_submenu': 3,
+    'delete_submenu': 2,
+    'post_submenus_batch': 4,
+    'patch_submenus_batch': 7,
+    'delete_submenus_batch': 3,
+    'post_dish': 3,
+    'get_dishes': 2,
+    'get_dish': 2,
+    'patch_dish': 3,
+    'delete_dish': 3,
+    'post_dishes_batch': 5,
+    'patch_dishes_batch': 7,
+    'delete_dishes_batch': 4,
+    'get_tree': 3,
+    'get_menu_tree': 3,
+    'get_export': 2,
+    'post_import': 8,
+}
+
+
+def exercise(prefix, scale):
+    # Requests every route once against a catalogue of scale menus of
+    # scale submenus of scale dishes; returns the statements per route.
+    counts = {}
+
+    def request(method, name, path_params=None, status=200, **kwargs):
+        with count_queries() as statements:
+            response = client.request(method, app.url_path_for(name, **(path_params or {})), **kwargs)
+        assert response.status_code == status, (name, response.text)
+        counts[name] = len(statements)
+        return response
+
+    menu_ids = create_menus(prefix, menus=scale, submenus=scale, dishes=scale)
+    menu = {'menu_id': menu_ids[0]}
+    submenu = {**menu, 'submenu_id': request('GET', 'get_submenus', menu).json()[0]['id']}
+    dish = {**submenu, 'dish_id': request('GET', 'get_dishes', submenu).json()[0]['id']}
+
+    request('GET', 'cache_stats')
+    request('GET', 'db_stats')
+    request('GET', 'metrics')
+    request('GET', 'get_profile', {'profile_id': '0' * 32}, status=403)
+    request('GET', 'get_menus')
+    request('GET', 'get_menu', menu)
+    request('GET', 'get_submenu', submenu)
+    request('GET', 'get_dish', dish)
+    request('GET', 'get_tree')
+    request('GET', 'get_menu_tree', menu)
+    request('GET', 'get_export')
+
+    item = {'title': f'{prefix} New', 'description': 'Description', 'price': '1.50'}
+    request('PATCH', 'patch_menu', menu, json={'title': f'{prefix} Menu 0', 'description': 'Updated'})
+    request('PATCH', 'patch_submenu', submenu, json={'title': f'{prefix} SubMenu 0.0', 'description': 'Updated'})
+    request('PATCH', 'patch_dish', dish, json={'title': f'{prefix} Dish 0.0.0', 'description': 'Updated', 'price': '2'})
+    new_submenu = {**menu, 'submenu_id': request('POST', 'post_submenu', menu, status=201, json=item).json()['id']}
+    new_dish = {**submenu, 'dish_id': request('POST', 'post_dish', submenu, status=201, json=item).json()['id']}
+    request('DELETE', 'delete_dish', new_dish)
+    request('DELETE', 'delete_submenu', new_submenu)
+
+    items = [{**item, 'title': f'{prefix} Batch {i}'} for i in range(2)]
+    submenus = request('POST', 'post_submenus_batch', menu, json=items).json()['items']
+    request('PATCH', 'patch_submenus_batch', menu, json=[{**item, 'id': row['id']} for item, row in zip(items, submenus)])
+    request('DELETE', 'delete_submenus_batch', menu, json=[row['id'] for row in submenus])
+    dishes = request('POST', 'post_dishes_batch', submenu, json=items).json()['items']
+    request('PATCH', 'patch_dishes_batch', submenu, json=[{**item, 'id': row['id']} for item, row in zip(items, dishes)])
+    request('DELETE', 'delete_dishes_batch', submenu, json=[row['id'] for row in dishes])
+
+    rows = [
+        {'menu_title': f'{prefix} Menu 0', 'submenu_title': f'{prefix} SubMenu 0.0',
+         'dish_title': f'{prefix} Imported {i}', 'dish_price': '1.50'}
+        for i in range(2)
+    ]
+    request('POST', 'post_import', content=b''.join(orjson.dumps(row) + b'\n' for row in rows))
+
+    menu_ids.append(request('POST', 'post_menu', status=201, json=item).json()['id'])
+    for menu_id in menu_ids:
+        request('DELETE', 'delete_menu', {'menu_id': menu_id})
+    return counts
+
+
+def test_query_budgets():
+    small = exercise('Budget Small', scale=1)
+    large = exercise('Budget Large', scale=3)
+
+    routes = {route.name for route in app.routes if isinstance(route, APIRoute)}
+    assert set(QUERY_BUDGETS) == routes
+    assert set(small) == routes
+    assert {name: count for name, count in large.items() if count > QUERY_BUDGETS[name]} == {}
+    assert large == small
@@ -0,0 +1,123 @@
+import asyncio
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import database
+from app.cache import OrjsonCoder, get_cache, invalidate
+from app.database import (
+    PRIMARY_COOKIE,
+    Base,
+    PoolMonitor,
+    Replicas,
+    get_db,
+    get_read_db,
+    init_models,
+)
+from app.main import app
+from app.models import Menu
+
+asyncio.run(init_models())
+
+
+def titles(client):
+    return [menu['title'] for menu in client.get(app.url_path_for('get_menus'), params={'limit': 1000}).json()]
+
+
+def create_replica(tmp_path):
+    # The replica is a separate database that only holds its own menu, so
+    # every response shows where it was read from.
+    replica = create_async_engine(f'sqlite+aiosqlite:///{tmp_path}/replica.db', poolclass=NullPool)
+
+    async def create():
+        async with replica.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(insert(Menu).values(title='Replica Menu', description='Menu Description'))
+
+    asyncio.run(create())
+    return replica
+
+
+def test_read_replicas(tmp_path, monkeypatch):
+    replica = create_replica(tmp_path)
+    broken = create_async_engine(f'sqlite+aiosqlite:///{tmp_path}/missing/replica.db', poolclass=NullPool)
+    monkeypatch.setattr(database, 'replicas', Replicas([broken, replica]))
+
+    # the broken replica fails the request that first uses it, then is left out
+    client = TestClient(app, raise_server_exceptions=False)
+    assert client.get(app.url_path_for('get_menus')).status_code == 500
+    assert database.replicas.down_until[0] > 0
+    assert titles(client) == ['Replica Menu']
+    assert titles(client) == ['Replica Menu']
+
+    # after a write the client reads from the primary
+    response = client.post(
+        app.url_path_for('post_menu'), json={'title': 'Primary Menu', 'description': 'Menu Description'}
+    )
+    assert PRIMARY_COOKIE in response.cookies
+    menu_id = response.json()['id']
+    assert 'Primary Menu' in titles(client)
+    assert client.get(app.url_path_for('get_menu', menu_id=menu_id)).status_code == 200
+
+    other_client = TestClient(app)
+    assert titles(other_client) == ['Replica Menu']
+
+    client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+    asyncio.run(replica.dispose())
+
+
+def test_replica_sessions_connect_lazily(tmp_path, monkeypatch):
+    replica = create_replica(tmp_path)
+    monitor = PoolMonitor(replica.sync_engine)
+    monkeypatch.setattr(database, 'replicas', Replicas([replica]))
+
+    async def open_session():
+        async for db in get_read_db(Request({'type': 'http', 'headers': []})):
+            assert db.info['replica'] == 0
+
+    asyncio.run(open_session())
+    assert monitor.checkouts == 0
+    asyncio.run(replica.dispose())
+
+
+def test_cached_reads_after_write(tmp_path, monkeypatch):
+    replica = create_replica(tmp_path)
+    monkeypatch.setattr(database, 'replicas', Replicas([replica]))
+    monkeypatch.setenv('MENU_ENV', 'app')
+    FastAPICache.reset()
+    FastAPICache.init(InMemoryBackend(), prefix='test-replica-cache', coder=OrjsonCoder)
+    cached_app = FastAPI()
+
+    @cached_app.get('/titles')
+    @get_cache(tags=('menus',))
+    async def read_titles(db=Depends(get_read_db)):
+        return list(await db.scalars(select(Menu.title).order_by(Menu.id)))
+
+    @cached_app.post('/titles')
+    async def write_title(db=Depends(get_db)):
+        await db.execute(insert(Menu).values(title='Cached Primary Menu', description='Menu Description'))
+        await db.commit()
+        await invalidate('menus')
+
+    writer, other = TestClient(cached_app), TestClient(cached_app)
+    assert writer.get('/titles').json() == ['Replica Menu']
+    writer.post('/titles')
+    # another client's miss caches what the lagging replica has...
+    assert other.get('/titles').json() == ['Replica Menu']
+    # ...which the writer must not be served
+    assert 'Cached Primary Menu' in writer.get('/titles').json()
+    assert other.get('/titles').json() == ['Replica Menu']
+
+    async def cleanup():
+        async with database.SessionLocal() as db:
+            await db.execute(delete(Menu).where(Menu.title == 'Cached Primary Menu'))
+            await db.commit()
+
+    asyncio.run(cleanup())
+    asyncio.run(replica.dispose())
+    FastAPICache.reset()
@@ -0,0 +1,101 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app import search
+from app.database import engine, init_models
+from app.main import app
+
+asyncio.run(init_models())
+
+
+client = TestClient(app)
+
+menu_data = {'title': 'Search Menu', 'description': 'Menu Description'}
+
+submenu_data = {'title': 'Search SubMenu', 'description': 'SubMenu Description'}
+
+dish_datas = [
+    {'title': 'Borscht with sour cream', 'description': 'Beet soup', 'price': '3.50'},
+    {'title': 'Borscht', 'description': 'Beet soup', 'price': '3.00'},
+    {'title': 'Pelmeni', 'description': 'Siberian dumplings', 'price': '4.50'},
+]
+
+
+def search_titles(url, search, **params):
+    response = client.get(url, params={'search': search, **params})
+    assert response.status_code == 200
+    body = response.json()
+    if 'cursor' in params:
+        body = body['items']
+    return [item['title'] for item in body]
+
+
+def test_search_dishes():
+    response = client.post(app.url_path_for('post_menu'), json=menu_data)
+    assert response.status_code == 201
+    menu_id = response.json()['id']
+
+    response = client.post(app.url_path_for('post_submenu', menu_id=menu_id), json=submenu_data)
+    assert response.status_code == 201
+    submenu_id = response.json()['id']
+
+    dish_ids = []
+    for dish_data in dish_datas:
+        response = client.post(
+            app.url_path_for('post_dish', menu_id=menu_id, submenu_id=submenu_id), json=dish_data
+        )
+        assert response.status_code == 201
+        dish_ids.append(response.json()['id'])
+
+    url = app.url_path_for('get_dishes', menu_id=menu_id, submenu_id=submenu_id)
+
+    # ranked by relevance, closest title first; Postgres without pg_trgm
+    # keeps id order
+    titles = search_titles(url, 'borscht')
+    if engine.dialect.name == 'sqlite' or search._pg_trgm:
+        assert titles == ['Borscht', 'Borscht with sour cream']
+    else:
+        assert titles == ['Borscht with sour cream', 'Borscht']
+    assert search_titles(url, 'SOUR') == ['Borscht with sour cream']
+    assert search_titles(url, 'dumplings') == ['Pelmeni']
+    assert search_titles(url, 'lasagne') == []
+
+    # keyset pages keep id order
+    assert search_titles(url, 'borscht', cursor='') == ['Borscht with sour cream', 'Borscht']
+
+    response = client.patch(
+        app.url_path_for('patch_dish', menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_ids[2]),
+        json={'title': 'Vareniki', 'description': 'Ukrainian dumplings', 'price': '4.50'},
+    )
+    assert response.status_code == 200
+    assert search_titles(url, 'pelmeni') == []
+    assert search_titles(url, 'dumplings') == ['Vareniki']
+
+    response = client.delete(
+        app.url_path_for('delete_dish', menu_id=menu_id, submenu_id=submenu_id, dish_id=dish_ids[1])
+    )
+    assert response.status_code == 200
+    assert search_titles(url, 'borscht') == ['Borscht with sour cream']
+
+    response = client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
+    assert response.status_code == 200
+    assert search_titles(url, 'borscht') == []
+
+
+def test_search_without_pg_trgm(monkeypatch):
+    # Postgres without the extension filters with ILIKE in the database;
+    # only SQLite builds the in-process index.
+    monkeypatch.setattr(search, '_pg_trgm', False)
+    monkeypatch.setattr(search, '_indexes', {})
+    menu_id = client.post(app.url_path_for('post_menu'), json=menu_data).json()['id']
+    submenu_id = client.post(app.url_path_for('post_submenu', menu_id=menu_id), json=submenu_data).json()['id']
+    url = app.url_path_for('get_dishes', menu_id=menu_id, submenu_id=submenu_id)
+    for dish_data in dish_datas:
+        client.post(url, json=dish_data)
+
+    assert sorted(search_titles(url, 'borscht')) == ['Borscht', 'Borscht with sour cream']
+    assert search_titles(url, 'DUMPLINGS') == ['Pelmeni']
+    assert ('dishes' in search._indexes) == (engine.dialect.name == 'sqlite')
+
+    client.delete(app.url_path_for('delete_menu', menu_id=menu_id))
@@ -0,0 +1,69 @@
+import asyncio
+from typing import List
+
+from fastapi.testclient import TestClient
+from pydantic import parse_obj_as
+
+from app import schemas
+from app.database import init_models
+from app.main import app
+
+asyncio.run(init_models())
+
+
+client = TestClient(app)
+
+
+def validated(model, body):
+    # What the response model would have produced from the same data.
+    parsed = parse_obj_as(model, body)
+    return [item.dict() for item in parsed] if isinstance(parsed, list) else parsed.dict()
+
+
+def test_light_responses_match_schemas():
+    menu_id = client.post(
+        app.url_path_for('post_menu'), json={'title': 'Light Menu', 'description': 'Menu Description'}
+    ).json()['id']
+    submenu_ids = [
+        client.post(
+            app.url_path_for('post_submenu', menu_id=menu_id),
+            json={'title': f'Light SubMenu {i}', 'description': 'SubMenu Description'},
+        ).json()['id']
+        for i in range(2)
+    ]
+    for i in range(3):
+        client.post(
+            app.url_path_for('post_dish', menu_id=menu_id, submenu_id=submenu_ids[0]),
+            json={'title': f'Light Dish {i}', 'description': 'Dish Description', 'price': '12.5'},
+        )
+
+    checks = [
+        (List[schemas.MenuReponse], app.url_path_for('get_menus'), {}),
+        (schemas.MenuPage, app.url_path_for('get_menus'), {'cursor': '', 'limit': 1}),
+        (List[schemas.SubMenuReponse], app.url_path_for('get_submenus', menu_id=menu_id), {}),
+        (schemas.SubMenuPage, app.url_path_for('get_submenus', menu_id=menu_id), {'cursor': '', 'limit': 1}),
+        (List[schemas.Dish], app.url_path_for('get_dishes', menu_id=menu_id, submenu_id=submenu_ids[0]), {}),
+        (
+            schemas.DishPage,
+            app.url_path_for('get_dishes', menu_id=menu_id, submenu_id=submenu_ids[0]),
+            {'cursor': '', 'limit': 2},
+        ),
+        (List[schemas.MenuTree], app.url_path_for('get_tree'), {}),
+        (schemas.MenuTree, app.url_path_for('get_menu_tree', menu_id=menu_id), {}),
+    ]
+    for model, url, params in checks:
+        response = client.get(url, params=params)
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'application/json'
+        assert response.json() == validated(model, response.json()), url
+
+    tree = client.get(app.url_path_for('get_menu_tree', menu_id=menu_id)).json()
+    assert [submenu['dishes_count'] for submenu in tree['submenus']] == [3, 0]
+    assert [dish['price'] for dish in tree['submenus'][0]['dishes']] == ['12.50'] * 3
+    menu = client.get(app.url_path_for('get_menus')).json()[0]
+    assert 'dishes_count' not in menu['submenus'][0]
+    dish = menu['submenus'][0]['dishes'][0]
+    url = app.url_path_for('get_dish', menu_id=menu_id, submenu_id=submenu_ids[0], dish_id=dish['id'])
+    assert client.get(url).json() == dish
+
+    client.delete(app.url_path_for('delete_menu', menu_id=menu_id))